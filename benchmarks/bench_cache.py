@@ -0,0 +1,91 @@
+""" Cache reading benchmark
+
+Compares the time and peak RSS of reading every task from a synthetic Todoist
+cache, by loading it into a `TodoistAPI` with `cache.load` and by streaming it
+with `cache.CacheReader`, for caches of increasing size. The peak RSS of the
+streaming reader should stay flat as the cache grows.
+
+    $ python benchmarks/bench_cache.py
+    $ python benchmarks/bench_cache.py --items 10000 100000 300000
+
+Each read runs in its own process so that peak RSS is meaningful.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..'))
+
+TOKEN = 'benchmark'
+READERS = ['load', 'stream']
+
+
+def run_child(reader, cache_dir):
+    """Reads every task from the cache in this process, returning the
+    results.
+    """
+    from todoist_taskwarrior import cache
+    if reader == 'load':
+        from todoist.api import TodoistAPI
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    if reader == 'load':
+        api = cache.load(TodoistAPI(TOKEN, cache=None), cache_dir)
+        count = sum(1 for _ in api.items.all())
+    else:
+        count = sum(1 for _ in cache.CacheReader(cache_dir, TOKEN).items.iter())
+    elapsed = time.perf_counter() - start
+
+    return {
+        'items': count,
+        'seconds': elapsed,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'rss_before_mb': rss_before,
+    }
+
+
+def run(reader, cache_dir):
+    output = subprocess.check_output([
+        sys.executable, __file__, '--child', reader, '--cache', cache_dir,
+    ])
+    return json.loads(output.decode().strip().split('\n')[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, nargs='+', default=[10000, 50000, 150000])
+    parser.add_argument('--child', choices=READERS, help=argparse.SUPPRESS)
+    parser.add_argument('--cache', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.cache)))
+        return
+
+    print(f"{'items':>8} {'cache MB':>9} {'reader':>7} {'seconds':>8} {'peak RSS MB':>12}")
+    for items in args.items:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Generated in another process, since peak RSS is inherited by
+            # child processes on Linux
+            cache_dir += os.sep
+            subprocess.check_call([
+                sys.executable, '-m', 'fakes.synthetic',
+                '--items', str(items), '--cache', cache_dir, '--token', TOKEN,
+            ], cwd=os.path.join(BENCHMARKS_DIR, '..'), stdout=subprocess.DEVNULL)
+            size = os.path.getsize(os.path.join(cache_dir, TOKEN + '.json')) / 1024 / 1024
+
+            for reader in READERS:
+                result = run(reader, cache_dir)
+                print(f"{items:>8} {size:>9.1f} {reader:>7} {result['seconds']:>8.2f} "
+                      f"{result['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
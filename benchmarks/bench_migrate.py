@@ -0,0 +1,216 @@
+""" Migration benchmark
+
+Runs `migrate --no-sync` end to end against a synthetic Todoist cache and an
+in-process Taskwarrior, reporting tasks/sec, time per stage and peak RSS.
+
+With `--compare REV`, each configuration is also run with the package as it
+is at git revision REV, alternating runs of both, and the exit status is
+non-zero if any configuration regressed against it by more than the
+tolerance. As both run on the same machine, this doesn't depend on how fast
+it is. `--check-baseline` instead compares with the numbers recorded in
+benchmarks/baseline.json, which only holds on the machine that recorded them.
+
+    $ python benchmarks/bench_migrate.py
+    $ python benchmarks/bench_migrate.py --compare HEAD~1
+    $ python benchmarks/bench_migrate.py --items 200000 --batch-size 1000
+    $ python benchmarks/bench_migrate.py --update-baseline
+
+Each run is in its own process so that peak RSS is meaningful, and the best
+of `--repeat` runs is kept.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCHMARKS_DIR, '..')
+sys.path.insert(0, ROOT_DIR)
+
+import reference
+
+BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+TOKEN = 'benchmark'
+
+# The configurations run by default, as (items, batch size, workers)
+DEFAULT_CONFIGS = [
+    (10000, 0, 1),
+    (10000, 1000, 1),
+]
+
+
+def config_name(items, batch_size, workers):
+    return f'items={items} batch_size={batch_size} workers={workers}'
+
+
+def run_child(items, batch_size, workers, root):
+    """Runs a single migration in this process, with the package in `root`,
+    returning its results.
+    """
+    sys.path.insert(0, root)
+    from click.testing import CliRunner
+    from todoist_taskwarrior import cli
+    from fakes import synthetic
+    from fakes.taskwarrior import FakeTaskWarrior
+    import taskw
+    import todoist.api  # Imported lazily by the CLI, but not part of the migration
+
+    with tempfile.TemporaryDirectory() as cache:
+        synthetic.write_cache(synthetic.generate_account(items), cache, TOKEN)
+
+        cli.TODOIST_CACHE = cache + os.sep
+        taskw.TaskWarrior = FakeTaskWarrior
+
+        profile = os.path.join(cache, 'profile.json')
+        args = [
+            '--todoist-api-key', TOKEN,
+            '--profile-json', profile,
+            'migrate', '--no-sync',
+            '--batch-size', str(batch_size),
+            '--workers', str(workers),
+        ]
+        start = time.perf_counter()
+        result = CliRunner().invoke(cli.cli, args, catch_exceptions=False)
+        elapsed = time.perf_counter() - start
+
+        if result.exit_code != 0:
+            raise SystemExit(result.output)
+
+        with open(profile) as f:
+            stages = json.load(f)['stages']
+
+    return {
+        'items': items,
+        'seconds': elapsed,
+        'tasks_per_sec': items / elapsed,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'stages': {name: stage['seconds'] for name, stage in stages.items()},
+    }
+
+
+def run(items, batch_size, workers, root=ROOT_DIR):
+    """Runs a configuration in a child process, with the package in `root`. """
+    output = subprocess.check_output([
+        sys.executable, __file__, '--child',
+        '--items', str(items),
+        '--batch-size', str(batch_size),
+        '--workers', str(workers),
+        '--root', root,
+    ])
+    return json.loads(output.decode().strip().split('\n')[-1])
+
+
+def best(results):
+    """The fastest of several runs of a configuration, with the lowest peak RSS. """
+    result = max(results, key=lambda r: r['tasks_per_sec'])
+    return {**result, 'peak_rss_mb': min(r['peak_rss_mb'] for r in results)}
+
+
+def check_regression(result, baseline, tolerance, label='baseline'):
+    """Returns a list of the ways `result` regressed against `baseline`. """
+    if not baseline:
+        return []
+
+    failures = []
+    if reference.compare(result['tasks_per_sec'], baseline['tasks_per_sec'], tolerance):
+        failures.append(
+            f"tasks/sec {result['tasks_per_sec']:.0f} < "
+            f"{label} {baseline['tasks_per_sec']:.0f}")
+    if reference.compare(result['peak_rss_mb'], baseline['peak_rss_mb'], tolerance,
+                         higher_is_better=False):
+        failures.append(
+            f"peak RSS {result['peak_rss_mb']:.0f}MB > "
+            f"{label} {baseline['peak_rss_mb']:.0f}MB")
+    return failures
+
+
+def print_result(name, result):
+    print(name)
+    print(f"  {result['tasks_per_sec']:10.0f} tasks/sec   "
+          f"{result['seconds']:8.2f}s   {result['peak_rss_mb']:8.1f}MB peak RSS")
+    for stage, seconds in sorted(result['stages'].items(), key=lambda x: -x[1]):
+        print(f'  {stage:<14} {seconds:8.3f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int)
+    parser.add_argument('--batch-size', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs of each configuration, of which the best is kept')
+    parser.add_argument('--compare', metavar='REV',
+                        help='Fail if slower than the package at this git revision')
+    parser.add_argument('--check-baseline', action='store_true',
+                        help='Fail if slower than benchmarks/baseline.json')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed regression as a fraction of the reference')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--root', default=ROOT_DIR, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.items, args.batch_size, args.workers, args.root)))
+        return
+
+    if args.items:
+        configs = [(args.items, args.batch_size, args.workers)]
+    else:
+        configs = DEFAULT_CONFIGS
+
+    try:
+        with open(BASELINE) as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+
+    with contextlib.ExitStack() as stack:
+        ref_root = stack.enter_context(reference.export_revision(args.compare)) if args.compare else None
+
+        regressed = False
+        for config in configs:
+            name = config_name(*config)
+            results, ref_results = [], []
+            for _ in range(args.repeat):
+                results.append(run(*config))
+                if ref_root:
+                    ref_results.append(run(*config, root=ref_root))
+            result = best(results)
+            print_result(name, result)
+
+            if args.update_baseline:
+                baselines[name] = {
+                    'tasks_per_sec': round(result['tasks_per_sec'], 1),
+                    'peak_rss_mb': round(result['peak_rss_mb'], 1),
+                }
+                continue
+
+            failures = []
+            if ref_root:
+                ref_result = best(ref_results)
+                print(f"  {args.compare}: {ref_result['tasks_per_sec']:.0f} tasks/sec   "
+                      f"{ref_result['peak_rss_mb']:.1f}MB peak RSS   "
+                      f"{result['tasks_per_sec'] / ref_result['tasks_per_sec']:.2f}x")
+                failures += check_regression(result, ref_result, args.tolerance, args.compare)
+            if args.check_baseline:
+                failures += check_regression(result, baselines.get(name), args.tolerance)
+            for failure in failures:
+                print(f'  REGRESSION: {failure}')
+                regressed = True
+
+    if args.update_baseline:
+        with open(BASELINE, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
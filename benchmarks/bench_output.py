@@ -0,0 +1,109 @@
+""" Output benchmark
+
+Runs `migrate --no-sync` against a synthetic Todoist cache and an in-process
+Taskwarrior with each --output-mode, writing the output to a pipe read by
+this process, and reports the time and the bytes written for each. With
+`--latency`, every write to the pipe is delayed as if by a slow terminal.
+
+    $ python benchmarks/bench_output.py
+    $ python benchmarks/bench_output.py --items 30000 --latency 0.0002
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..'))
+
+TOKEN = 'benchmark'
+MODES = ['text', 'progress', 'quiet', 'ndjson']
+
+
+class SlowStream:
+    """Wraps a stream, sleeping for `latency` seconds on every write. """
+
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def run_child(mode, items, batch_size, latency, result_path):
+    """Runs a single migration in this process, writing its output to
+    stdout and its results to `result_path`.
+    """
+    from todoist_taskwarrior import cli
+    from fakes import synthetic
+    from fakes.taskwarrior import FakeTaskWarrior
+    import taskw
+    import todoist.api  # Imported lazily by the CLI, but not part of the migration
+
+    with tempfile.TemporaryDirectory() as cache:
+        synthetic.write_cache(synthetic.generate_account(items), cache, TOKEN)
+        cli.TODOIST_CACHE = cache + os.sep
+        taskw.TaskWarrior = FakeTaskWarrior
+
+        stdout = sys.stdout = SlowStream(sys.stdout, latency)
+        args = [
+            '--todoist-api-key', TOKEN, '--output-mode', mode,
+            'migrate', '--no-sync', '--batch-size', str(batch_size),
+        ]
+        start = time.perf_counter()
+        cli.cli.main(args, standalone_mode=False)
+        elapsed = time.perf_counter() - start
+        sys.stdout = sys.__stdout__
+
+    with open(result_path, 'w') as f:
+        json.dump({'seconds': elapsed, 'writes': stdout.writes}, f)
+
+
+def run(mode, items, batch_size, latency):
+    with tempfile.NamedTemporaryFile(suffix='.json') as result:
+        child = subprocess.Popen([
+            sys.executable, __file__, '--child', mode, '--items', str(items),
+            '--batch-size', str(batch_size), '--latency', str(latency),
+            '--result', result.name,
+        ], stdout=subprocess.PIPE)
+        size = len(child.stdout.read())
+        if child.wait() != 0:
+            raise SystemExit(f'{mode} failed')
+        with open(result.name) as f:
+            return {**json.load(f), 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Seconds added to every write to stdout')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.items, args.batch_size, args.latency, args.result)
+        return
+
+    print(f'items={args.items} batch_size={args.batch_size} latency={args.latency}')
+    print(f"  {'mode':<10} {'seconds':>8} {'tasks/sec':>10} {'writes':>8} {'KB':>8}")
+    for mode in MODES:
+        result = run(mode, args.items, args.batch_size, args.latency)
+        print(f"  {mode:<10} {result['seconds']:>8.2f} {args.items / result['seconds']:>10.0f} "
+              f"{result['writes']:>8} {result['bytes'] / 1024:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+""" Converted task memory benchmark
+
+Measures the memory held per converted task, with `tracemalloc`, when many
+are held at once (e.g. for a batch), as `convert.ConvertedTask` records and
+as the dicts that were used before them.
+
+    $ python benchmarks/bench_records.py --items 100000
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..'))
+
+
+class Objects:
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def all(self):
+        return self.objects
+
+
+class Todoist:
+    """The parts of `TodoistAPI` used during conversion, for a generated
+    account.
+    """
+
+    def __init__(self, state):
+        self.projects = Objects(state['projects'])
+        self.labels = Objects(state['labels'])
+
+
+def as_dict(data):
+    """The representation of a converted task before `ConvertedTask` """
+    return {**data._asdict(), 'tags': list(data.tags)}
+
+
+def measure(todoist, tasks, transform):
+    """Returns the bytes held per task after converting all of `tasks`. """
+    from todoist_taskwarrior import convert
+    from todoist_taskwarrior.mapping import Mapping
+
+    converted = convert.iter_converted_tasks(todoist, tasks, Mapping(), Mapping())
+    tracemalloc.start()
+    held = [transform(data) for _, data in converted]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(held) == len(tasks)
+    return size / len(tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100000)
+    args = parser.parse_args()
+
+    from fakes import synthetic
+
+    state = synthetic.generate_account(args.items)
+    todoist = Todoist(state)
+
+    print(f"{'representation':<16} {'bytes/task':>10}")
+    for name, transform in [('dict', as_dict), ('ConvertedTask', lambda data: data)]:
+        print(f'{name:<16} {measure(todoist, state["items"], transform):>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+""" Recurrence parsing benchmark
+
+Times `utils.parse_recur_string`, which tries each pattern in turn behind a
+cache, against the same cascade of patterns without the cache:
+
+- cold: over the strings used in tests/test_recur.py, which are nearly all
+  distinct, with the cache cleared before each pass, so every string is
+  parsed once, as on a first run
+- account: over the recurrences of a synthetic account (see `fakes.synthetic`),
+  where a few strings are repeated, with the cache cleared before each pass,
+  as in a single migration
+
+    $ python benchmarks/bench_recur.py
+"""
+import ast
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fakes import synthetic
+from todoist_taskwarrior import errors, utils
+
+
+TEST_RECUR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'test_recur.py')
+ORDINALS = ['2', '2nd', '3', '3rd', '4', '4th']
+
+
+def load_corpus():
+    """Collects the strings passed to `parse_recur_string` in test_recur.py,
+    expanding the f-strings over the days of the week and ordinals.
+    """
+    with open(TEST_RECUR) as f:
+        tree = ast.parse(f.read())
+
+    days_of_week = []
+    corpus = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], 'id', None) == 'DAYS_OF_WEEK':
+            days_of_week = ast.literal_eval(node.value)
+        if not (isinstance(node, ast.Call) and
+                getattr(node.func, 'attr', None) == 'parse_recur_string'):
+            continue
+        arg = node.args[0]
+        if isinstance(arg, ast.Constant):
+            corpus.append(arg.value)
+        elif isinstance(arg, ast.JoinedStr):
+            corpus.append(ast.unparse(arg)[2:-1])
+
+    expanded = []
+    for value in corpus:
+        if '{dow}' not in value:
+            expanded.append(value)
+            continue
+        for dow in days_of_week:
+            if '{ordinal}' in value:
+                expanded.extend(
+                    value.format(dow=dow, ordinal=o) for o in ORDINALS)
+            else:
+                expanded.append(value.format(dow=dow))
+    return expanded
+
+
+def load_account(items=10000):
+    """The recurrences of the recurring tasks of a synthetic account. """
+    account = synthetic.generate_account(items)
+    return [item['due']['string'] for item in account['items']
+            if item['due'] and item['due']['is_recurring']]
+
+
+CASCADE = list(utils.RECUR_RULES.values())
+
+
+def cascade(date_string):
+    """The previous implementation: normalize and try each pattern in turn. """
+    date_string = ' '.join(date_string.lower().strip().split())
+    for regex, handler in CASCADE:
+        match = regex.match(date_string)
+        if match:
+            return handler(match.groupdict())
+    raise errors.UnsupportedRecurrence(date_string)
+
+
+def run(fn, corpus, number, clear_cache=False):
+    def loop():
+        if clear_cache:
+            utils._parse_normalized_recur.cache_clear()
+        for value in corpus:
+            try:
+                fn(value)
+            except errors.UnsupportedRecurrence:
+                pass
+    return min(timeit.repeat(loop, number=number, repeat=5)) / number
+
+
+def report(name, corpus, number):
+    print(f'{name}: {len(corpus)} strings ({len(set(corpus))} distinct)')
+    baseline = run(cascade, corpus, number)
+    results = [
+        ('no cache (previous)', baseline),
+        ('cached', run(utils.parse_recur_string, corpus, number, clear_cache=True)),
+    ]
+    for name, seconds in results:
+        per_item = seconds / len(corpus) * 1e6
+        print(f'  {name:<22} {per_item:8.2f} us/string  {baseline / seconds:6.1f}x')
+
+
+def main(number=100):
+    report('cold', load_corpus(), number)
+    report('account', load_account(), number // 10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+""" Startup benchmark
+
+Measures how long the CLI takes to start, with `python -X importtime` for
+the import of `todoist_taskwarrior.cli` and the wall time of `--help` and
+`--version`, taking the median of several runs. The exit status is non-zero
+if a heavy dependency is imported at startup.
+
+With `--compare REV`, startup is also measured with the package as it is at
+git revision REV, alternating runs of both, and the exit status is non-zero
+if it regressed against it by more than the tolerance. `--check-baseline`
+instead compares with the numbers recorded in benchmarks/baseline.json,
+which only hold on the machine that recorded them.
+
+    $ python benchmarks/bench_startup.py
+    $ python benchmarks/bench_startup.py --compare HEAD~1
+    $ python benchmarks/bench_startup.py --update-baseline
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCHMARKS_DIR, '..')
+
+import reference
+
+BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+BASELINE_KEY = 'startup'
+
+# Dependencies that must only be imported by the commands that need them
+LAZY_MODULES = ['todoist', 'taskw', 'dateutil', 'requests']
+
+COMMANDS = {
+    'help_ms': ['--help'],
+    'version_ms': ['--version'],
+}
+
+
+def import_times(root=ROOT_DIR):
+    """Imports the CLI in `root` in a fresh interpreter, returning a dict of
+    the cumulative import time in microseconds of every module imported.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import todoist_taskwarrior.cli'],
+        cwd=root, stderr=subprocess.PIPE, check=True,
+    )
+    times = {}
+    for line in result.stderr.decode().splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def command_time(args, root=ROOT_DIR):
+    """Returns the wall time of running the CLI in `root` with `args`, in ms. """
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'todoist_taskwarrior.cli', *args],
+        cwd=root, stdout=subprocess.DEVNULL, check=True,
+        env={**os.environ, 'TODOIST_API_KEY': 'benchmark'},
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def run(runs, roots):
+    """Measures startup with the package in each of `roots`, alternating
+    between them, returning the results in the same order.
+    """
+    imports = [[] for _ in roots]
+    commands = [{key: [] for key in COMMANDS} for _ in roots]
+    for _ in range(runs):
+        for idx, root in enumerate(roots):
+            imports[idx].append(import_times(root))
+            for key, args in COMMANDS.items():
+                commands[idx][key].append(command_time(args, root))
+
+    results = []
+    for times, command_times in zip(imports, commands):
+        result = {
+            'import_ms': statistics.median(t['todoist_taskwarrior.cli'] for t in times) / 1000,
+            'lazy_imported': sorted(
+                {name.split('.')[0] for name in times[0]} & set(LAZY_MODULES)
+            ),
+        }
+        for key, values in command_times.items():
+            result[key] = statistics.median(values)
+        results.append(result)
+    return results
+
+
+def check_regression(result, baseline, tolerance, label='baseline'):
+    """Returns a list of the ways the timings of `result` regressed against
+    `baseline`.
+    """
+    failures = []
+    for key in ['import_ms', *COMMANDS]:
+        if baseline and key in baseline and reference.compare(
+                result[key], baseline[key], tolerance, higher_is_better=False):
+            failures.append(f'{key} {result[key]:.1f} > {label} {baseline[key]:.1f}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--compare', metavar='REV',
+                        help='Fail if slower than the package at this git revision')
+    parser.add_argument('--check-baseline', action='store_true',
+                        help='Fail if slower than benchmarks/baseline.json')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='Allowed regression as a fraction of the reference')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        roots = [ROOT_DIR]
+        if args.compare:
+            roots.append(stack.enter_context(reference.export_revision(args.compare)))
+        results = run(args.runs, roots)
+
+    result = results[0]
+    for key in ['import_ms', *COMMANDS]:
+        line = f'  {key:<14} {result[key]:8.1f}'
+        if args.compare:
+            line += f'   {args.compare}: {results[1][key]:8.1f}'
+        print(line)
+
+    try:
+        with open(BASELINE) as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+
+    if args.update_baseline:
+        baselines[BASELINE_KEY] = {
+            key: round(result[key], 1) for key in ['import_ms', *COMMANDS]
+        }
+        with open(BASELINE, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return
+
+    failures = []
+    if result['lazy_imported']:
+        failures.append(f"imported at startup: {', '.join(result['lazy_imported'])}")
+    if args.compare:
+        failures += check_regression(result, results[1], args.tolerance, args.compare)
+    if args.check_baseline:
+        failures += check_regression(result, baselines.get(BASELINE_KEY), args.tolerance)
+    for failure in failures:
+        print(f'  REGRESSION: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+""" Sync benchmark
+
+Runs `synchronize` against the local Todoist sync API of `fakes.todoist`,
+first as a full sync of a generated account, then as incremental syncs after
+some of its items changed, and reports the time of each. The CLI runs in its
+own process, with a temporary HOME so that its cache is a fresh one.
+
+    $ python benchmarks/bench_sync.py
+    $ python benchmarks/bench_sync.py --items 100000 --changes 10 1000 --latency 0.2
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCHMARKS_DIR, '..')
+sys.path.insert(0, ROOT_DIR)
+
+from fakes import todoist as fake_todoist
+
+TOKEN = 'benchmark'
+
+
+def synchronize(url, home):
+    """Returns the wall time of running `synchronize`, in seconds. """
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'todoist_taskwarrior.cli', 'synchronize'],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, check=True,
+        env={
+            **os.environ,
+            'HOME': home,
+            'TODOIST_API_KEY': TOKEN,
+            'TODOIST_API_ENDPOINT': url,
+        },
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--changes', type=int, nargs='+', default=[10, 1000])
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Seconds added to every request')
+    args = parser.parse_args()
+
+    fake = fake_todoist.FakeTodoist(args.items, token=TOKEN, latency=args.latency)
+    server = fake_todoist.serve(fake)
+    try:
+        with tempfile.TemporaryDirectory() as home:
+            print(f'items={args.items} latency={args.latency}')
+            print(f"  {'sync':<20} {'seconds':>8}")
+            print(f"  {'full':<20} {synchronize(server.url, home):>8.2f}")
+            for changes in args.changes:
+                fake.change_items(changes)
+                seconds = synchronize(server.url, home)
+                print(f"  {f'{changes} changed':<20} {seconds:>8.2f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
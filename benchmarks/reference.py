@@ -0,0 +1,37 @@
+""" Reference runs
+
+Exports the package as it is at a git revision, so that a benchmark can run
+it on the same machine as the working tree and compare the two, rather than
+against numbers measured elsewhere.
+"""
+import contextlib
+import io
+import os
+import subprocess
+import tarfile
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PACKAGE = 'todoist_taskwarrior'
+
+
+@contextlib.contextmanager
+def export_revision(rev):
+    """Yields a directory containing the package as it is at `rev`. """
+    archive = subprocess.run(
+        ['git', 'archive', rev, PACKAGE],
+        cwd=ROOT_DIR, stdout=subprocess.PIPE, check=True,
+    ).stdout
+    with tempfile.TemporaryDirectory() as root:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(root)
+        yield root
+
+
+def compare(current, reference, tolerance, higher_is_better=True):
+    """Returns whether `current` regressed against `reference` by more than
+    `tolerance`, a fraction of the reference.
+    """
+    if higher_is_better:
+        return current < reference * (1 - tolerance)
+    return current > reference * (1 + tolerance)
@@ -0,0 +1,9 @@
+"""Fakes of Todoist and Taskwarrior
+
+Shared by the tests and the benchmarks, so that commands can be run with no
+network and without the `task` binary:
+
+- `synthetic`: generates realistic Todoist accounts, and their local cache
+- `todoist`: a local stand-in for the Todoist sync API
+- `taskwarrior`: an in-process stand-in for `taskw.TaskWarrior`
+"""
@@ -0,0 +1,163 @@
+""" Synthetic Todoist data
+
+Generates a realistic Todoist account and writes it as a local sync cache
+(the `<token>.json` and `<token>.sync` files read by `TodoistAPI`), so that
+`migrate --no-sync` can be run against it without network access.
+
+    $ python -m fakes.synthetic --items 50000 --cache /tmp/todoist-sync/
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+
+
+# Recurrences supported by `utils.parse_recur_string`, so that migrations of
+# generated accounts never need to prompt
+RECURRENCES = [
+    'every day',
+    'daily',
+    'every other day',
+    'every 3 days',
+    'every week',
+    'every other week',
+    'every monday',
+    'every 2nd friday',
+    'ev tue at 17:00',
+    'every month',
+    'every 15th',
+    'every last day',
+    'every 3 months',
+    'every year',
+    'every weekday',
+    'every morning',
+    'every 4 hours',
+]
+
+PROJECT_WORDS = [
+    'Work', 'Home', 'Errands', 'Open Source', 'Reading', 'Clients', 'Admin',
+    'Travel', 'Health', 'Finance', 'Garden', 'Music', 'Learning', 'Family',
+]
+
+TASK_WORDS = [
+    'call', 'email', 'review', 'write', 'fix', 'buy', 'plan', 'read', 'book',
+    'clean', 'pay', 'update', 'prepare', 'schedule', 'the', 'report', 'car',
+    'invoice', 'groceries', 'notes', 'meeting', 'draft', 'tickets', 'repo',
+]
+
+
+def generate_account(items=10000, projects=None, labels=None, depth=5, seed=0):
+    """Returns a Todoist sync state with `items` tasks spread over a forest
+    of projects up to `depth` levels deep, with a mix of labels, priorities,
+    due dates and recurrences.
+    """
+    rng = random.Random(seed)
+    projects = projects or max(10, items // 100)
+    labels = labels or max(10, items // 500)
+    next_id = iter(range(1000000, 100000000))
+
+    state_projects = []
+    for idx in range(projects):
+        # Attach most projects below an earlier one, keeping the depth bounded
+        parent = None
+        if state_projects and rng.random() < 0.8:
+            candidate = rng.choice(state_projects)
+            if candidate['_depth'] < depth - 1:
+                parent = candidate
+        state_projects.append({
+            'id': next(next_id),
+            'name': f'{rng.choice(PROJECT_WORDS)} {idx}',
+            'parent_id': parent['id'] if parent else None,
+            'child_order': idx,
+            'is_deleted': 0,
+            'is_archived': 0,
+            '_depth': parent['_depth'] + 1 if parent else 0,
+        })
+    for project in state_projects:
+        del project['_depth']
+
+    state_labels = [
+        {'id': next(next_id), 'name': f'label{idx}', 'is_deleted': 0}
+        for idx in range(labels)
+    ]
+
+    start = datetime.datetime(2015, 1, 1)
+    state_items = []
+    for idx in range(items):
+        added = start + datetime.timedelta(minutes=rng.randrange(60 * 24 * 365 * 4))
+        content = ' '.join(rng.choice(TASK_WORDS) for _ in range(rng.randint(2, 8)))
+        item_labels = rng.sample(state_labels, rng.choice([0, 0, 1, 1, 2, 3]))
+        state_items.append({
+            'id': next(next_id),
+            'content': content,
+            'project_id': rng.choice(state_projects)['id'],
+            'priority': rng.choice([1, 1, 1, 2, 3, 4]),
+            'labels': [label['id'] for label in item_labels],
+            'date_added': added.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'due': generate_due(rng, added),
+            'checked': 0,
+            'is_deleted': 0,
+            'parent_id': None,
+            'child_order': idx,
+        })
+
+    return {
+        'items': state_items,
+        'projects': state_projects,
+        'labels': state_labels,
+    }
+
+
+def generate_due(rng, added):
+    kind = rng.random()
+    if kind < 0.4:
+        return None
+
+    due = added + datetime.timedelta(days=rng.randrange(1, 365))
+    if kind < 0.6:
+        date = due.strftime('%Y-%m-%d')
+    elif kind < 0.8:
+        date = due.strftime('%Y-%m-%dT%H:%M:%S')
+    else:
+        date = due.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    is_recurring = rng.random() < 0.3
+    return {
+        'date': date,
+        'timezone': None,
+        'string': rng.choice(RECURRENCES) if is_recurring else date,
+        'lang': 'en',
+        'is_recurring': is_recurring,
+    }
+
+
+def write_cache(state, cache, token, sync_token='synthetic'):
+    """Writes `state` as the Todoist cache for `token` in directory `cache`. """
+    cache = os.path.expanduser(cache)
+    os.makedirs(cache, exist_ok=True)
+    with open(os.path.join(cache, token + '.json'), 'w') as f:
+        json.dump(state, f)
+    with open(os.path.join(cache, token + '.sync'), 'w') as f:
+        f.write(sync_token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--projects', type=int)
+    parser.add_argument('--labels', type=int)
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', default='~/.todoist-sync/')
+    parser.add_argument('--token', default=os.environ.get('TODOIST_API_KEY', 'synthetic'))
+    args = parser.parse_args()
+
+    state = generate_account(args.items, args.projects, args.labels, args.depth, args.seed)
+    write_cache(state, args.cache, args.token)
+    print(f"Wrote {len(state['items'])} items, {len(state['projects'])} projects "
+          f"and {len(state['labels'])} labels to {args.cache}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+""" In-process Taskwarrior
+
+A stand-in for `taskw.TaskWarrior` that keeps tasks in memory, implementing
+only the calls made by `cli`. It lets `migrate` be tested and benchmarked without the
+`task` binary, optionally adding a fixed latency per call to model the cost
+of a subprocess.
+"""
+import json
+import time
+import uuid
+
+
+class UnsupportedCommand(Exception):
+    """Raised for the `task` commands that `FakeTaskWarrior` doesn't
+    implement, which `cli` started to run.
+    """
+
+
+class FakeTaskWarrior:
+
+    # Seconds added to every call, as if it was a `task` subprocess
+    latency = 0
+
+    def __init__(self, config_filename=None, config_overrides=None):
+        self.config_filename = config_filename
+        self.config_overrides = config_overrides or {}
+        self.tasks = {}
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def filter_tasks(self, filter_dict):
+        self._call()
+        tasks = list(self.tasks.values())
+        for key, value in filter_dict.items():
+            if key == 'or':
+                tasks = [t for t in tasks if any(str(t.get(k)) == str(v) for k, v in value)]
+            elif key.endswith('.any'):
+                field = key[:-len('.any')]
+                tasks = [t for t in tasks if t.get(field)]
+            elif key.endswith('.not'):
+                field = key[:-len('.not')]
+                tasks = [t for t in tasks if str(t.get(field)) != str(value)]
+            else:
+                tasks = [t for t in tasks if str(t.get(key)) == str(value)]
+        return tasks
+
+    def get_task(self, **kw):
+        (key, value), = kw.items()
+        for task in self.filter_tasks({key: value}):
+            return task.get('id'), task
+        return None, {}
+
+    def task_add(self, description, tags=None, **kw):
+        self._call()
+        task = {
+            'uuid': str(uuid.uuid4()),
+            'description': description.strip(),
+            'status': 'pending',
+        }
+        if tags:
+            task['tags'] = tags
+        # As with Taskwarrior, string UDAs are exported as strings
+        task.update(
+            (k, str(v) if self.config_overrides.get(f'uda.{k}.type') == 'string' else v)
+            for k, v in kw.items() if v is not None
+        )
+        self.tasks[task['uuid']] = task
+        return task
+
+    def _execute(self, *args):
+        self._call()
+        if args[0] == 'import':
+            with open(args[1]) as f:
+                for task in json.load(f):
+                    self.tasks[task['uuid']] = task
+            return '', ''
+        raise UnsupportedCommand(
+            f"FakeTaskWarrior only implements `task import`, not `task {' '.join(args)}`")
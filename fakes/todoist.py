@@ -0,0 +1,260 @@
+""" Local Todoist sync API
+
+A stand-in for the Todoist sync endpoint (`POST /API/v8/sync`), serving a
+generated account (see `fakes.synthetic`) with full and incremental syncs, so
+that `synchronize` and `migrate --sync` can be tested and benchmarked with
+no network. Latency, errors and rate limits can be injected.
+
+It can be used in-process, as the `session` of a `TodoistAPI`:
+
+    api = TodoistAPI(token, session=FakeSession(FakeTodoist(items=1000)))
+
+or as a local HTTP server, for the CLI:
+
+    $ python -m fakes.todoist --items 50000 --port 8765
+    $ TODOIST_API_ENDPOINT=http://127.0.0.1:8765 python -m todoist_taskwarrior.cli synchronize
+"""
+import argparse
+import collections
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import synthetic
+
+
+SYNC_PATH = '/API/v8/sync'
+DATATYPES = ['items', 'projects', 'labels']
+
+
+class FakeTodoist:
+    """A Todoist account, and the sync API serving it.
+
+    Every change bumps the version of the account, and sync tokens are the
+    version they were issued at, so that an incremental sync returns the
+    objects changed since. `requests` counts the sync requests received.
+    """
+
+    def __init__(self, items=1000, seed=0, token=None, latency=0):
+        self.token = token
+        self.latency = latency
+        self.version = 1
+        self.requests = 0
+        self.rng = random.Random(seed)
+
+        # Objects by type and id, with the version they last changed at.
+        # Deleted objects are kept, to be sent in incremental syncs.
+        self.objects = {datatype: {} for datatype in DATATYPES}
+        self.versions = {datatype: {} for datatype in DATATYPES}
+        for datatype, objects in synthetic.generate_account(items, seed=seed).items():
+            for obj in objects:
+                self._put(datatype, obj)
+
+        self._faults = collections.deque()
+        self._rate_limit = None
+        self._recent = collections.deque()
+        self._lock = threading.Lock()
+
+    def _put(self, datatype, obj):
+        self.objects[datatype][obj['id']] = obj
+        self.versions[datatype][obj['id']] = self.version
+
+    """ Changing the account """
+
+    def change_items(self, count):
+        """Edits the content of `count` random items, returning their ids. """
+        with self._lock:
+            self.version += 1
+            live = [obj for obj in self.objects['items'].values() if not obj['is_deleted']]
+            changed = self.rng.sample(live, count)
+            for obj in changed:
+                self._put('items', {**obj, 'content': obj['content'] + ' (edited)'})
+            return [obj['id'] for obj in changed]
+
+    def delete_items(self, ids):
+        with self._lock:
+            self.version += 1
+            for tid in ids:
+                self._put('items', {**self.objects['items'][tid], 'is_deleted': 1})
+
+    """ Injecting faults """
+
+    def fail_next(self, status=503, count=1, retry_after=None, body=None):
+        """Makes the next `count` requests fail with HTTP `status`. """
+        body = body or {'error': 'Service unavailable', 'http_code': status}
+        headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+        with self._lock:
+            self._faults.extend([(status, headers, body)] * count)
+
+    def set_rate_limit(self, requests, seconds):
+        """Answers 429, as Todoist does, once more than `requests` requests
+        were received within `seconds`. None removes the limit.
+        """
+        with self._lock:
+            self._rate_limit = None if requests is None else (requests, seconds)
+            self._recent.clear()
+
+    def _check_rate_limit(self, now):
+        if not self._rate_limit:
+            return None
+        limit, seconds = self._rate_limit
+        while self._recent and self._recent[0] <= now - seconds:
+            self._recent.popleft()
+        if len(self._recent) >= limit:
+            retry_after = max(1, int(self._recent[0] + seconds - now + 0.999))
+            return 429, {'Retry-After': str(retry_after)}, {
+                'error': 'Too many requests',
+                'error_tag': 'LIMITS_REACHED',
+                'http_code': 429,
+                'error_extra': {'retry_after': retry_after},
+            }
+        self._recent.append(now)
+        return None
+
+    """ Serving """
+
+    def sync(self, form):
+        """Handles a sync request with the `form` data sent by
+        `TodoistAPI.sync`, returning its `(status, headers, body)`.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.requests += 1
+            if self._faults:
+                return self._faults.popleft()
+            fault = self._check_rate_limit(time.monotonic())
+            if fault:
+                return fault
+            if self.token is not None and form.get('token') != self.token:
+                return 401, {}, {'error': 'Invalid token', 'http_code': 401}
+            return 200, {}, self._sync_response(form.get('sync_token', '*'))
+
+    def _sync_response(self, sync_token):
+        since = parse_sync_token(sync_token)
+        full_sync = since is None or since > self.version
+
+        response = {'sync_token': f'fake-{self.version}', 'full_sync': full_sync}
+        for datatype in DATATYPES:
+            if full_sync:
+                objects = [obj for obj in self.objects[datatype].values() if not obj['is_deleted']]
+            else:
+                versions = self.versions[datatype]
+                objects = [
+                    obj for oid, obj in self.objects[datatype].items()
+                    if versions[oid] > since
+                ]
+            response[datatype] = objects
+        return response
+
+
+def parse_sync_token(sync_token):
+    """Returns the version of a sync token issued by `FakeTodoist`, or None
+    for '*' and unknown tokens, which get a full sync.
+    """
+    if sync_token and sync_token.startswith('fake-'):
+        try:
+            return int(sync_token[len('fake-'):])
+        except ValueError:
+            pass
+    return None
+
+
+""" In-process transport """
+
+class FakeResponse:
+
+    def __init__(self, status, headers, body):
+        self.status_code = status
+        self.headers = headers
+        self.text = json.dumps(body)
+        self._body = body
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f'HTTP {self.status_code}')
+
+
+class FakeSession:
+    """Stands in for the `requests.Session` of a `TodoistAPI`. """
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    def post(self, url, data=None, **kwargs):
+        if not url.endswith(SYNC_PATH):
+            return FakeResponse(404, {}, {'error': 'Not found', 'http_code': 404})
+        return FakeResponse(*self.fake.sync(data or {}))
+
+
+""" HTTP server """
+
+class SyncHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        if self.path != SYNC_PATH:
+            return self._respond(404, {}, {'error': 'Not found', 'http_code': 404})
+        length = int(self.headers.get('Content-Length', 0))
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode())
+        form = {key: values[0] for key, values in form.items()}
+        self._respond(*self.server.fake.sync(form))
+
+    def _respond(self, status, headers, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(fake, host='127.0.0.1', port=0):
+    """Serves `fake` over HTTP on a background thread, returning the server,
+    whose `url` is the API endpoint to use. Stop it with `shutdown()`.
+    """
+    server = ThreadingHTTPServer((host, port), SyncHandler)
+    server.daemon_threads = True
+    server.fake = fake
+    server.url = f'http://{host}:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--token', help='Only accept this API token')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='Seconds added to every request')
+    parser.add_argument('--rate-limit', type=int, nargs=2, metavar=('REQUESTS', 'SECONDS'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    fake = FakeTodoist(args.items, args.seed, args.token, args.latency)
+    if args.rate_limit:
+        fake.set_rate_limit(*args.rate_limit)
+    server = serve(fake, args.host, args.port)
+    print(f'Serving {args.items} items on {server.url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+""" Shared fixtures
+
+Commands are run against the local Todoist sync API and the in-process
+Taskwarrior in `fakes`, with the Todoist cache in a temporary directory.
+"""
+import json
+import os
+import pytest
+from click.testing import CliRunner
+from todoist_taskwarrior import cli
+from fakes import todoist as fake_todoist
+from fakes.taskwarrior import FakeTaskWarrior
+
+
+TOKEN = 'token'
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    cache = tmp_path / 'cache'
+    cache.mkdir()
+    monkeypatch.setattr(cli, 'TODOIST_CACHE', str(cache) + os.sep)
+    return cache
+
+
+@pytest.fixture
+def todoist_server():
+    """A `fake_todoist.FakeTodoist` account, served over HTTP. """
+    fake = fake_todoist.FakeTodoist(items=20, token=TOKEN)
+    server = fake_todoist.serve(fake)
+    server.fake = fake
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def taskwarrior(monkeypatch):
+    """The tasks of an in-process Taskwarrior, by `uuid`, kept across the
+    commands run in a test.
+    """
+    import taskw
+
+    tasks = {}
+
+    class TaskWarrior(FakeTaskWarrior):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.tasks = tasks
+
+    monkeypatch.setattr(taskw, 'TaskWarrior', TaskWarrior)
+    return tasks
+
+
+@pytest.fixture
+def run_cli(cache_dir, todoist_server, taskwarrior):
+    """Runs a command of the CLI against the fakes, returning its result.
+    With `mix_stderr=False`, stderr is in `result.stderr` rather than in
+    `result.output`, and with `catch_exceptions` an exception raised by the
+    command is in `result.exception`.
+    """
+    def run(*args, input=None, mix_stderr=True, catch_exceptions=False):
+        return CliRunner(mix_stderr=mix_stderr).invoke(cli.cli, [
+            '--todoist-api-key', TOKEN,
+            '--todoist-api-endpoint', todoist_server.url,
+            *args,
+        ], input=input, catch_exceptions=catch_exceptions)
+    return run
+
+
+def read_events(output):
+    """Returns the events written by `--output-mode ndjson`. """
+    return [json.loads(line) for line in output.splitlines() if line.strip()]
+
+
+def migrated_ids(taskwarrior):
+    """Returns the `todoist_id` of every task in Taskwarrior. """
+    return sorted(str(task['todoist_id']) for task in taskwarrior.values()
+                  if task.get('status') != 'deleted')
+
+
+def set_recurrence(todoist_server, string):
+    """Makes the first task of the account recur `string`, returning it. """
+    item = next(iter(todoist_server.fake.objects['items'].values()))
+    item['due'] = {'date': '2020-01-06', 'timezone': None, 'string': string,
+                   'lang': 'en', 'is_recurring': True}
+    return item
@@ -0,0 +1,155 @@
+""" Accounts Tests
+
+Test reading the manifest of accounts and reporting their migration.
+"""
+import json
+import click
+from click.testing import CliRunner
+import pytest
+from todoist_taskwarrior import accounts
+from conftest import set_recurrence
+
+
+@pytest.fixture
+def write_manifest(tmp_path):
+    def write(entries):
+        path = tmp_path / 'manifest.json'
+        path.write_text(json.dumps(entries))
+        return str(path)
+    return write
+
+
+def test_load_manifest(tmp_path, write_manifest, monkeypatch):
+    monkeypatch.setenv('BOB_KEY', 'bob-key')
+    path = write_manifest([
+        {'name': 'alice', 'api_key': 'alice-key', 'taskrc': 'alice/.taskrc',
+         'map_project': ['Work=work'], 'map_file': 'alice.map', 'args': ['--batch-size', 500]},
+        {'api_key_env': 'BOB_KEY', 'taskrc': '/home/bob/.taskrc'},
+    ])
+
+    alice, bob = accounts.load_manifest(path)
+    assert alice == {
+        'name': 'alice',
+        'api_key': 'alice-key',
+        'taskrc': str(tmp_path / 'alice' / '.taskrc'),
+        'map_project': ['Work=work'],
+        'map_tag': [],
+        'map_file': str(tmp_path / 'alice.map'),
+        'args': ['--batch-size', '500'],
+    }
+    assert bob['name'] == '1'
+    assert bob['api_key'] == 'bob-key'
+    assert bob['taskrc'] == '/home/bob/.taskrc'
+    assert bob['map_file'] is None
+
+
+@pytest.mark.parametrize('entries', [
+    {'name': 'alice'},
+    [{'name': 'alice'}],
+    [{'name': 'alice', 'api_key_env': 'UNSET_KEY'}],
+    [{'name': 'alice', 'api_key': 'a'}, {'name': 'alice', 'api_key': 'b'}],
+    [{'name': '', 'api_key': 'a'}],
+    [{'name': '..', 'api_key': 'a'}],
+    [{'name': '../alice', 'api_key': 'a'}],
+    [{'name': 'team/alice', 'api_key': 'a'}],
+    [{'name': 'team\\alice', 'api_key': 'a'}],
+    [{'name': '/tmp/alice', 'api_key': 'a'}],
+])
+def test_load_manifest_invalid(write_manifest, entries, monkeypatch):
+    monkeypatch.delenv('UNSET_KEY', raising=False)
+    with pytest.raises(click.BadParameter):
+        accounts.load_manifest(write_manifest(entries))
+
+
+def test_migrate_args():
+    account = {
+        'name': 'alice',
+        'api_key': 'key',
+        'taskrc': '/taskrc',
+        'map_project': ['Work=work'],
+        'map_tag': ['a=b', 'c='],
+        'map_file': '/alice.map',
+        'args': ['--batch-size', '500'],
+    }
+    assert accounts.migrate_args(account, sync=False, profile_json='/profile.json') == [
+        '--todoist-api-key', 'key', '--tw-config-file', '/taskrc',
+        '--profile-json', '/profile.json',
+        'migrate', '--no-sync', '--unsupported-recur', 'warn',
+        '--map-project', 'Work=work', '--map-tag', 'a=b', '--map-tag', 'c=',
+        '--map-file', '/alice.map',
+        '--batch-size', '500',
+    ]
+
+
+def test_run_account_failure_is_logged(tmp_path):
+    account = {
+        'name': 'alice',
+        'api_key': 'key',
+        'taskrc': str(tmp_path / '.taskrc'),
+        'map_project': [],
+        'map_tag': [],
+        'map_file': None,
+        'args': ['--no-such-option'],
+    }
+    result = accounts.run_account(account, str(tmp_path), sync=False)
+
+    assert result['status'] == 'failed'
+    assert 'no-such-option' in result['error']
+    assert 'no-such-option' in (tmp_path / 'alice.log').read_text()
+
+
+def test_format_report():
+    results = [
+        {'name': 'bob', 'status': 'failed', 'seconds': 1.0, 'counters': {}},
+        {'name': 'alice', 'status': 'ok', 'seconds': 2.0,
+         'counters': {'tasks': 100, 'imported': 60, 'existing': 40}},
+    ]
+    lines = accounts.format_report(results, seconds=2.5).split('\n')
+
+    assert lines[1].split() == ['alice', 'ok', '100', '60', '40', '0', '0', '2.00', '50.0']
+    assert lines[2].split() == ['bob', 'failed', '0', '0', '0', '0', '0', '1.00', '0.0']
+    assert lines[3].split() == ['total', '100', '60', '40', '0', '0', '2.50', '40.0']
+    assert lines[-1] == '1 accounts migrated, 1 failed'
+
+
+def test_run_account_leaves_unsupported_recurrence_unset(tmp_path, monkeypatch, todoist_server,
+                                                         cache_dir, taskwarrior):
+    monkeypatch.setenv('TODOIST_API_ENDPOINT', todoist_server.url)
+    item = set_recurrence(todoist_server, 'every mon,tues')
+    account = {
+        'name': 'alice',
+        'api_key': 'token',
+        'taskrc': str(tmp_path / '.taskrc'),
+        'map_project': [],
+        'map_tag': [],
+        'map_file': None,
+        'args': [],
+    }
+    result = accounts.run_account(account, str(tmp_path))
+
+    assert result['status'] == 'ok', result['error']
+    assert result['counters']['imported'] == 20
+    log = (tmp_path / 'alice.log').read_text()
+    assert "Unsupported recurrence: 'every mon,tues', leaving it unset" in log
+    migrated = {task['todoist_id']: task for task in taskwarrior.values()}
+    assert 'recur' not in migrated[str(item['id'])]
+
+
+def test_main_prints_report_when_an_account_fails(tmp_path, write_manifest):
+    path = write_manifest([{'name': 'alice', 'api_key': 'key', 'args': ['--no-such-option']}])
+    log_dir = tmp_path / 'logs'
+
+    result = CliRunner().invoke(accounts.main, [path, '--jobs', '1', '--log-dir', str(log_dir)])
+    assert result.exit_code == 1
+    assert result.output.startswith('Migrating 1 accounts, 1 at a time...\n')
+    assert 'alice: FAILED' in result.output
+    assert 'Report:' in result.output
+    assert '0 accounts migrated, 1 failed' in result.output
+    assert 'Migrating 1 accounts' not in (log_dir / 'alice.log').read_text()
+
+
+def test_main_empty_manifest(tmp_path, write_manifest):
+    path = write_manifest([])
+    result = CliRunner().invoke(accounts.main, [path, '--log-dir', str(tmp_path / 'logs')])
+    assert result.exit_code == 0, result.output
+    assert '0 accounts migrated, 0 failed' in result.output
@@ -0,0 +1,173 @@
+""" Cache Tests
+
+Test reading the local Todoist cache incrementally.
+"""
+import json
+import pytest
+from todoist_taskwarrior import cache, errors
+
+
+STATE = {
+    'sync_token': 'abc',
+    'full_sync': True,
+    'user': {'full_name': 'Zoë', 'tricky': ['"]}', {'a': [1, 2]}]},
+    'items': [
+        {'id': 1, 'content': 'naïve "quotes" ] {', 'project_id': 10, 'priority': 1,
+         'labels': [100], 'date_added': '2019-01-18T12:00:00Z', 'due': None,
+         'checked': 0, 'is_deleted': 0, 'child_order': 12345},
+        {'id': 2, 'content': 'Deleted', 'project_id': 10, 'is_deleted': 1},
+        {'id': 3, 'content': '😀', 'project_id': 11, 'priority': 4, 'labels': [],
+         'date_added': '2019-01-18T12:00:00Z',
+         'due': {'date': '2019-01-21', 'string': 'every day', 'is_recurring': True}},
+    ],
+    'day_orders': {},
+    'projects': [
+        {'id': 10, 'name': 'Work', 'parent_id': None, 'color': 30},
+        {'id': 11, 'name': 'Errands', 'parent_id': 10, 'color': 31},
+    ],
+    'labels': [{'id': 100, 'name': 'books', 'is_deleted': 0}],
+    'num': 1234567,
+}
+
+
+@pytest.fixture(params=[1, 5, 4096])
+def chunk_size(request, monkeypatch):
+    monkeypatch.setattr(cache, 'CHUNK_SIZE', request.param)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    (tmp_path / 'token.json').write_text(json.dumps(STATE, indent=1), encoding='utf-8')
+    (tmp_path / 'token.sync').write_text('abc')
+    return str(tmp_path) + '/'
+
+
+def test_stream_parser(chunk_size):
+    values = [1234567, -1.5e10, 'ü😀', None, True, {'a': [1, {'b': '}'}]}, []]
+    parser = cache.StreamParser(json.dumps(values).encode())
+    assert list(parser.iter_array()) == values
+    assert parser.peek() == ''
+
+
+def test_stream_parser_invalid(chunk_size):
+    parser = cache.StreamParser(b'[1, 2')
+    with pytest.raises(json.JSONDecodeError):
+        list(parser.iter_array())
+
+
+def test_stream_parser_skip(chunk_size):
+    values = [{'a': ['"]}\\"', {'b': '\\'}], 'c': 1}, [[], {}], 'x', 12, [{'}': '['}]]
+    parser = cache.StreamParser(json.dumps(values).encode())
+    parser.expect('[')
+    for _ in values:
+        parser.skip()
+        parser.expect(',', ']')
+    assert parser.peek() == ''
+
+
+def test_stream_parser_skip_holds_a_chunk(monkeypatch):
+    monkeypatch.setattr(cache, 'CHUNK_SIZE', 1024)
+    day_orders = {str(tid): tid for tid in range(100000)}
+    parser = cache.StreamParser(json.dumps([day_orders, 'next']).encode())
+
+    lengths = []
+    fill = parser._fill
+    def recording_fill():
+        lengths.append(len(parser.buffer))
+        return fill()
+    monkeypatch.setattr(parser, '_fill', recording_fill)
+
+    parser.expect('[')
+    parser.skip()
+    parser.expect(',')
+    assert parser.value() == 'next'
+    assert max(lengths) < 2 * 1024
+
+
+def test_stream_parser_skip_invalid(chunk_size):
+    parser = cache.StreamParser(b'{"a": [1, "]')
+    with pytest.raises(json.JSONDecodeError):
+        parser.skip()
+
+
+def test_iter_state(cache_dir, chunk_size):
+    objects = list(cache.iter_state(cache_dir + 'token.json', ('items', 'labels')))
+    assert [(t, obj['id']) for t, obj in objects] == [
+        ('items', 1), ('items', 2), ('items', 3), ('labels', 100),
+    ]
+    assert objects[0][1] == STATE['items'][0]
+
+
+def test_iter_state_stops_after_types(tmp_path):
+    path = tmp_path / 'token.json'
+    path.write_text('{"items": [{"id": 1}], "labels": [{"id": 2}], "notes": [not json')
+    assert list(cache.iter_state(str(path), ('items', 'labels'))) == [
+        ('items', {'id': 1}), ('labels', {'id': 2}),
+    ]
+
+
+def test_reader(cache_dir, chunk_size):
+    reader = cache.CacheReader(cache_dir, 'token')
+    assert reader.sync_token == 'abc'
+
+    items = reader.items.all()
+    assert [item['id'] for item in items] == [1, 3]
+    assert set(items[0]) == set(cache.FIELDS['items'])
+    assert items[1]['due']['string'] == 'every day'
+
+    assert reader.items.all(filt=lambda item: item['project_id'] == 11) == [items[1]]
+    assert reader.projects.all() == [
+        {'id': 10, 'name': 'Work', 'parent_id': None},
+        {'id': 11, 'name': 'Errands', 'parent_id': 10},
+    ]
+    assert reader.labels.all() == [{'id': 100, 'name': 'books'}]
+
+
+def test_reader_single_pass(cache_dir, monkeypatch):
+    passes = []
+    iter_state = cache.iter_state
+    def counting_iter_state(path, datatypes):
+        passes.append(datatypes)
+        return iter_state(path, datatypes)
+    monkeypatch.setattr(cache, 'iter_state', counting_iter_state)
+
+    # Projects and labels are gathered on the first pass over the items
+    reader = cache.CacheReader(cache_dir, 'token')
+    assert len(reader.items.all()) == 2
+    assert len(reader.projects.all()) == 2
+    assert len(reader.labels.all()) == 1
+    assert passes == [('items', 'projects', 'labels')]
+
+    assert len(reader.items.all()) == 2
+    assert passes[1:] == [('items',)]
+
+    # Unless they are needed first
+    passes.clear()
+    reader = cache.CacheReader(cache_dir, 'token')
+    reader.projects.all()
+    reader.items.all()
+    assert passes == [('projects', 'labels'), ('items',)]
+
+
+def test_reader_no_cache(tmp_path):
+    reader = cache.CacheReader(str(tmp_path), 'token')
+    assert reader.sync_token == '*'
+    assert reader.items.all() == []
+    assert reader.projects.all() == []
+
+
+@pytest.mark.parametrize('contents', ['', '  \n', '{"items": [{"id": 1}, {"id"'])
+def test_reader_incomplete_cache(tmp_path, contents):
+    (tmp_path / 'token.json').write_text(contents)
+    (tmp_path / 'token.sync').write_text('abc')
+    with pytest.raises(errors.CorruptCache):
+        cache.CacheReader(str(tmp_path), 'token')
+
+
+def test_reader_corrupt_cache(tmp_path):
+    (tmp_path / 'token.json').write_text('{"items": [{"id": 1}, oops]}')
+    (tmp_path / 'token.sync').write_text('abc')
+    reader = cache.CacheReader(str(tmp_path), 'token')
+    with pytest.raises(errors.CorruptCache):
+        reader.items.all()
+
@@ -0,0 +1,231 @@
+""" Conversion Tests
+
+Test converting Todoist tasks to Taskwarrior tasks.
+"""
+import io
+import json
+import pytest
+from todoist_taskwarrior import convert, errors
+from todoist_taskwarrior import io as tio
+from todoist_taskwarrior.mapping import Mapping
+from conftest import migrated_ids, set_recurrence
+
+
+class Manager:
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def all(self):
+        return self.objects
+
+
+class Todoist:
+    """The parts of `TodoistAPI` used during conversion """
+
+    projects = Manager([
+        {'id': 1, 'name': 'Programming', 'parent_id': None},
+        {'id': 2, 'name': 'Open Source', 'parent_id': 1},
+    ])
+    labels = Manager([
+        {'id': 10, 'name': 'books'},
+        {'id': 11, 'name': 'someday'},
+    ])
+
+
+def make_task(id, due=None, **kwargs):
+    task = {
+        'id': id,
+        'content': f'Task {id}',
+        'project_id': 2,
+        'priority': 4,
+        'labels': [10, 11],
+        'date_added': '2019-01-18T12:00:00Z',
+        'due': due,
+    }
+    task.update(kwargs)
+    return task
+
+
+def convert_all(tasks, **kwargs):
+    return list(convert.iter_converted_tasks(
+        Todoist(), tasks, Mapping(), Mapping([('someday', '')]), **kwargs))
+
+
+def test_convert():
+    due = {'date': '2019-01-21', 'string': 'every 3 days', 'is_recurring': True}
+    (task, data), = convert_all([make_task(1, due=due)])
+    assert task['id'] == 1
+    assert data.fingerprint
+    assert data._replace(fingerprint=None)._asdict() == {
+        'tid': 1,
+        'name': 'Task 1',
+        'project': "'Programming.Open Source'",
+        'priority': 'H',
+        'tags': ('books',),
+        'entry': '2019-01-18T12:00:00+00:00',
+        'due': '2019-01-21T00:00:00',
+        'recur': '3 days',
+        'fingerprint': None,
+    }
+
+
+def test_missing_project_and_label():
+    (_, data), = convert_all([make_task(1, project_id=99, labels=[99])])
+    assert data.project == ''
+    assert data.tags == ()
+
+
+def test_exclude():
+    results = convert_all(
+        [make_task(1), make_task(2)],
+        exclude=lambda task: task['id'] == 1,
+    )
+    assert [(task['id'], data is None) for task, data in results] == [(1, True), (2, False)]
+
+
+def test_exclude_converted():
+    results = convert_all(
+        [make_task(1), make_task(2)],
+        exclude_converted=lambda task, data: data.name == 'Task 1',
+        parse_recur=lambda task: task['id'] == 1 and pytest.fail('excluded tasks are not parsed'),
+    )
+    assert [(task['id'], data is None) for task, data in results] == [(1, True), (2, False)]
+
+
+def test_fingerprint():
+    due = {'date': '2019-01-21', 'string': 'every 3 days', 'is_recurring': True}
+    (_, data), = convert_all([make_task(1, due=due)])
+    (_, same), = convert_all([make_task(1, due=due)])
+    assert data.fingerprint == same.fingerprint
+
+    changes = [
+        {'content': 'Renamed'},
+        {'project_id': 1},
+        {'labels': [11]},
+        {'priority': 1},
+        {'due': {**due, 'date': '2019-01-22'}},
+        {'due': {**due, 'string': 'every 4 days'}},
+        {'due': None},
+    ]
+    for change in changes:
+        (_, changed), = convert_all([make_task(1, **{'due': due, **change})])
+        assert changed.fingerprint != data.fingerprint, change
+
+    # Removed tags don't count
+    (_, changed), = convert_all([make_task(1, due=due, labels=[10, 11, 99])])
+    assert changed.fingerprint == data.fingerprint
+
+
+def test_parse_recur():
+    due = {'date': '2019-01-21', 'string': 'every mon,tues', 'is_recurring': True}
+    with pytest.raises(errors.UnsupportedRecurrence):
+        convert_all([make_task(1, due=due)])
+
+    (_, data), = convert_all([make_task(1, due=due)], parse_recur=lambda task: 'weekly')
+    assert data.recur == 'weekly'
+
+
+@pytest.mark.parametrize('workers', [0, 3])
+def test_order(workers):
+    results = convert_all([make_task(i) for i in range(20)], workers=workers)
+    assert [task['id'] for task, _ in results] == list(range(20))
+
+
+def test_write_json_stream():
+    output = io.StringIO()
+    assert tio.write_json_stream(iter([{'a': 1}, {'b': 2}]), output) == 2
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == [{'a': 1}, {'b': 2}]
+
+    output = io.StringIO()
+    assert tio.write_json_stream(iter([{'a': 1}, {'b': 2}]), output, as_array=True) == 2
+    assert json.loads(output.getvalue()) == [{'a': 1}, {'b': 2}]
+
+    output = io.StringIO()
+    assert tio.write_json_stream(iter([]), output, as_array=True) == 0
+    assert json.loads(output.getvalue()) == []
+
+
+def test_plan_migration():
+    unsupported = {'date': '2019-01-21', 'string': 'every mon,tues', 'is_recurring': True}
+    tasks = [
+        make_task(1),
+        make_task(2, labels=[10]),
+        make_task(3, labels=[10], due=unsupported),
+        make_task(4, project_id=1, labels=[]),
+    ]
+    plan = convert.plan_migration(
+        Todoist(), tasks, Mapping([('Programming', 'code')]), Mapping([('someday', '')]),
+        exists=lambda task: task['id'] == 2,
+    )
+    assert plan['outcomes'] == {
+        'create': 3,
+        'exists': 1,
+        'remapped': 2,
+        'unsupported_recur': 1,
+    }
+    assert plan['projects']["'Programming.Open Source'"] == {
+        'create': 2,
+        'exists': 1,
+        'remapped': 1,
+        'unsupported_recur': 1,
+    }
+    assert plan['projects']['code'] == {'create': 1, 'remapped': 1}
+    assert plan['unsupported'] == {'every mon,tues': 1}
+
+
+def test_migrate_dry_run(run_cli, cache_dir, todoist_server, taskwarrior):
+    item = set_recurrence(todoist_server, 'every mon,tues')
+    project_id = next(pid for pid, project in todoist_server.fake.objects['projects'].items()
+                      if project['parent_id'] is None and pid != item['project_id'])
+    run_cli('migrate', '--filter-proj-id', str(project_id))
+    existing = len(migrated_ids(taskwarrior))
+    assert existing
+
+    tasks = {uuid: dict(task) for uuid, task in taskwarrior.items()}
+    files = {path.name: path.read_bytes() for path in cache_dir.glob('token.*')
+             if path.suffix in ('.state', '.journal', '.migrate')}
+
+    result = run_cli('migrate', '--dry-run', '--map-project', '*=misc')
+    assert result.exit_code == 0, result.output
+    counts = dict(line.split() for line in result.output.splitlines()
+                  if line.startswith('  ') and len(line.split()) == 2)
+    assert counts == {
+        'create': str(20 - existing),
+        'exists': str(existing),
+        'remapped': '20',
+        'unsupported_recur': '1',
+    }
+    assert 'every mon,tues' in result.output
+
+    # Nothing was written to Taskwarrior or the state store
+    assert taskwarrior == tasks
+    assert {path.name: path.read_bytes() for path in cache_dir.glob('token.*')
+            if path.suffix in ('.state', '.journal', '.migrate')} == files
+
+
+def test_migrate_with_workers(run_cli, cache_dir, taskwarrior):
+    def imported():
+        return [{k: v for k, v in task.items() if k not in ('uuid', 'entry')}
+                for task in taskwarrior.values()]
+
+    result = run_cli('migrate', '--workers', '1')
+    assert result.exit_code == 0, result.output
+    expected = imported()
+    assert len(expected) == 20
+
+    # Start over, without the tasks or the state of the first migration
+    taskwarrior.clear()
+    for path in cache_dir.glob('token.*'):
+        if path.suffix in ('.state', '.journal', '.migrate'):
+            path.unlink()
+
+    result = run_cli('migrate', '--no-sync', '--workers', '4')
+    assert result.exit_code == 0, result.output
+    assert imported() == expected
+
+
+def test_records_share_strings():
+    (_, first), (_, second) = convert_all([make_task(1), make_task(2)])
+    assert first.project is second.project
+    assert first.tags[0] is second.tags[0]
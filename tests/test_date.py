@@ -0,0 +1,42 @@
+""" Date Tests
+
+Test conversions of Todoist dates to Taskwarrior.
+"""
+import dateutil.parser
+import pytest
+from todoist_taskwarrior import utils
+
+
+@pytest.mark.parametrize('date', [
+    # Formats returned by the Todoist sync API
+    '2016-12-01',
+    '2016-12-01T12:00:00',
+    '2016-12-01T12:00:00Z',
+
+    # Output of `parse_date`
+    '2019-01-18T12:00:00+02:00',
+    '2019-01-18T12:00:00-05:30',
+
+    # Handled by dateutil
+    'Fri 26 Sep 2014 08:25:05 +0000',
+    '2016-12-01T12:00:00.123456Z',
+])
+def test_parse_date_matches_dateutil(date):
+    assert utils.parse_date(date) == dateutil.parser.parse(date).isoformat()
+
+
+def test_parse_date():
+    assert utils.parse_date(None) == None
+    assert utils.parse_date('') == None
+    assert utils.parse_date('2016-12-01') == '2016-12-01T00:00:00'
+    assert utils.parse_date('2016-12-01T12:00:00Z') == '2016-12-01T12:00:00+00:00'
+
+
+def test_parse_date_invalid():
+    with pytest.raises(ValueError):
+        utils.parse_date('2016-02-30')
+
+
+def test_parse_due():
+    assert utils.parse_due(None) == None
+    assert utils.parse_due({'date': '2016-12-01T12:00:00'}) == '2016-12-01T12:00:00'
@@ -0,0 +1,55 @@
+""" Export Tests
+
+Test exporting converted tasks, against the fakes in `fakes`.
+"""
+import json
+from conftest import read_events
+
+
+def test_export_to_stdout_after_sync(run_cli, taskwarrior):
+    result = run_cli('export', '-f', 'taskwarrior', mix_stderr=False)
+    assert result.exit_code == 0, result.stderr
+
+    tasks = json.loads(result.stdout)
+    assert len(tasks) == 20
+    assert all(task['todoist_id'] for task in tasks)
+    assert 'Syncing tasks with todoist... OK' in result.stderr
+    assert taskwarrior == {}
+
+
+def test_export_ndjson_to_stdout(run_cli):
+    result = run_cli('export', mix_stderr=False)
+    assert result.exit_code == 0, result.stderr
+    assert len(read_events(result.stdout)) == 20
+
+
+def test_export_to_file(run_cli, tmp_path):
+    path = tmp_path / 'tasks.json'
+    result = run_cli('export', '-f', 'taskwarrior', '-o', str(path))
+    assert result.exit_code == 0, result.output
+    assert 'Syncing tasks with todoist... OK' in result.output
+    assert len(json.loads(path.read_text())) == 20
+
+
+def test_export_with_workers_keeps_order(run_cli):
+    result = run_cli('export', mix_stderr=False)
+    assert result.exit_code == 0, result.stderr
+
+    pipelined = run_cli('export', '--no-sync', '--workers', '4', mix_stderr=False)
+    assert pipelined.exit_code == 0, pipelined.stderr
+    assert pipelined.stdout == result.stdout
+
+
+def test_command_line_rules_before_map_file(run_cli, tmp_path):
+    result = run_cli('export', mix_stderr=False)
+    names = {task['project'] for task in read_events(result.stdout)}
+    path = tmp_path / 'rules.map'
+    path.write_text(''.join(f'project {name}=file\n' for name in names))
+
+    result = run_cli('export', '--no-sync', '--map-file', str(path), mix_stderr=False)
+    assert {task['project'] for task in read_events(result.stdout)} == {'file'}
+
+    result = run_cli('export', '--no-sync', '--map-project', '*=cli', '--map-file', str(path),
+                     mix_stderr=False)
+    assert result.exit_code == 0, result.stderr
+    assert {task['project'] for task in read_events(result.stdout)} == {'cli'}
@@ -0,0 +1,73 @@
+""" Filter Tests
+
+Test selecting Todoist tasks with a predicate.
+"""
+import pytest
+from todoist_taskwarrior import filters
+
+
+PROJECTS = [
+    {'id': 1, 'name': 'Work', 'parent_id': None},
+    {'id': 2, 'name': 'Meetings', 'parent_id': 1},
+    {'id': 3, 'name': 'Standups', 'parent_id': 2},
+    {'id': 4, 'name': 'Home', 'parent_id': None},
+]
+
+
+def make_task(tid, project_id, labels=(), priority=1, due=None, recurring=False):
+    return {
+        'id': tid,
+        'project_id': project_id,
+        'labels': list(labels),
+        'priority': priority,
+        'due': due and {'date': due, 'string': due, 'is_recurring': recurring},
+    }
+
+
+TASKS = [
+    make_task(10, 1, priority=4, due='2020-01-01'),
+    make_task(11, 2, labels=[100], due='2020-01-15T09:00:00Z', recurring=True),
+    make_task(12, 3, labels=[100, 101], priority=3),
+    make_task(13, 4, labels=[101], priority=4, due='2020-02-01'),
+    make_task(14, 4, due='2020-01-15', recurring=True),
+    make_task(15, 1, labels=[100], priority=2, due='2019-12-31'),
+]
+
+
+def ids(tasks):
+    return [task['id'] for task in tasks]
+
+
+def test_project_subtree():
+    assert filters.project_subtree(PROJECTS, 1) == {1, 2, 3}
+    assert filters.project_subtree(PROJECTS, 3) == {3}
+    assert filters.project_subtree(PROJECTS, 99) == {99}
+
+
+@pytest.mark.parametrize('task_filters,expected', [
+    ({}, [10, 11, 12, 13, 14, 15]),
+    ({'task_id': 12}, [12]),
+    ({'task_id': 99}, []),
+    ({'project_id': 1}, [10, 15]),
+    ({'project_tree': 1}, [10, 11, 12, 15]),
+    ({'project_tree': 2}, [11, 12]),
+    ({'label_ids': (100,)}, [11, 12, 15]),
+    ({'label_ids': (100, 101)}, [12]),
+    ({'priorities': (4,)}, [10, 13]),
+    ({'priorities': (2, 3)}, [12, 15]),
+    ({'due_after': '2020-01-15'}, [11, 13, 14]),
+    ({'due_before': '2020-01-15'}, [10, 11, 14, 15]),
+    ({'due_after': '2020-01-01', 'due_before': '2020-01-31'}, [10, 11, 14]),
+    ({'recurring': True}, [11, 14]),
+    ({'recurring': False}, [10, 12, 13, 15]),
+    ({'project_tree': 1, 'label_ids': (100,), 'recurring': False}, [12, 15]),
+    ({'project_id': 4, 'priorities': (4,), 'due_after': '2020-01-20'}, [13]),
+])
+def test_make_predicate(task_filters, expected):
+    predicate = filters.make_predicate(task_filters, PROJECTS)
+    matching = TASKS if predicate is None else filter(predicate, TASKS)
+    assert ids(matching) == expected
+
+
+def test_make_predicate_without_filters():
+    assert filters.make_predicate({}) is None
@@ -0,0 +1,121 @@
+""" Import Tests
+
+Test building tasks for Taskwarrior's JSON import.
+"""
+import pytest
+from todoist_taskwarrior import utils
+
+
+def make_task(**kwargs):
+    data = {
+        'tid': 1234,
+        'name': 'Do the thing ',
+        'project': "'Open Source'",
+        'tags': [],
+        'priority': None,
+        'entry': '2019-01-18T12:00:00+00:00',
+        'due': None,
+        'recur': None,
+    }
+    data.update(kwargs)
+    return utils.make_import_task(**data)
+
+
+def test_format_tw_date():
+    assert utils.format_tw_date(None) == None
+    assert utils.format_tw_date('2019-01-18T12:00:00+00:00') == '20190118T120000Z'
+    assert utils.format_tw_date('2019-01-18T12:00:00+02:00') == '20190118T100000Z'
+
+
+def test_unquote_ws():
+    assert utils.unquote_ws('') == ''
+    assert utils.unquote_ws('work') == 'work'
+    assert utils.unquote_ws("'Open Source'") == 'Open Source'
+
+
+def test_make_import_task():
+    task = make_task()
+    assert task['uuid']
+    assert task['description'] == 'Do the thing'
+    assert task['status'] == 'pending'
+    assert task['entry'] == '20190118T120000Z'
+    assert task['todoist_id'] == '1234'
+    assert task['project'] == 'Open Source'
+
+    # Unset values are omitted
+    for key in ('tags', 'priority', 'due', 'recur'):
+        assert key not in task
+
+
+def test_make_import_task_recurring():
+    task = make_task(due='2019-01-21T17:00:00+00:00', recur='3 days')
+    assert task['status'] == 'recurring'
+    assert task['due'] == '20190121T170000Z'
+    assert task['recur'] == '3 days'
+
+
+def test_make_import_task_removed_tags():
+    task = make_task(tags=['reading', None])
+    assert task['tags'] == ['reading']
+
+
+def test_make_import_task_fingerprint():
+    assert 'todoist_fingerprint' not in make_task()
+    assert make_task(fingerprint='abc')['todoist_fingerprint'] == 'abc'
+
+
+def test_make_update_task():
+    existing = {
+        'id': 3,
+        'uuid': 'c3f8c5a0-0000-4000-8000-000000000000',
+        'description': 'Do the thing',
+        'status': 'completed',
+        'entry': '20190118T120000Z',
+        'modified': '20190120T120000Z',
+        'urgency': 4.2,
+        'project': 'Open Source',
+        'tags': ['reading'],
+        'annotations': [{'entry': '20190119T120000Z', 'description': 'note'}],
+        'todoist_id': '1234',
+        'todoist_fingerprint': 'old',
+    }
+    data = {
+        'tid': 1234,
+        'name': 'Do the other thing',
+        'project': 'work',
+        'tags': [],
+        'priority': 'H',
+        'entry': '2019-01-18T12:00:00+00:00',
+        'due': None,
+        'recur': None,
+        'fingerprint': 'new',
+    }
+    task = utils.make_update_task(existing, **data)
+    assert task == {
+        'uuid': existing['uuid'],
+        'description': 'Do the other thing',
+        'status': 'completed',
+        'entry': '20190118T120000Z',
+        'project': 'work',
+        'priority': 'H',
+        'annotations': existing['annotations'],
+        'todoist_id': '1234',
+        'todoist_fingerprint': 'new',
+    }
+
+
+def test_make_delete_task():
+    existing = {
+        'id': 3,
+        'uuid': 'c3f8c5a0-0000-4000-8000-000000000000',
+        'description': 'Do the thing',
+        'status': 'pending',
+        'urgency': 4.2,
+        'todoist_id': '1234',
+    }
+    task = utils.make_delete_task(existing)
+    assert task['status'] == 'deleted'
+    assert task['end']
+    assert task['uuid'] == existing['uuid']
+    assert task['todoist_id'] == '1234'
+    assert 'id' not in task and 'urgency' not in task
@@ -0,0 +1,79 @@
+""" Incremental Migration Tests
+
+Test that `migrate --incremental` only looks at the tasks changed since the
+last complete migration, against the fakes in `fakes`.
+"""
+from conftest import migrated_ids, read_events
+
+
+def task_events(output):
+    return {event['todoist_id']: event['outcome']
+            for event in read_events(output) if event['event'] == 'task'}
+
+
+def watermark(cache_dir):
+    path = cache_dir / 'token.migrate'
+    return path.read_text() if path.exists() else None
+
+
+def test_complete_migration_writes_watermark(run_cli, cache_dir, taskwarrior):
+    result = run_cli('migrate')
+    assert result.exit_code == 0, result.output
+    assert len(migrated_ids(taskwarrior)) == 20
+    assert watermark(cache_dir) == 'fake-1'
+
+
+def test_filtered_migration_keeps_watermark(run_cli, cache_dir, todoist_server, taskwarrior):
+    project_id = next(iter(todoist_server.fake.objects['projects']))
+    result = run_cli('migrate', '--filter-proj-id', str(project_id))
+    assert result.exit_code == 0, result.output
+    assert watermark(cache_dir) is None
+
+    run_cli('migrate')
+    run_cli('migrate', '--no-sync', '--filter-proj-id', str(project_id))
+    assert watermark(cache_dir) == 'fake-1'
+
+
+def test_migrates_changes_since_watermark(run_cli, cache_dir, todoist_server, taskwarrior):
+    run_cli('migrate')
+    changed = todoist_server.fake.change_items(3)
+
+    result = run_cli('--output-mode', 'ndjson', 'migrate', '--incremental', '--update')
+    assert result.exit_code == 0, result.output
+    assert task_events(result.output) == {str(tid): 'updated' for tid in changed}
+    assert watermark(cache_dir) == 'fake-2'
+    descriptions = {task['todoist_id']: task['description'] for task in taskwarrior.values()}
+    assert all(descriptions[str(tid)].endswith('(edited)') for tid in changed)
+
+
+def test_no_changes_since_watermark(run_cli, cache_dir, taskwarrior):
+    run_cli('migrate')
+
+    result = run_cli('migrate', '--no-sync', '--incremental')
+    assert result.exit_code == 0, result.output
+    assert 'No tasks changed since the last migration' in result.output
+
+    result = run_cli('migrate', '--incremental')
+    assert result.exit_code == 0, result.output
+    assert 'No tasks changed since the last migration' in result.output
+    assert len(migrated_ids(taskwarrior)) == 20
+
+
+def test_falls_back_to_full_migration(run_cli, cache_dir, todoist_server, taskwarrior):
+    # No previous migration
+    result = run_cli('--output-mode', 'ndjson', 'migrate', '--incremental')
+    assert result.exit_code == 0, result.output
+    assert 'No previous migration at this sync point' in result.output
+    assert len(task_events(result.output)) == 20
+
+    # The cache was synchronized since the last migration, so the next delta
+    # doesn't include the changes in between
+    changed = todoist_server.fake.change_items(2)
+    run_cli('synchronize')
+    result = run_cli('--output-mode', 'ndjson', 'migrate', '--incremental', '--update')
+    assert result.exit_code == 0, result.output
+    assert 'No previous migration at this sync point' in result.output
+    events = task_events(result.output)
+    assert len(events) == 20
+    assert {tid for tid, outcome in events.items() if outcome == 'updated'} == \
+        {str(tid) for tid in changed}
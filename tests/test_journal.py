@@ -0,0 +1,135 @@
+""" Journal Tests
+
+Test checkpointing the progress of a migration.
+"""
+import json
+import pytest
+from todoist_taskwarrior import journal
+from conftest import migrated_ids, read_events
+
+
+RUN = {'sync_token': 'abc', 'filters': {}, 'update': False, 'changed_ids': None}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'token.journal')
+
+
+def test_read_missing(path):
+    assert journal.read(path) is None
+
+
+def test_read_started(path):
+    j = journal.Journal(path)
+    j.start(**RUN)
+    j.close()
+
+    assert journal.read(path) == {'run': RUN, 'last_id': None, 'count': 0, 'in_flight': []}
+
+
+def test_read_in_flight(path):
+    j = journal.Journal(path)
+    j.start(**RUN)
+    j.begin([1, 2])
+    j.commit(2, 2)
+    j.begin([3, 4])
+    j.close()
+
+    checkpoint = journal.read(path)
+    assert checkpoint['last_id'] == 2
+    assert checkpoint['count'] == 2
+    assert checkpoint['in_flight'] == [3, 4]
+
+
+def test_resume_appends(path):
+    j = journal.Journal(path)
+    j.start(**RUN)
+    j.begin([1, 2])
+    j.close()
+
+    j = journal.Journal(path)
+    j.resume()
+    j.begin([1, 2])
+    j.commit(2, 2)
+    j.close()
+
+    checkpoint = journal.read(path)
+    assert checkpoint['run'] == RUN
+    assert (checkpoint['last_id'], checkpoint['in_flight']) == (2, [])
+
+
+def test_start_replaces_previous_run(path):
+    j = journal.Journal(path)
+    j.start(**RUN)
+    j.commit(2, 2)
+    j.start(**{**RUN, 'sync_token': 'def'})
+    j.close()
+
+    checkpoint = journal.read(path)
+    assert checkpoint['run']['sync_token'] == 'def'
+    assert checkpoint['last_id'] is None
+
+
+def test_partial_line_is_skipped(path):
+    j = journal.Journal(path)
+    j.start(**RUN)
+    j.begin([1, 2])
+    j.commit(2, 2)
+    j.close()
+    with open(path, 'a') as f:
+        f.write('{"event": "begin", "ids": [3')
+
+    assert journal.read(path)['last_id'] == 2
+    assert journal.read(path)['in_flight'] == []
+
+
+def test_finish_removes_journal(path):
+    j = journal.Journal(path)
+    j.start(**RUN)
+    j.finish()
+
+    assert journal.read(path) is None
+
+
+def interrupt_import(monkeypatch, count, written):
+    """Makes the `count`th `task import` write only its first `written`
+    tasks, then fail, as if the migration died part way through it. Returns
+    the list of the imports run.
+    """
+    import taskw
+
+    imports = []
+    execute = taskw.TaskWarrior._execute
+
+    def _execute(self, *args):
+        imports.append(args)
+        if len(imports) == count:
+            with open(args[1]) as f:
+                tasks = json.load(f)
+            for task in tasks[:written]:
+                self.tasks[task['uuid']] = task
+            raise RuntimeError('interrupted')
+        return execute(self, *args)
+
+    monkeypatch.setattr(taskw.TaskWarrior, '_execute', _execute)
+    return imports
+
+
+def test_resume_interrupted_migration(run_cli, cache_dir, taskwarrior, monkeypatch):
+    imports = interrupt_import(monkeypatch, count=3, written=2)
+    with pytest.raises(RuntimeError):
+        run_cli('migrate', '--batch-size', '5')
+    assert len(migrated_ids(taskwarrior)) == 12
+    assert journal.read(str(cache_dir / 'token.journal'))['count'] == 10
+
+    result = run_cli('--output-mode', 'ndjson', 'migrate', '--batch-size', '5', '--resume')
+    assert result.exit_code == 0, result.output
+    outcomes = [event['outcome'] for event in read_events(result.output) if event['event'] == 'task']
+    # The 2 tasks written before the interruption are found, and not imported again
+    assert outcomes == ['imported'] * 8
+
+    assert len(imports) == 5
+    ids = migrated_ids(taskwarrior)
+    assert len(ids) == 20
+    assert len(set(ids)) == 20
@@ -0,0 +1,97 @@
+""" Mapping Tests
+
+Test exact, glob, prefix and regex mapping rules.
+"""
+import pytest
+from todoist_taskwarrior import errors, utils
+from todoist_taskwarrior.mapping import NO_MATCH, Mapping
+
+
+def test_exact():
+    m = Mapping([('Errands', 'chores'), ('Taxes', None)])
+    assert m.lookup('Errands') == 'chores'
+    assert m.lookup('Taxes') == None
+    assert m.lookup('Other') is NO_MATCH
+    assert m.translate('Errands') == 'chores'
+    assert m.translate('Taxes') == None
+    assert m.translate('Other') == 'Other'
+
+
+def test_prefix():
+    m = Mapping([('Work.*', 'work'), ('Work.Clients.*', 'clients')])
+    assert m.translate('Work.Admin') == 'work'
+    assert m.translate('Work.Clients.Acme') == 'clients'
+    assert m.translate('Work') == 'Work'
+    assert m.translate('Home') == 'Home'
+
+
+def test_glob():
+    m = Mapping([('*Errands', 'errands'), ('Project ?', 'projects')])
+    assert m.translate('Work Errands') == 'errands'
+    assert m.translate('House Errands') == 'errands'
+    assert m.translate('Project X') == 'projects'
+    assert m.translate('Project XY') == 'Project XY'
+
+
+def test_regex():
+    m = Mapping([(r're:Clients\.(\w+)', r'client.\1')])
+    assert m.translate('Clients.Acme') == 'client.Acme'
+    assert m.translate('Clients.Acme.Sub') == 'Clients.Acme.Sub'
+
+
+def test_regex_backreference():
+    m = Mapping([(r're:(\w+)\.\1', 'repeated'), ('*.x', 'x')])
+    assert m.translate('a.a') == 'repeated'
+    assert m.translate('a.x') == 'x'
+    assert m.translate('a.b') == 'a.b'
+
+
+def test_invalid_regex():
+    with pytest.raises(errors.InvalidMapping):
+        Mapping([('re:(', 'x')])
+
+
+def test_precedence():
+    m = Mapping([
+        ('re:.*', 'regex'),
+        ('Work*', 'shorter prefix'),
+        ('Work.*', 'prefix'),
+        ('Work.Admin', 'exact'),
+    ])
+    assert m.translate('Work.Admin') == 'exact'
+    assert m.translate('Work.Other') == 'prefix'
+    assert m.translate('WorkX') == 'shorter prefix'
+    assert m.translate('Home') == 'regex'
+
+
+def test_cache_cleared_on_add():
+    m = Mapping()
+    assert m.translate('Work.Admin') == 'Work.Admin'
+    m.add('Work.*', 'work')
+    assert m.translate('Work.Admin') == 'work'
+
+
+def test_later_patterns_take_precedence():
+    m = Mapping([('re:Work.*', 'first'), ('*Admin', 'second')])
+    assert m.translate('Work.Admin') == 'second'
+    assert m.translate('Work.Other') == 'first'
+
+
+def test_fallback_checked_last():
+    m = Mapping([('Work.*', 'work')], fallback=Mapping([
+        ('Work.Admin', 'admin'),
+        ('Home', 'home'),
+    ]))
+    assert m.translate('Work.Admin') == 'work'
+    assert m.translate('Home') == 'home'
+    assert m.translate('Other') == 'Other'
+
+
+def test_tag_index():
+    labels = [
+        {'id': 1, 'name': 'books'},
+        {'id': 2, 'name': 'errands'},
+        {'id': 3, 'name': 'someday'},
+    ]
+    index = utils.build_tag_index(labels, Mapping([('books', 'reading'), ('someday', None)]))
+    assert index == {1: 'reading', 2: 'errands', 3: None}
@@ -0,0 +1,139 @@
+""" Output Tests
+
+Test the buffered text, progress, quiet and NDJSON outputs.
+"""
+import io
+import json
+import pytest
+from todoist_taskwarrior import io as tio
+from conftest import migrated_ids, read_events, set_recurrence
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    # Never flush on the interval, so that buffering is deterministic
+    monkeypatch.setattr(tio, 'FLUSH_INTERVAL', 3600)
+    return io.StringIO()
+
+
+def migrate(output):
+    """Writes the output of a small migration. """
+    output.message('important', 'Starting migration of 2 tasks...', bold=True)
+    output.start_progress(2, 'Migrating')
+    for tid in ('1', '2'):
+        output.advance()
+        output.message('important', f'Task {tid}', bold=True)
+        output.begin_step(f'Importing {tid}')
+        output.end_step(f'Importing {tid}', 'OK', ok=True)
+        output.event('task', {'todoist_id': tid, 'outcome': 'imported'})
+    output.message('warn', 'Careful', bold=True)
+    output.end_progress()
+    output.flush()
+
+
+def test_text_output_is_buffered(stream):
+    output = tio.TextOutput(stream)
+    output.message('success', 'Done', bold=True)
+    assert stream.getvalue() == ''
+
+    output.flush()
+    # Not a terminal, so unstyled
+    assert stream.getvalue() == 'Done\n'
+
+
+def test_text_output_shows_steps_while_they_run(stream):
+    output = tio.TextOutput(stream)
+    output.message('important', 'Task 1', bold=True)
+    output.begin_step('Importing batch of 2 tasks')
+    assert stream.getvalue() == 'Task 1\nImporting batch of 2 tasks... '
+
+    output.end_step('Importing batch of 2 tasks', 'OK', ok=True)
+    output.message('important', 'Task 2', bold=True)
+    assert stream.getvalue() == 'Task 1\nImporting batch of 2 tasks... '
+
+
+def test_text_output(stream):
+    migrate(tio.TextOutput(stream))
+    assert stream.getvalue().splitlines() == [
+        'Starting migration of 2 tasks...',
+        'Task 1', 'Importing 1... OK',
+        'Task 2', 'Importing 2... OK',
+        'Careful',
+    ]
+
+
+def test_quiet_output(stream):
+    output = tio.QuietOutput(stream)
+    migrate(output)
+    output.begin_step('Syncing')
+    output.end_step('Syncing', 'FAILED (offline)', ok=False)
+    output.flush()
+    assert stream.getvalue().splitlines() == ['Careful', 'Syncing... FAILED (offline)']
+
+
+def test_progress_output(stream):
+    migrate(tio.ProgressOutput(stream))
+    lines = stream.getvalue().splitlines()
+
+    assert lines[0] == 'Starting migration of 2 tasks...'
+    assert lines[1].startswith('Migrating [---')
+    assert lines[2] == 'Careful'
+    assert lines[3].startswith('Migrating [###')
+    assert lines[3].endswith('(imported 2)')
+    assert len(lines) == 5
+
+
+def test_ndjson_output(stream):
+    output = tio.NDJSONOutput(stream)
+    output.begin_step('Loading')
+    output.end_step('Loading', 'OK', ok=True)
+    migrate(output)
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    for event in events:
+        assert event.pop('time')
+    summary = events.pop()
+    assert summary.pop('seconds') >= 0
+
+    assert events == [
+        {'event': 'step', 'description': 'Loading', 'status': 'OK', 'ok': True},
+        {'event': 'start', 'label': 'Migrating', 'total': 2},
+        {'event': 'task', 'todoist_id': '1', 'outcome': 'imported'},
+        {'event': 'task', 'todoist_id': '2', 'outcome': 'imported'},
+        {'event': 'message', 'level': 'warn', 'message': 'Careful'},
+    ]
+    assert summary == {
+        'event': 'summary', 'label': 'Migrating', 'total': 2, 'done': 2,
+        'outcomes': {'imported': 2},
+    }
+
+
+def test_format_progress():
+    progress = {
+        'label': 'Migrating', 'total': 100, 'done': 25, 'started': 0,
+        'outcomes': {'imported': 20, 'existing': 5},
+    }
+    assert tio.format_progress(progress, now=5, width=8) == (
+        'Migrating [##------] 25/100 25% 5.0/s ETA 00:00:15 (existing 5, imported 20)')
+
+    progress.update(done=0, outcomes={})
+    assert tio.format_progress(progress, now=5, width=8) == (
+        'Migrating [--------] 0/100 0% 0.0/s ETA --:--:--')
+
+
+@pytest.mark.parametrize('mode', ['quiet', 'progress', 'ndjson'])
+def test_unsupported_recurrence_without_prompt(mode, run_cli, todoist_server, taskwarrior):
+    item = set_recurrence(todoist_server, 'every mon,tues')
+
+    result = run_cli('--output-mode', mode, 'migrate')
+    assert result.exit_code == 0, result.output
+    assert 'Set recurrence' not in result.output
+    assert "Unsupported recurrence: 'every mon,tues', leaving it unset" in result.output
+    assert len(migrated_ids(taskwarrior)) == 20
+    migrated = {task['todoist_id']: task for task in taskwarrior.values()}
+    assert 'recur' not in migrated[str(item['id'])]
+
+    if mode == 'ndjson':
+        # Every line is an event, and the warning is one of them
+        messages = [event['message'] for event in read_events(result.output)
+                    if event['event'] == 'message']
+        assert any('every mon,tues' in message for message in messages)
@@ -0,0 +1,162 @@
+""" Pipeline Tests
+
+Test converting tasks ahead of a single consumer, and writing them in the
+background.
+"""
+import threading
+import time
+import pytest
+from todoist_taskwarrior import cli, pipeline, state
+from conftest import migrated_ids
+
+
+def test_order_is_preserved():
+    def slow_square(x):
+        # Make earlier items finish last
+        time.sleep(0.001 * (10 - x))
+        return x * x
+
+    results = list(pipeline.iter_pipelined(slow_square, range(10), workers=4))
+    assert results == [x * x for x in range(10)]
+
+
+def test_converter_error_is_raised_in_order():
+    def fail_on_3(x):
+        if x == 3:
+            raise ValueError(x)
+        return x
+
+    results = []
+    with pytest.raises(ValueError):
+        for result in pipeline.iter_pipelined(fail_on_3, range(10), workers=2):
+            results.append(result)
+    assert results == [0, 1, 2]
+
+
+def test_stopping_early_cancels_pending_work():
+    started = []
+    lock = threading.Lock()
+
+    def record(x):
+        with lock:
+            started.append(x)
+        time.sleep(0.001)
+        return x
+
+    results = pipeline.iter_pipelined(record, range(1000), workers=2, buffer_size=4)
+    for result in results:
+        if result == 1:
+            break
+    results.close()
+
+    # Only the buffered items were ever started
+    assert len(started) <= 6
+
+
+def test_writer_writes_items_in_order():
+    written = []
+    writer = pipeline.BackgroundWriter(written.extend, max_batch=3)
+    for x in range(10):
+        writer.put(x)
+    writer.close()
+    assert written == list(range(10))
+    assert writer.pending == 0
+
+
+def test_writer_batches_waiting_items():
+    batches = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def write(batch):
+        started.set()
+        release.wait()
+        batches.append(batch)
+
+    writer = pipeline.BackgroundWriter(write, max_batch=3)
+    writer.put(0)
+    started.wait()
+    for x in range(1, 7):
+        writer.put(x)
+    assert writer.pending == 7
+    release.set()
+    writer.close()
+
+    # The first item is written alone, while the others queue up
+    assert batches == [[0], [1, 2, 3], [4, 5, 6]]
+
+
+def test_writer_error_is_raised_to_producer():
+    written = []
+
+    def write(batch):
+        if 3 in batch:
+            raise ValueError(batch)
+        written.extend(batch)
+
+    writer = pipeline.BackgroundWriter(write, max_batch=1)
+    with pytest.raises(ValueError):
+        for x in range(100):
+            writer.put(x)
+            time.sleep(0.001)
+    with pytest.raises(ValueError):
+        writer.close()
+
+    # Nothing is written after the error
+    assert written == [0, 1, 2]
+
+
+def test_writer_error_is_raised_on_close():
+    def write(batch):
+        raise ValueError(batch)
+
+    writer = pipeline.BackgroundWriter(write)
+    writer.put(1)
+    with pytest.raises(ValueError):
+        writer.close()
+
+
+def test_queued_tasks_are_recorded_before_exit(run_cli, cache_dir, taskwarrior, monkeypatch):
+    import taskw
+    monkeypatch.setattr(taskw.TaskWarrior, 'latency', 0.05)
+
+    # Confirm 5 tasks, then quit while they are being imported
+    result = run_cli('migrate', '--interactive', input='y\n' * 5 + 'q\n')
+    assert result.exit_code == 1
+    assert len(migrated_ids(taskwarrior)) == 5
+
+    # The state store was closed after the last tasks were recorded
+    assert cli.state_store._file is None
+    store = state.StateStore(str(cache_dir / 'token.state'))
+    assert sorted(store.tasks) == migrated_ids(taskwarrior)
+
+
+def test_failed_background_writes_are_reported(run_cli, taskwarrior, monkeypatch):
+    import taskw
+
+    def _execute(self, *args):
+        raise RuntimeError('locked')
+
+    monkeypatch.setattr(taskw.TaskWarrior, '_execute', _execute)
+
+    result = run_cli('migrate', '--interactive', input='y\n' * 20, catch_exceptions=True)
+    assert isinstance(result.exception, RuntimeError)
+    assert 'confirmed tasks... OK' not in result.output
+    assert migrated_ids(taskwarrior) == []
+
+
+
+def test_finish_writes_after_error_raised_to_producer():
+    def write(batch):
+        raise ValueError(batch)
+
+    writer = pipeline.BackgroundWriter(write)
+    writer.put(1)
+    while writer.pending:
+        time.sleep(0.001)
+    with pytest.raises(ValueError):
+        writer.put(2)
+
+    # The error is raised again rather than reported as written
+    with pytest.raises(ValueError):
+        cli.finish_writes(writer)
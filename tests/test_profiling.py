@@ -0,0 +1,72 @@
+""" Profiling Tests
+
+Test timing stages and reporting.
+"""
+import functools
+import pytest
+from todoist_taskwarrior import profiling
+from conftest import read_events
+
+
+def test_null_profiler():
+    profiler = profiling.NullProfiler()
+    with profiler.stage('convert'):
+        pass
+    profiler.count('tasks')
+    assert not profiler.enabled
+
+
+def test_profiler_report():
+    profiler = profiling.Profiler()
+
+    @functools.lru_cache()
+    def cached(x):
+        return x
+
+    cached(0)
+    profiler.track_cache('cached', cached)
+    for x in [0, 1, 1]:
+        with profiler.stage('convert'):
+            cached(x)
+        profiler.count('tasks')
+
+    report = profiler.report()
+    assert report['stages']['convert']['calls'] == 3
+    assert report['counters'] == {'tasks': 3}
+    assert report['caches'] == {'cached': {'hits': 2, 'misses': 1}}
+
+    table = profiling.format_report(report)
+    assert 'convert' in table
+    assert 'cached' in table
+
+
+def test_stage_records_time_on_error():
+    profiler = profiling.Profiler()
+    with pytest.raises(ValueError):
+        with profiler.stage('write'):
+            raise ValueError()
+    assert profiler.report()['stages']['write']['calls'] == 1
+
+
+def test_profile_text(run_cli):
+    result = run_cli('--profile', 'migrate')
+    assert result.exit_code == 0, result.output
+    profile = result.output[result.output.index('Profile:'):]
+    assert 'write' in profile and 'tasks' in profile
+
+
+def test_profile_quiet(run_cli):
+    result = run_cli('--profile', '--quiet', 'migrate', mix_stderr=False)
+    assert result.exit_code == 0, result.stderr
+    assert result.stdout == ''
+    assert 'Profile:' in result.stderr
+
+
+def test_profile_ndjson(run_cli):
+    result = run_cli('--profile', '--output-mode', 'ndjson', 'migrate')
+    assert result.exit_code == 0, result.output
+    profile, = [event for event in read_events(result.output) if event['event'] == 'profile']
+    assert profile['counters']['tasks'] == 20
+    assert profile['counters']['imported'] == 20
+    assert 'write' in profile['stages']
+
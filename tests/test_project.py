@@ -0,0 +1,61 @@
+""" Project Tests
+
+Test resolving Todoist project hierarchies to Taskwarrior project names.
+"""
+import pytest
+from todoist_taskwarrior import utils
+from todoist_taskwarrior.mapping import Mapping
+
+
+def project(id, name, parent_id=None):
+    return {'id': id, 'name': name, 'parent_id': parent_id}
+
+
+PROJECTS = [
+    project(1, 'Programming'),
+    project(2, 'Open Source', parent_id=1),
+    project(3, 'Python', parent_id=2),
+    project(4, 'Taxes'),
+    project(5, 'Errands'),
+]
+
+
+def test_hierarchy():
+    index = utils.build_project_index(PROJECTS, Mapping())
+    assert index == {
+        1: 'Programming',
+        2: "'Programming.Open Source'",
+        3: "'Programming.Open Source.Python'",
+        4: 'Taxes',
+        5: 'Errands',
+    }
+
+
+def test_mapping():
+    index = utils.build_project_index(PROJECTS, Mapping([
+        ('Programming.Open Source', 'oss'),
+        ('Errands', 'chores'),
+        ('Taxes', None),
+    ]))
+    assert index[2] == 'oss'
+    assert index[3] == "'Programming.Open Source.Python'"
+    assert index[4] == ''
+    assert index[5] == 'chores'
+
+
+def test_children_before_parents():
+    index = utils.build_project_index(list(reversed(PROJECTS)), Mapping())
+    assert index[3] == "'Programming.Open Source.Python'"
+
+
+def test_missing_parent():
+    index = utils.build_project_index([project(2, 'Child', parent_id=1)], Mapping())
+    assert index == {2: 'Child'}
+
+
+def test_cycle():
+    index = utils.build_project_index([
+        project(1, 'A', parent_id=2),
+        project(2, 'B', parent_id=1),
+    ], Mapping())
+    assert index == {1: 'B.A', 2: 'B'}
@@ -0,0 +1,188 @@
+""" Rate Limit Tests
+
+Test retrying syncs, with backoff, within a request budget shared by
+processes, against the local Todoist sync API in `fakes`.
+"""
+import os
+import random
+import pytest
+import requests
+from click.testing import CliRunner
+from todoist_taskwarrior import cli, errors, ratelimit
+from fakes import todoist as fake_todoist
+
+
+TOKEN = 'token'
+URL = 'https://api.todoist.com' + fake_todoist.SYNC_PATH
+
+
+class Clock:
+    """A clock whose time only passes when sleeping. """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def fake():
+    return fake_todoist.FakeTodoist(items=5, token=TOKEN)
+
+
+def make_scheduler(fake, clock, bucket=None, **kwargs):
+    bucket = bucket or ratelimit.TokenBucket(clock=clock, sleep=clock.sleep)
+    return ratelimit.SyncScheduler(
+        fake_todoist.FakeSession(fake), bucket,
+        sleep=clock.sleep, rng=random.Random(0), **kwargs)
+
+
+def post(scheduler):
+    return scheduler.post(URL, data={'token': TOKEN, 'sync_token': '*'})
+
+
+def test_bucket_burst_then_rate(clock):
+    bucket = ratelimit.TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    clock.now += 10
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+
+
+def test_bucket_shared_by_file(tmp_path, clock):
+    path = str(tmp_path / 'token.ratelimit')
+    first = ratelimit.TokenBucket(path, rate=1, burst=2, clock=clock, sleep=clock.sleep)
+    second = ratelimit.TokenBucket(path, rate=1, burst=2, clock=clock, sleep=clock.sleep)
+    assert first.acquire() == 0
+    assert second.acquire() == 0
+    assert first.acquire() == pytest.approx(1)
+
+    second.block(30)
+    assert first.acquire() == pytest.approx(30)
+
+
+def test_bucket_corrupt_file(tmp_path, clock):
+    path = tmp_path / 'token.ratelimit'
+    path.write_text('{not json')
+    bucket = ratelimit.TokenBucket(str(path), clock=clock, sleep=clock.sleep)
+    assert bucket.acquire() == 0
+
+
+def test_retries_server_errors(fake, clock):
+    fake.fail_next(status=503, count=2)
+    scheduler = make_scheduler(fake, clock)
+    assert post(scheduler).status_code == 200
+    assert scheduler.stats['requests'] == 3
+    assert scheduler.stats['retries'] == 2
+    # Full jitter: each wait is at most the doubling backoff
+    assert len(clock.slept) == 2
+    assert 0 <= clock.slept[0] <= 1
+    assert 0 <= clock.slept[1] <= 2
+    assert scheduler.stats['backoff_wait'] == pytest.approx(sum(clock.slept))
+
+
+def test_honours_retry_after(fake, clock):
+    fake.fail_next(status=429, retry_after=7)
+    bucket = ratelimit.TokenBucket(clock=clock, sleep=clock.sleep)
+    scheduler = make_scheduler(fake, clock, bucket)
+    assert post(scheduler).status_code == 200
+    assert 7 <= clock.slept[0] <= 8
+    # Other processes sharing the bucket wait as well
+    assert bucket._state['blocked_until'] == pytest.approx(clock.now)
+
+
+def test_retry_after_from_body(fake, clock):
+    fake.fail_next(status=429, body={'error': 'Too many requests', 'error_extra': {'retry_after': 4}})
+    scheduler = make_scheduler(fake, clock)
+    assert post(scheduler).status_code == 200
+    assert 4 <= clock.slept[0] <= 5
+
+
+def test_rate_limited_server(fake, clock):
+    fake.set_rate_limit(2, 60)
+    scheduler = make_scheduler(fake, clock)
+    assert [post(scheduler).status_code for _ in range(2)] == [200, 200]
+
+    # The fake measures its window in real time, so lift the limit after the
+    # first 429, as if its Retry-After had passed
+    fail = fake.sync
+    def sync(form):
+        response = fail(form)
+        fake.set_rate_limit(None, None)
+        return response
+    fake.sync = sync
+
+    assert post(scheduler).status_code == 200
+    assert scheduler.stats['retries'] == 1
+    assert clock.slept[0] >= 1
+
+
+def test_gives_up_after_max_retries(fake, clock):
+    fake.fail_next(status=502, count=10)
+    scheduler = make_scheduler(fake, clock, max_retries=3)
+    with pytest.raises(errors.SyncError) as e:
+        post(scheduler)
+    assert e.value.status == 502
+    assert 'after 3 retries' in str(e.value)
+    assert scheduler.stats['requests'] == 4
+
+
+def test_client_errors_fail_fast(fake, clock):
+    scheduler = make_scheduler(fake, clock)
+    with pytest.raises(errors.SyncError) as e:
+        scheduler.post(URL, data={'token': 'other'})
+    assert e.value.status == 401
+    assert 'Invalid token' in str(e.value)
+    assert scheduler.stats['requests'] == 1
+    assert clock.slept == []
+
+
+def test_retries_connection_errors(clock):
+    class FlakySession:
+        calls = 0
+
+        def post(self, url, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                raise requests.ConnectionError('Connection refused')
+            return fake_todoist.FakeResponse(200, {}, {})
+
+    scheduler = ratelimit.SyncScheduler(
+        FlakySession(), ratelimit.TokenBucket(clock=clock, sleep=clock.sleep),
+        sleep=clock.sleep, rng=random.Random(0))
+    assert scheduler.post(URL).status_code == 200
+    assert scheduler.stats['retries'] == 1
+
+
+def test_synchronize_retries(fake, tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, 'TODOIST_CACHE', str(tmp_path) + os.sep)
+    monkeypatch.setattr(ratelimit, 'BACKOFF_BASE', 0.01)
+    fake.fail_next(status=503, count=2)
+    server = fake_todoist.serve(fake)
+    try:
+        result = CliRunner().invoke(cli.cli, [
+            '--todoist-api-key', TOKEN, '--todoist-api-endpoint', server.url, 'synchronize',
+        ], catch_exceptions=False)
+        assert result.exit_code == 0, result.output
+        assert 'Sync requests: 3 (2 retried)' in result.output
+        assert (tmp_path / (TOKEN + '.ratelimit')).exists()
+
+        result = CliRunner().invoke(cli.cli, [
+            '--todoist-api-key', 'other', '--todoist-api-endpoint', server.url, 'synchronize',
+        ], catch_exceptions=False)
+        assert result.exit_code == 1
+        assert 'Sync failed: HTTP 401 (Invalid token)' in result.output
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -193,3 +193,18 @@ def test_unsupported():
     with pytest.raises(errors.UnsupportedRecurrence):
         utils.parse_recur_string('every monday,tuesday,wednesday')
 
+
+
+def test_cached():
+    utils._parse_normalized_recur.cache_clear()
+    assert utils.parse_recur_string('every day') == 'daily'
+    assert utils.parse_recur_string('  Every   Day ') == 'daily'
+
+    # Unsupported recurrences are remembered too
+    for _ in range(2):
+        with pytest.raises(errors.UnsupportedRecurrence):
+            utils.parse_recur_string('every mon,tues')
+
+    info = utils._parse_normalized_recur.cache_info()
+    assert info.hits == 2
+    assert info.misses == 2
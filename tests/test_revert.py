@@ -0,0 +1,99 @@
+""" Revert Tests
+
+Test removing migrated tasks with `revert`, against the fakes in
+`fakes`.
+"""
+from todoist_taskwarrior import state
+from conftest import migrated_ids
+
+
+def read_state(cache_dir):
+    return state.StateStore(str(cache_dir / 'token.state')).tasks
+
+
+def project_tasks(todoist_server):
+    """Returns the id of a project, and the ids of its tasks. """
+    items = todoist_server.fake.objects['items'].values()
+    project_id = next(item['project_id'] for item in items)
+    return project_id, sorted(str(item['id']) for item in items if item['project_id'] == project_id)
+
+
+def test_revert(run_cli, cache_dir, taskwarrior):
+    run_cli('migrate')
+    assert len(migrated_ids(taskwarrior)) == 20
+
+    result = run_cli('revert', '--yes')
+    assert result.exit_code == 0, result.output
+    assert 'Removing 20 tasks... OK' in result.output
+    assert migrated_ids(taskwarrior) == []
+    assert all(task['status'] == 'deleted' and task['end'] for task in taskwarrior.values())
+    assert read_state(cache_dir) == {}
+
+    result = run_cli('revert', '--yes')
+    assert 'No migrated tasks found' in result.output
+
+
+def test_revert_asks_for_confirmation(run_cli, taskwarrior):
+    run_cli('migrate')
+
+    result = run_cli('revert', input='n\n')
+    assert result.exit_code == 1
+    assert 'Are you sure you want to remove 20 tasks?' in result.output
+    assert len(migrated_ids(taskwarrior)) == 20
+
+
+def test_revert_dry_run(run_cli, cache_dir, taskwarrior):
+    run_cli('migrate')
+
+    result = run_cli('revert', '--dry-run')
+    assert result.exit_code == 0, result.output
+    assert '20 tasks would be removed' in result.output
+    assert len(migrated_ids(taskwarrior)) == 20
+    assert len(read_state(cache_dir)) == 20
+
+
+def test_revert_filtered(run_cli, cache_dir, todoist_server, taskwarrior):
+    project_id, reverted = project_tasks(todoist_server)
+    run_cli('migrate')
+    migrated = migrated_ids(taskwarrior)
+
+    result = run_cli('revert', '--yes', '--filter-proj-id', str(project_id))
+    assert result.exit_code == 0, result.output
+    assert migrated_ids(taskwarrior) == sorted(set(migrated) - set(reverted))
+    assert sorted(read_state(cache_dir)) == migrated_ids(taskwarrior)
+
+
+def test_revert_keeps_skip_decisions(run_cli, cache_dir, taskwarrior):
+    run_cli('migrate')
+    store = state.StateStore(str(cache_dir / 'token.state'))
+    store.update('999', outcome=state.SKIPPED)
+    store.close()
+
+    run_cli('revert', '--yes')
+    assert read_state(cache_dir) == {'999': {'outcome': state.SKIPPED}}
+
+
+def test_migrate_after_revert(run_cli, todoist_server, taskwarrior):
+    project_id, reverted = project_tasks(todoist_server)
+    run_cli('migrate')
+    run_cli('revert', '--yes', '--filter-proj-id', str(project_id))
+
+    result = run_cli('migrate', '--no-sync')
+    assert result.exit_code == 0, result.output
+    assert f'Starting migration of {len(reverted)} tasks' in result.output
+    assert len(migrated_ids(taskwarrior)) == 20
+
+
+def test_filter_help_per_command(run_cli):
+    for command, action in [('migrate', 'migrate'), ('export', 'export'), ('revert', 'revert')]:
+        result = run_cli(command, '--help')
+        assert f'Only {action} the task matching the given ID' in result.output
+        assert 'Only import' not in result.output
+
+
+def test_revert_confirms_after_writing_output(run_cli, taskwarrior):
+    run_cli('migrate')
+
+    result = run_cli('revert', input='n\n')
+    loading = result.output.index('Loading existing Taskwarrior tasks... OK')
+    assert loading < result.output.index('Are you sure you want to remove 20 tasks?')
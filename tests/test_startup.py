@@ -0,0 +1,18 @@
+""" Startup Tests
+
+Test that the CLI doesn't import its heavy dependencies until a command
+needs them.
+"""
+import subprocess
+import sys
+
+
+def test_lazy_imports():
+    code = (
+        'import sys, todoist_taskwarrior.cli; '
+        'print(" ".join(sorted({m.split(".")[0] for m in sys.modules})))'
+    )
+    output = subprocess.check_output([sys.executable, '-c', code])
+    modules = output.decode().split()
+    for module in ('todoist', 'taskw', 'dateutil', 'requests'):
+        assert module not in modules
@@ -0,0 +1,111 @@
+""" State Tests
+
+Test the persistent state of the migration.
+"""
+import pytest
+from todoist_taskwarrior import state
+from conftest import migrated_ids
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'token.state')
+
+
+def test_memory():
+    store = state.StateStore()
+    assert store.get(1) == {}
+    store.update(1, outcome=state.SKIPPED)
+    assert store.outcome(1) == state.SKIPPED
+    store.close()
+
+
+def test_persist(path):
+    store = state.StateStore(path)
+    store.update(1, outcome=state.IMPORTED, uuid='abc')
+    store.update(2, recur='weekly', recur_string='every mon,tues')
+    store.update(2, outcome=state.SKIPPED)
+    store.update(3, outcome=state.FAILED, error='locked')
+    store.forget(3)
+    store.close()
+
+    store = state.StateStore(path)
+    assert store.get(1) == {'outcome': state.IMPORTED, 'uuid': 'abc'}
+    assert store.get('2') == {
+        'outcome': state.SKIPPED,
+        'recur': 'weekly',
+        'recur_string': 'every mon,tues',
+    }
+    assert store.get(3) == {}
+
+
+def test_partial_line(path):
+    with open(path, 'w') as f:
+        f.write('{"tid": "1", "outcome": "skipped"}\n{"tid": "2", "outc')
+
+    store = state.StateStore(path)
+    assert store.outcome(1) == state.SKIPPED
+    assert store.outcome(2) is None
+
+
+def test_compact(path, monkeypatch):
+    monkeypatch.setattr(state, 'COMPACT_THRESHOLD', 5)
+    store = state.StateStore(path)
+    for _ in range(10):
+        store.update(1, outcome=state.FAILED)
+    store.update(1, outcome=state.IMPORTED)
+    store.close()
+
+    store = state.StateStore(path)
+    assert store.outcome(1) == state.IMPORTED
+    with open(path) as f:
+        assert len(f.readlines()) == 1
+
+
+def test_skipped_tasks_stay_skipped(run_cli, cache_dir, taskwarrior):
+    # Skip the first task, and import the others
+    result = run_cli('migrate', '--interactive', input='n\n' + 'y\n' * 19)
+    assert result.exit_code == 0, result.output
+    skipped = [tid for tid, entry in state.StateStore(str(cache_dir / 'token.state')).tasks.items()
+               if entry['outcome'] == state.SKIPPED]
+    assert len(skipped) == 1
+    assert len(migrated_ids(taskwarrior)) == 19
+
+    result = run_cli('migrate', '--no-sync')
+    assert result.exit_code == 0, result.output
+    assert 'Skipping 1 tasks skipped in previous runs' in result.output
+    assert len(migrated_ids(taskwarrior)) == 19
+
+    result = run_cli('migrate', '--no-sync', '--interactive')
+    assert 'Import this task?' not in result.output
+
+    result = run_cli('migrate', '--no-sync', '--include-skipped')
+    assert result.exit_code == 0, result.output
+    assert skipped[0] in migrated_ids(taskwarrior)
+    assert len(migrated_ids(taskwarrior)) == 20
+
+
+def test_skipped_tasks_offered_again(run_cli, taskwarrior):
+    run_cli('migrate', '--interactive', input='n\n' + 'y\n' * 19)
+
+    result = run_cli('migrate', '--no-sync', '--interactive', '--include-skipped', input='y\n')
+    assert result.exit_code == 0, result.output
+    assert result.output.count('Import this task?') == 1
+    assert len(migrated_ids(taskwarrior)) == 20
+
+
+def test_deleted_tasks_stay_deleted(run_cli, todoist_server, taskwarrior):
+    run_cli('migrate')
+    deleted = next(iter(taskwarrior.values()))
+    deleted.update(status='deleted', end='20200101T000000Z')
+
+    result = run_cli('migrate', '--no-sync')
+    assert result.exit_code == 0, result.output
+    assert len(migrated_ids(taskwarrior)) == 19
+
+    todoist_server.fake.change_items(20)
+    result = run_cli('migrate', '--update')
+    assert result.exit_code == 0, result.output
+    assert 'Skipping 1 tasks deleted from Taskwarrior since they were imported' in result.output
+    assert len(migrated_ids(taskwarrior)) == 19
+    assert deleted['todoist_id'] not in migrated_ids(taskwarrior)
@@ -0,0 +1,122 @@
+""" Sync Tests
+
+Test synchronizing with the local Todoist sync API in `fakes`.
+"""
+import json
+import os
+import pytest
+from click.testing import CliRunner
+from todoist_taskwarrior import cli
+from fakes import todoist as fake_todoist
+
+
+TOKEN = 'token'
+
+
+@pytest.fixture
+def fake():
+    return fake_todoist.FakeTodoist(items=50, token=TOKEN)
+
+
+@pytest.fixture
+def server(fake):
+    server = fake_todoist.serve(fake)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, 'TODOIST_CACHE', str(tmp_path) + os.sep)
+    return tmp_path
+
+
+def synchronize(server, token=TOKEN):
+    return CliRunner().invoke(cli.cli, [
+        '--todoist-api-key', token,
+        '--todoist-api-endpoint', server.url,
+        'synchronize',
+    ], catch_exceptions=False)
+
+
+def read_cache(cache_dir):
+    with open(cache_dir / (TOKEN + '.json')) as f:
+        state = json.load(f)
+    return state, (cache_dir / (TOKEN + '.sync')).read_text()
+
+
+def test_full_and_incremental_sync(fake, server, cache_dir):
+    result = synchronize(server)
+    assert result.exit_code == 0, result.output
+    state, sync_token = read_cache(cache_dir)
+    assert len(state['items']) == 50
+    assert sync_token == 'fake-1'
+
+    changed = fake.change_items(3)
+    fake.delete_items(changed[:1])
+    synchronize(server)
+    state, sync_token = read_cache(cache_dir)
+    assert len(state['items']) == 49
+    assert sync_token == 'fake-3'
+    contents = {item['id']: item['content'] for item in state['items']}
+    assert all(contents[tid].endswith('(edited)') for tid in changed[1:])
+    assert fake.requests == 2
+
+
+def test_incremental_response(fake):
+    first = fake.sync({'token': TOKEN, 'sync_token': '*'})[2]
+    assert first['full_sync']
+    assert len(first['items']) == 50
+    assert len(first['projects']) == 10
+
+    changed = fake.change_items(2)
+    status, _, delta = fake.sync({'token': TOKEN, 'sync_token': first['sync_token']})
+    assert status == 200
+    assert not delta['full_sync']
+    assert sorted(item['id'] for item in delta['items']) == sorted(changed)
+    assert delta['projects'] == []
+
+
+def test_invalid_token(fake):
+    status, _, body = fake.sync({'token': 'other', 'sync_token': '*'})
+    assert status == 401
+
+
+def test_injected_errors(fake):
+    fake.fail_next(status=502, count=2, retry_after=3)
+    for _ in range(2):
+        status, headers, _ = fake.sync({'token': TOKEN})
+        assert (status, headers) == (502, {'Retry-After': '3'})
+    assert fake.sync({'token': TOKEN})[0] == 200
+
+
+def test_rate_limit(fake):
+    fake.set_rate_limit(2, 60)
+    statuses = [fake.sync({'token': TOKEN})[0] for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+    status, headers, body = fake.sync({'token': TOKEN})
+    assert body['error_tag'] == 'LIMITS_REACHED'
+    assert 1 <= int(headers['Retry-After']) <= 60
+
+
+def test_session_transport(fake):
+    from todoist.api import TodoistAPI
+
+    api = TodoistAPI(TOKEN, session=fake_todoist.FakeSession(fake), cache=None)
+    api.sync()
+    assert len(api.state['items']) == 50
+    assert api.sync_token == 'fake-1'
+
+
+def test_migrate_with_truncated_cache(server, cache_dir):
+    synchronize(server)
+    path = cache_dir / (TOKEN + '.json')
+    path.write_bytes(path.read_bytes()[:-100])
+
+    result = CliRunner().invoke(cli.cli, [
+        '--todoist-api-key', TOKEN, 'migrate', '--no-sync',
+    ], catch_exceptions=False)
+    assert result.exit_code == 1
+    assert 'is incomplete or corrupt (cut short). Run `synchronize`' in result.output
@@ -0,0 +1,76 @@
+""" Task Index Tests
+
+Test indexing the migrated Taskwarrior tasks by `todoist_id`.
+"""
+import pytest
+from todoist_taskwarrior import cli, state
+from fakes.taskwarrior import FakeTaskWarrior
+
+
+def make_task(uuid, **kwargs):
+    return {'uuid': uuid, 'description': uuid, 'status': 'pending', **kwargs}
+
+
+@pytest.fixture
+def tw(monkeypatch):
+    tw = FakeTaskWarrior()
+    for task in [
+        make_task('a', todoist_id='1'),
+        make_task('b', todoist_id=2, status='recurring', recur='weekly'),
+        make_task('c', todoist_id='2', parent='b'),
+        make_task('d', todoist_id='3', status='deleted'),
+        make_task('e', todoist_id='4', status='completed'),
+        make_task('f'),
+    ]:
+        tw.tasks[task['uuid']] = task
+    monkeypatch.setattr(cli, 'taskwarrior', tw)
+    return tw
+
+
+def test_export_migrated_tasks(tw):
+    migrated = cli.export_migrated_tasks()
+    assert {tid: task['uuid'] for tid, task in migrated.items()} == {
+        '1': 'a',
+        '2': 'b',
+        '4': 'e',
+    }
+    assert tw.calls == 1
+
+
+def test_build_task_index(tw):
+    assert cli.build_task_index() == {'1': 'a', '2': 'b', '4': 'e'}
+    assert cli.build_task_index({'5': make_task('g')}) == {'5': 'g'}
+
+
+def test_check_task_exists(monkeypatch):
+    monkeypatch.setattr(cli, 'task_index', {'1': 'a'})
+    monkeypatch.setattr(cli, 'state_store', state.StateStore())
+    cli.state_store.update(3, outcome=state.IMPORTED, uuid='c')
+    cli.state_store.update(4, outcome=state.FAILED, error='locked')
+
+    assert cli.check_task_exists(1)
+    assert cli.check_task_exists('1')
+    assert cli.check_task_exists(3)
+    assert not cli.check_task_exists(2)
+    assert not cli.check_task_exists(4)
+
+
+def test_migrate_exports_migrated_tasks_once(run_cli, cache_dir, taskwarrior, monkeypatch):
+    result = run_cli('migrate', '--batch-size', '5')
+    assert result.exit_code == 0, result.output
+
+    # Without the state store, migrated tasks are only known from Taskwarrior
+    (cache_dir / 'token.state').unlink()
+
+    calls = []
+    filter_tasks = FakeTaskWarrior.filter_tasks
+    def record(self, filter_dict):
+        calls.append(filter_dict)
+        return filter_tasks(self, filter_dict)
+    monkeypatch.setattr(FakeTaskWarrior, 'filter_tasks', record)
+
+    result = run_cli('migrate', '--no-sync')
+    assert result.exit_code == 0, result.output
+    assert calls == [{'todoist_id.any': '', 'status.not': 'deleted'}]
+    assert 'Importing' not in result.output
+    assert len(taskwarrior) == 20
@@ -3,6 +3,7 @@
 Test argument/option validations
 """
 import click
+import io
 import pytest
 from todoist_taskwarrior import validation
 
@@ -19,18 +20,48 @@ def validate(fn, value):
 
 def test_validate_map():
     # Simple
-    assert validate(validation.validate_map, ('HELLO=WORLD',)) == {'HELLO': 'WORLD'}
+    assert validate(validation.validate_map, ('HELLO=WORLD',)).rules == [('HELLO', 'WORLD')]
 
     # Missing DST
-    assert validate(validation.validate_map, ('HELLO=',)) == {'HELLO': None}
+    assert validate(validation.validate_map, ('HELLO=',)).rules == [('HELLO', None)]
 
     # Multiple
-    assert validate(validation.validate_map, ('FOO=BAR', 'BAR=BAZZ')) == {'FOO': 'BAR', 'BAR': 'BAZZ'}
+    assert validate(validation.validate_map, ('FOO=BAR', 'BAR=BAZZ')).rules == [('FOO', 'BAR'), ('BAR', 'BAZZ')]
 
     # Invalid, no '='
     with pytest.raises(click.BadParameter):
         assert validate(validation.validate_map, ('FOO',)) == None
 
     # Hierarchical src
-    assert validate(validation.validate_map, ('foo.bar=bazz',)) == {'foo.bar': 'bazz'}
-    assert validate(validation.validate_map, ('foo bar.bazz=bazz',)) == {'foo bar.bazz': 'bazz'}
+    assert validate(validation.validate_map, ('foo.bar=bazz',)).rules == [('foo.bar', 'bazz')]
+    assert validate(validation.validate_map, ('foo bar.bazz=bazz',)).rules == [('foo bar.bazz', 'bazz')]
+
+
+def test_validate_map_patterns():
+    m = validate(validation.validate_map, ('Work.*=work', 'Taxes='))
+    assert m.lookup('Taxes') == None
+    assert m.translate('Work.Admin') == 'work'
+
+    # Invalid regex
+    with pytest.raises(click.BadParameter):
+        validate(validation.validate_map, ('re:(=foo',))
+
+
+def test_validate_map_file():
+    assert validate(validation.validate_map_file, None) == {'project': [], 'tag': []}
+
+    value = io.StringIO(
+        '# Projects\n'
+        'project Work.*=work\n'
+        '\n'
+        'project Taxes=\n'
+        'tag books=reading\n'
+    )
+    assert validate(validation.validate_map_file, value) == {
+        'project': [('Work.*', 'work'), ('Taxes', None)],
+        'tag': [('books', 'reading')],
+    }
+
+    # Unknown kind
+    with pytest.raises(click.BadParameter):
+        validate(validation.validate_map_file, io.StringIO('label foo=bar\n'))
@@ -0,0 +1,255 @@
+"""Migration of several Todoist accounts at once
+
+A manifest lists the accounts, each migrated to its own Taskwarrior data by
+running `cli migrate` (which synchronizes first, unless --no-sync) in a pool
+of processes. The output of each account goes to its own log file, and a
+report of every account is printed once they are all done.
+
+The manifest is a JSON array of objects with the keys:
+
+- `name`: names the account in the report and its log file, defaulting to
+  its position in the manifest. As it is used as a file name, it may only
+  contain letters, digits and `_.@+-`, and can't start with a period
+- `api_key`, or `api_key_env`: the Todoist API key, or the environment
+  variable holding it
+- `taskrc`: the Taskwarrior config file (default: ~/.taskrc)
+- `map_project`, `map_tag`: lists of SRC=DST rules
+- `map_file`: a file of mapping rules, as for --map-file
+- `args`: a list of other `migrate` options, e.g. `["--batch-size", "500"]`
+
+Accounts are migrated without prompting: unsupported recurrences are left
+unset, with a warning in the log of the account.
+
+Relative paths are relative to the manifest.
+
+    $ python -m todoist_taskwarrior.accounts manifest.json --jobs 4
+"""
+
+import click
+import contextlib
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import io
+
+
+# The profile counters shown in the report
+COUNTERS = ['tasks', 'imported', 'existing', 'updated', 'unchanged']
+
+# Account names, which name their log file in the log directory
+RE_NAME = re.compile(r'(?!\.)[\w.@+-]+\Z')
+
+
+def load_manifest(path):
+    """Reads and checks the manifest at `path`, returning its list of
+    accounts with defaults filled in and paths made absolute.
+    """
+    with open(path) as f:
+        try:
+            entries = json.load(f)
+        except ValueError as e:
+            raise click.BadParameter(f'invalid JSON ({e})')
+    if not isinstance(entries, list):
+        raise click.BadParameter('expected a JSON array of accounts')
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    resolve = lambda p: os.path.join(base_dir, os.path.expanduser(p))
+
+    accounts = []
+    names = set()
+    for idx, entry in enumerate(entries):
+        name = str(entry.get('name', idx))
+        if not RE_NAME.match(name):
+            raise click.BadParameter(f'account {name!r}: invalid name, expected '
+                                     'letters, digits and _.@+- not starting with a period')
+        if name in names:
+            raise click.BadParameter(f'account {name}: duplicate name')
+        names.add(name)
+
+        api_key = entry.get('api_key')
+        if 'api_key_env' in entry:
+            api_key = os.environ.get(entry['api_key_env'])
+        if not api_key:
+            raise click.BadParameter(f'account {name}: missing api_key or api_key_env')
+
+        accounts.append({
+            'name': name,
+            'api_key': api_key,
+            'taskrc': resolve(entry.get('taskrc', '~/.taskrc')),
+            'map_project': list(entry.get('map_project', [])),
+            'map_tag': list(entry.get('map_tag', [])),
+            'map_file': resolve(entry['map_file']) if 'map_file' in entry else None,
+            'args': [str(arg) for arg in entry.get('args', [])],
+        })
+    return accounts
+
+
+def migrate_args(account, sync=True, profile_json=None):
+    """Returns the `cli` arguments migrating `account`. """
+    args = [
+        '--todoist-api-key', account['api_key'],
+        '--tw-config-file', account['taskrc'],
+    ]
+    if profile_json:
+        args += ['--profile-json', profile_json]
+
+    # No one is there to answer prompts, as the input is /dev/null
+    args += ['migrate', '--sync' if sync else '--no-sync', '--unsupported-recur', 'warn']
+    for rule in account['map_project']:
+        args += ['--map-project', rule]
+    for rule in account['map_tag']:
+        args += ['--map-tag', rule]
+    if account['map_file']:
+        args += ['--map-file', account['map_file']]
+    return args + account['args']
+
+
+def run_account(account, log_dir, sync=True):
+    """Migrates `account` in this process, writing its output to a log file
+    in `log_dir`. Returns a dict with its `status` ('ok' or 'failed'), the
+    `error` if it failed, its duration in `seconds`, and its profile
+    `counters`.
+    """
+    from . import cli
+
+    log_path = os.path.join(log_dir, account['name'] + '.log')
+    fd, profile_json = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+
+    result = {'name': account['name'], 'log': log_path, 'status': 'ok', 'error': None}
+    start = time.perf_counter()
+    with open(log_path, 'w') as log, open(os.devnull) as stdin, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        # Logging is set up again by `cli`, on the redirected stderr, since
+        # a worker process may migrate several accounts
+        handlers = logging.root.handlers[:]
+        logging.root.handlers.clear()
+        sys.stdin, previous_stdin = stdin, sys.stdin
+        try:
+            cli.cli.main(
+                migrate_args(account, sync, profile_json),
+                prog_name=cli.__title__, standalone_mode=False,
+            )
+        except click.ClickException as e:
+            e.show()
+            result.update(status='failed', error=e.format_message())
+        except (Exception, SystemExit) as e:
+            logging.exception(f"ACCOUNT_FAILED name={account['name']}")
+            result.update(status='failed', error=str(e) or type(e).__name__)
+        finally:
+            io.flush()
+            sys.stdin = previous_stdin
+            logging.root.handlers[:] = handlers
+    result['seconds'] = time.perf_counter() - start
+
+    try:
+        with open(profile_json) as f:
+            result['counters'] = json.load(f)['counters']
+    except (FileNotFoundError, ValueError):
+        result['counters'] = {}
+    finally:
+        os.remove(profile_json)
+    return result
+
+
+def run_accounts(accounts, log_dir, jobs=1, sync=True):
+    """Migrates `accounts` on a pool of `jobs` processes, yielding the result
+    of each account (see `run_account`) as it finishes.
+    """
+    # Workers discard the output they copied from this process when forked,
+    # as this process writes it
+    with ProcessPoolExecutor(max_workers=jobs, initializer=io.set_output,
+                             initargs=('text', True)) as executor:
+        futures = [
+            executor.submit(run_account, account, log_dir, sync)
+            for account in accounts
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def format_report(results, seconds):
+    """Formats the results of the accounts as a table, followed by the
+    totals over all accounts and their throughput over `seconds`.
+    """
+    header = f"{'account':<20} {'status':<8}" + ''.join(f'{c:>10}' for c in COUNTERS)
+    lines = [header + f"{'seconds':>10} {'tasks/s':>9}"]
+
+    totals = dict.fromkeys(COUNTERS, 0)
+    for result in sorted(results, key=lambda r: r['name']):
+        counters = result['counters']
+        for counter in COUNTERS:
+            totals[counter] += counters.get(counter, 0)
+        rate = counters.get('tasks', 0) / result['seconds'] if result['seconds'] else 0
+        lines.append(
+            f"{result['name']:<20} {result['status']:<8}"
+            + ''.join(f'{counters.get(c, 0):>10}' for c in COUNTERS)
+            + f"{result['seconds']:>10.2f} {rate:>9.1f}"
+        )
+
+    failed = sum(1 for result in results if result['status'] != 'ok')
+    rate = totals['tasks'] / seconds if seconds else 0
+    lines.append(
+        f"{'total':<20} {'':<8}"
+        + ''.join(f'{totals[c]:>10}' for c in COUNTERS)
+        + f'{seconds:>10.2f} {rate:>9.1f}'
+    )
+    lines.append(f'\n{len(results) - failed} accounts migrated, {failed} failed')
+    return '\n'.join(lines)
+
+
+@click.command()
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=os.cpu_count() or 1,
+        help='Number of accounts migrated at once, each in its own process.')
+@click.option('--sync/--no-sync', default=True,
+        help='Enable/disable Todoist synchronization of the local task caches.')
+@click.option('--log-dir', type=click.Path(file_okay=False), default='logs',
+        help='Directory of the log file of each account.')
+@click.option('--report-json', type=click.Path(dir_okay=False, writable=True),
+        help='Also write the results of every account to this file as JSON.')
+def main(manifest, jobs, sync, log_dir, report_json):
+    """Migrate every Todoist account listed in MANIFEST to its own
+    Taskwarrior data, several accounts at a time.
+    """
+    try:
+        accounts = load_manifest(manifest)
+    except click.BadParameter as e:
+        e.param_hint = 'MANIFEST'
+        raise
+    os.makedirs(log_dir, exist_ok=True)
+
+    # Output is buffered, and written before exiting, including on failure
+    try:
+        io.important(f'Migrating {len(accounts)} accounts, {jobs} at a time...')
+        io.flush()
+        start = time.perf_counter()
+        results = []
+        for result in run_accounts(accounts, log_dir, jobs=jobs, sync=sync):
+            results.append(result)
+            if result['status'] == 'ok':
+                io.success(f"{result['name']}: OK ({result['seconds']:.1f}s)")
+            else:
+                io.error(f"{result['name']}: FAILED ({result['error']}), see {result['log']}")
+        seconds = time.perf_counter() - start
+
+        io.important('\nReport:')
+        io.info(format_report(results, seconds))
+        if report_json:
+            with open(report_json, 'w') as f:
+                json.dump({'seconds': seconds, 'accounts': results}, f, indent=2)
+    finally:
+        io.flush()
+
+    if any(result['status'] != 'ok' for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+"""Reading the local Todoist cache """
+
+import codecs
+import json
+import mmap
+import os
+import re
+
+from . import errors
+
+
+# The object types in the sync state, and the names of their models in
+# `todoist.models`, as in `TodoistAPI._update_state`
+STATE_MODELS = [
+    ('collaborators', 'Collaborator'),
+    ('collaborator_states', 'CollaboratorState'),
+    ('filters', 'Filter'),
+    ('items', 'Item'),
+    ('labels', 'Label'),
+    ('live_notifications', 'LiveNotification'),
+    ('notes', 'Note'),
+    ('project_notes', 'ProjectNote'),
+    ('projects', 'Project'),
+    ('reminders', 'Reminder'),
+]
+
+
+def load(api, cache):
+    """Reads the local cache in directory `cache` into `api`, a TodoistAPI
+    created without a cache, and sets it up to write the cache on sync.
+
+    `TodoistAPI` reads its cache by merging it in as if it was a sync
+    response, looking up every object in the state first, which takes
+    quadratic time. Objects in the cache are already unique, so here they
+    are loaded directly.
+    """
+    api.cache = os.path.expanduser(cache)
+    os.makedirs(api.cache, exist_ok=True)
+
+    try:
+        with open(api.cache + api.token + '.json') as f:
+            state = json.load(f)
+        with open(api.cache + api.token + '.sync') as f:
+            sync_token = f.read()
+    except (OSError, ValueError):
+        # As with TodoistAPI, a missing or corrupt cache means a full sync
+        return api
+
+    from todoist import models
+
+    for datatype, model_name in STATE_MODELS:
+        model = getattr(models, model_name)
+        api.state[datatype] = [
+            model(obj, api)
+            for obj in state.pop(datatype, [])
+            if not obj.get('is_deleted')
+        ]
+
+    api._update_state(state)
+    api.sync_token = sync_token
+    return api
+
+
+""" Streaming """
+
+# The fields of each object type used to migrate tasks, the only ones kept
+# by `CacheReader`
+FIELDS = {
+    'items': ('id', 'content', 'project_id', 'priority', 'labels', 'date_added', 'due'),
+    'projects': ('id', 'name', 'parent_id'),
+    'labels': ('id', 'name'),
+}
+
+# The object types that `CacheReader` keeps in memory once read. There are
+# few of them compared to items, which are read again on every use.
+SMALL_TYPES = ('projects', 'labels')
+
+CHUNK_SIZE = 1 << 16
+
+RE_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# The characters delimiting strings, objects and arrays, and the rest of a
+# string after its opening quote
+RE_DELIMITER = re.compile(r'["{}\[\]]')
+RE_STRING_END = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+DECODER = json.JSONDecoder()
+NUMBER_CHARS = '0123456789+-.eE'
+
+
+class CacheReader:
+    """Reads the local cache in directory `cache` incrementally, as an
+    alternative to loading it into a `TodoistAPI` when not synchronizing.
+
+    It provides the parts of `TodoistAPI` used to migrate tasks, but objects
+    are plain dicts holding only the `FIELDS` that are used, and items are
+    parsed from the cache file as they are iterated over, so that memory use
+    doesn't grow with the size of the cache.
+    """
+
+    def __init__(self, cache, token):
+        cache = os.path.expanduser(cache)
+        self.token = token
+        self.path = os.path.join(cache, token + '.json')
+
+        try:
+            with open(os.path.join(cache, token + '.sync')) as f:
+                self.sync_token = f.read()
+        except OSError:
+            # As with TodoistAPI, there is no cache without a sync token
+            self.path = None
+            self.sync_token = '*'
+
+        if self.path:
+            check_complete(self.path)
+
+        self._small = None
+        self.items = Objects(self, 'items')
+        self.projects = Objects(self, 'projects')
+        self.labels = Objects(self, 'labels')
+
+    def iter(self, datatype):
+        """Yields the objects of `datatype` that aren't deleted. """
+        if datatype in SMALL_TYPES:
+            if self._small is None:
+                self._small = {t: [] for t in SMALL_TYPES}
+                for t, obj in self._iter_state(SMALL_TYPES):
+                    self._small[t].append(obj)
+            yield from self._small[datatype]
+            return
+
+        # Unless already read, the small types are gathered while reading
+        # the items, so that they don't need a pass of their own afterwards
+        if self._small is not None:
+            for _, obj in self._iter_state((datatype,)):
+                yield obj
+            return
+        small = {t: [] for t in SMALL_TYPES}
+        for t, obj in self._iter_state((datatype, *SMALL_TYPES)):
+            if t == datatype:
+                yield obj
+            else:
+                small[t].append(obj)
+        self._small = small
+
+    def _iter_state(self, datatypes):
+        if not self.path:
+            return
+        try:
+            for datatype, obj in iter_state(self.path, datatypes):
+                if not obj.get('is_deleted'):
+                    yield datatype, {k: obj[k] for k in FIELDS[datatype] if k in obj}
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError as e:
+            raise errors.CorruptCache(self.path, e.msg) from e
+
+
+def check_complete(path):
+    """Raises `errors.CorruptCache` if the cache file at `path` is empty, or
+    was cut short, as files written by an interrupted sync are, without
+    reading more than its end. A missing file is an empty cache.
+    """
+    try:
+        with open(path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(size - 64, 0))
+            end = f.read().rstrip()
+    except FileNotFoundError:
+        return
+    if not end:
+        raise errors.CorruptCache(path, 'empty file')
+    if not end.endswith(b'}'):
+        raise errors.CorruptCache(path, 'cut short')
+
+
+class Objects:
+    """The objects of a type in a `CacheReader`, like the managers of
+    `TodoistAPI`.
+    """
+
+    def __init__(self, reader, datatype):
+        self.reader = reader
+        self.datatype = datatype
+
+    def iter(self, filt=None):
+        return filter(filt, self.reader.iter(self.datatype))
+
+    def all(self, filt=None):
+        return list(self.iter(filt))
+
+
+def iter_state(path, datatypes):
+    """Yields `(datatype, obj)` for the objects of the given types in the
+    cache file at `path`, a JSON object of arrays, parsing it incrementally
+    from a memory map of the file. Other values are skipped without being
+    parsed, up to the last of the given types.
+    """
+    remaining = set(datatypes)
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # The file is empty
+            raise json.JSONDecodeError('Empty cache', '', 0)
+
+        with data:
+            parser = StreamParser(data)
+            parser.expect('{')
+            if parser.peek() == '}':
+                return
+            while True:
+                datatype = parser.value()
+                parser.expect(':')
+                if datatype in datatypes and parser.peek() == '[':
+                    for obj in parser.iter_array():
+                        yield datatype, obj
+                else:
+                    parser.skip()
+                remaining.discard(datatype)
+                if not remaining or parser.expect('}', ',') == '}':
+                    return
+
+
+class StreamParser:
+    """An incremental JSON parser over `data`, a bytes-like object of UTF-8.
+
+    Data is decoded one chunk at a time, and each value is parsed with
+    `json.JSONDecoder.raw_decode` once enough data is decoded, so that only
+    the value being parsed needs to be held in memory. Pages of a memory map
+    are released once decoded.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.released = 0
+
+    def _fill(self):
+        """Decodes the next chunk, returning False at the end of the data. """
+        if self.offset >= len(self.data):
+            return False
+        chunk = self.data[self.offset:self.offset + CHUNK_SIZE]
+        self.offset += len(chunk)
+        self._release()
+        final = self.offset >= len(self.data)
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final)
+        self.pos = 0
+        return True
+
+    def _release(self):
+        """Drops the pages of a memory map up to the current offset, which
+        were copied when decoded.
+        """
+        if not isinstance(self.data, mmap.mmap) or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        end = self.offset - self.offset % mmap.PAGESIZE
+        if end > self.released:
+            self.data.madvise(mmap.MADV_DONTNEED, self.released, end - self.released)
+            self.released = end
+
+    def peek(self):
+        """Returns the next non-whitespace character, or '' at the end. """
+        while True:
+            self.pos = RE_WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, *expected):
+        """Consumes the next non-whitespace character, which must be one of
+        `expected`, and returns it.
+        """
+        char = self.peek()
+        if not char or char not in expected:
+            raise json.JSONDecodeError(f'Expecting one of {expected}', self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Parses the next value. A value ending at the end of the buffer,
+        or followed by what could be more of a number, is only accepted once
+        there is no more data, since it may have been cut short.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if (end < len(self.buffer) and self.buffer[end] not in NUMBER_CHARS) or not self._fill():
+                self.pos = end
+                return value
+
+    def skip(self):
+        """Skips the next value. Objects and arrays are scanned for their
+        end one chunk at a time rather than parsed, so that skipping a large
+        one only holds a chunk of it in memory.
+        """
+        if self.peek() not in ('{', '['):
+            self.value()
+            return
+
+        depth = 0
+        while True:
+            match = RE_DELIMITER.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self._fill():
+                    raise json.JSONDecodeError('Unterminated value', self.buffer, self.pos)
+                continue
+
+            char = match.group()
+            if char == '"':
+                end = RE_STRING_END.match(self.buffer, match.end())
+                if end is None:
+                    # The string continues in the next chunk
+                    self.pos = match.start()
+                    if not self._fill():
+                        raise json.JSONDecodeError('Unterminated string', self.buffer, self.pos)
+                    continue
+                self.pos = end.end()
+                continue
+
+            self.pos = match.end()
+            depth += 1 if char in '{[' else -1
+            if depth == 0:
+                return
+
+    def iter_array(self):
+        """Yields the values of the next array, one at a time. """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(']', ',') == ']':
+                return
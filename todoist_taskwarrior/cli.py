@@ -1,11 +1,15 @@
 import click
+import collections
+import contextlib
+import datetime
+import functools
+import json
 import logging
 import os
 import sys
+import tempfile
 
-from taskw import TaskWarrior
-from todoist.api import TodoistAPI
-from . import errors, io, utils, validation
+from . import cache, convert, errors, filters, io, journal, mapping, pipeline, profiling, ratelimit, state, utils, validation
 from . import __title__, __version__
 
 
@@ -13,8 +17,136 @@ from . import __title__, __version__
 # data will be cached.
 TODOIST_CACHE = '~/.todoist-sync/'
 
+# The clients, created by `load_todoist` and `load_taskwarrior` in the
+# commands that need them, from the `options` of the `cli` group
 todoist = None
 taskwarrior = None
+options = {}
+
+# Index of `todoist_id` -> Taskwarrior `uuid` for tasks that have
+# already been migrated. Built once per run by `build_task_index`.
+task_index = {}
+
+# The outcome of each task in previous runs, see `state.StateStore`. Opened
+# by the commands that use it, and otherwise kept in memory.
+state_store = state.StateStore()
+
+
+""" Shared Options """
+
+def mapping_options(fn):
+    """Adds the --map-project, --map-tag and --map-file options, which are
+    passed to the command as `map_project`, `map_tag` and `map_file`.
+    """
+    options = [
+        click.option('-p', '--map-project', metavar='SRC=DST', multiple=True,
+            callback=validation.validate_map,
+            help='Project names specified will be translated from SRC to DST. '
+                 'If DST is omitted, the project will be unset when SRC matches.'),
+        click.option('-t', '--map-tag', metavar='SRC=DST', multiple=True,
+            callback=validation.validate_map,
+            help='Tags specified will be translated from SRC to DST. '
+                 'If DST is omitted, the tag will be removed when SRC matches.'),
+        click.option('--map-file', type=click.File('r'),
+            callback=validation.validate_map_file,
+            help='Read --map-project/--map-tag rules from a file, with one '
+                 '"project SRC=DST" or "tag SRC=DST" rule per line. Rules given '
+                 'on the command line take precedence.'),
+    ]
+    for option in reversed(options):
+        fn = option(fn)
+    return fn
+
+
+def filter_options(action):
+    """Returns a decorator adding the --filter-* options, which are passed to
+    the command as `task_filters`, a dict of the filters that were given (see
+    `filters`). `action` is what the command does with the tasks, for the
+    help of the options, e.g. 'migrate'.
+    """
+    options = [
+        click.option('--filter-task-id', 'task_id', type=int,
+            help=f'Only {action} the task matching the given ID'),
+        click.option('--filter-proj-id', 'project_id', type=int,
+            help=f'Only {action} the tasks in the project matching the given ID'),
+        click.option('--filter-proj-tree', 'project_tree', type=int,
+            help=f'Only {action} the tasks in the project matching the given ID, '
+                 'or in its subprojects'),
+        click.option('--filter-label-id', 'label_ids', type=int, multiple=True,
+            help=f'Only {action} the tasks with the label matching the given ID. '
+                 'If given several times, tasks must have all of them.'),
+        click.option('--filter-priority', 'priorities', type=click.IntRange(1, 4), multiple=True,
+            help=f'Only {action} the tasks with this Todoist priority, from 1 '
+                 '(lowest) to 4. If given several times, tasks may have any of them.'),
+        click.option('--filter-due-after', 'due_after', type=click.DateTime(['%Y-%m-%d']),
+            help=f'Only {action} the tasks due on or after this date.'),
+        click.option('--filter-due-before', 'due_before', type=click.DateTime(['%Y-%m-%d']),
+            help=f'Only {action} the tasks due on or before this date.'),
+        click.option('--filter-recurring/--filter-non-recurring', 'recurring', default=None,
+            help=f'Only {action} recurring, or non-recurring, tasks.'),
+    ]
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            task_filters = {}
+            for name in filters.FILTERS:
+                value = kwargs.pop(name)
+                if isinstance(value, datetime.datetime):
+                    value = value.strftime('%Y-%m-%d')
+                if value is not None and value != ():
+                    task_filters[name] = value
+            return fn(*args, task_filters=task_filters, **kwargs)
+
+        for option in reversed(options):
+            wrapper = option(wrapper)
+        return wrapper
+    return decorator
+
+
+def load_todoist(offline=False):
+    """Creates the Todoist client, configured with the API key and the
+    local cache, unless it was already created.
+
+    When `offline`, i.e. the command won't synchronize, the cache is read
+    incrementally with a `cache.CacheReader` instead.
+    """
+    global todoist
+    if todoist is None and offline:
+        todoist = cache.CacheReader(TODOIST_CACHE, options['todoist_api_key'])
+    elif todoist is None:
+        from todoist.api import TodoistAPI
+        api = TodoistAPI(options['todoist_api_key'], cache=None)
+        if options.get('todoist_api_endpoint'):
+            api.api_endpoint = options['todoist_api_endpoint']
+        with profiling.profiler.stage('load'):
+            todoist = cache.load(api, TODOIST_CACHE)
+        api.session = ratelimit.SyncScheduler(
+            api.session, ratelimit.TokenBucket(data_path('ratelimit')))
+    return todoist
+
+
+def load_taskwarrior():
+    """Creates the TaskWarrior client, unless it was already created.
+
+    Config is overridden with the `todoist_id` field, which we use to track
+    migrated tasks and prevent imports, and the `todoist_fingerprint` field
+    used to detect changed tasks. The path to the taskwarrior config file
+    can be set with the flag, but otherwise, the TASKRC envvar will be used
+    if present. The taskwarrior default value is used if neither are
+    specified.
+    """
+    global taskwarrior
+    if taskwarrior is None:
+        from taskw import TaskWarrior
+        taskwarrior = TaskWarrior(
+            config_filename=options['tw_config_file'],
+            config_overrides={
+                'uda.todoist_id.type': 'string',
+                'uda.todoist_fingerprint.type': 'string',
+            },
+        )
+    return taskwarrior
 
 
 """ CLI Commands """
@@ -22,23 +154,46 @@ taskwarrior = None
 @click.group()
 @click.version_option(version=__version__, prog_name=__title__)
 @click.option('--todoist-api-key', envvar='TODOIST_API_KEY', required=True)
+@click.option('--todoist-api-endpoint', envvar='TODOIST_API_ENDPOINT',
+        help='Todoist server to synchronize with, e.g. a local one for testing.')
 @click.option('--tw-config-file', envvar='TASKRC', default='~/.taskrc')
 @click.option('--debug', is_flag=True, default=False)
-def cli(todoist_api_key, tw_config_file, debug):
+@click.option('--profile', is_flag=True, default=False,
+        help='Print the time spent in each stage of the command at exit.')
+@click.option('--profile-json', type=click.Path(dir_okay=False, writable=True),
+        help='Write the profile to this file as JSON (implies --profile).')
+@click.option('--output-mode', type=click.Choice(list(io.OUTPUTS)), default='text',
+        help='text: every message. progress: a progress bar instead of the '
+             'messages about each task. quiet: only warnings and errors. '
+             'ndjson: a JSON object per line for each task and for warnings '
+             'and errors.')
+@click.option('-q', '--quiet', is_flag=True, default=False,
+        help='Same as --output-mode quiet.')
+@click.pass_context
+def cli(ctx, todoist_api_key, todoist_api_endpoint, tw_config_file, debug, profile, profile_json,
+        output_mode, quiet):
     """Manage the migration of data from Todoist into Taskwarrior. """
     global todoist, taskwarrior
 
-    # Configure Todoist with API key and cache
-    todoist = TodoistAPI(todoist_api_key, cache=TODOIST_CACHE)
-
-    # Create the TaskWarrior client, overriding config with `todoist_id` field
-    # which we will use to track migrated tasks and prevent imports.
-    # The path to the taskwarrior config file can be set with the flag, but
-    # otherwise, the TASKRC envvar will be used if present. The taskwarrior
-    # default value is used if neither are specified.
-    taskwarrior = TaskWarrior(
-        config_filename=tw_config_file,
-        config_overrides={ 'uda.todoist_id.type': 'string' },
+    io.set_output('quiet' if quiet else output_mode)
+
+    if profile or profile_json:
+        profiling.enable()
+        profiling.profiler.track_cache('recur', utils._parse_normalized_recur)
+        profiling.profiler.track_cache('date', utils._parse_day)
+        ctx.call_on_close(lambda: report_profile(profile_json))
+
+    # Output is buffered, and written when the command exits, after the
+    # profile is reported
+    ctx.call_on_close(io.flush)
+
+    # The clients are only created when a command needs them, since importing
+    # them is slow compared to commands such as `clean`
+    todoist = taskwarrior = None
+    options.update(
+        todoist_api_key=todoist_api_key,
+        todoist_api_endpoint=todoist_api_endpoint,
+        tw_config_file=tw_config_file,
     )
 
     # Setup logging
@@ -59,8 +214,30 @@ def synchronize():
 
         ~/.todoist-sync
     """
-    with io.with_feedback('Syncing tasks with todoist'):
-        todoist.sync()
+    load_todoist()
+    scheduler = getattr(todoist, 'session', None)
+    try:
+        with io.with_feedback('Syncing tasks with todoist'), profiling.profiler.stage('sync'):
+            response = todoist.sync()
+    except errors.SyncError as e:
+        raise click.ClickException(str(e))
+    finally:
+        if isinstance(scheduler, ratelimit.SyncScheduler):
+            report_sync_stats(scheduler.stats)
+    return response
+
+
+def report_sync_stats(stats):
+    """Reports the retries and waiting of the requests made by a
+    `ratelimit.SyncScheduler`.
+    """
+    logging.debug('SYNC_STATS ' + ' '.join(f'{name}={value}' for name, value in stats.items()))
+    for name, value in stats.items():
+        profiling.profiler.count(f'sync_{name}', round(value, 3))
+    waited = stats['budget_wait'] + stats['backoff_wait']
+    if stats['retries'] or waited:
+        io.info(f"Sync requests: {stats['requests']} ({stats['retries']} retried), "
+                f'waited {waited:.1f}s for the Todoist rate limit')
 
 
 @cli.command()
@@ -90,20 +267,36 @@ def clean():
              'during the import.')
 @click.option('--sync/--no-sync', default=True,
         help='Enable/disable Todoist synchronization of the local task cache.')
-@click.option('-p', '--map-project', metavar='SRC=DST', multiple=True,
-        callback=validation.validate_map,
-        help='Project names specified will be translated from SRC to DST. '
-             'If DST is omitted, the project will be unset when SRC matches.')
-@click.option('-t', '--map-tag', metavar='SRC=DST', multiple=True,
-        callback=validation.validate_map,
-        help='Tags specified will be translated from SRC to DST. '
-             'If DST is omitted, the tag will be removed when SRC matches.')
-@click.option('--filter-task-id', type=int,
-        help='Only import a task matching the given ID')
-@click.option('--filter-proj-id', type=int,
-        help='Only import the tasks in the project matching the given ID')
+@click.option('--incremental', is_flag=True, default=False,
+        help='Only migrate the tasks added or changed since the last '
+             'complete migration.')
+@click.option('--update', is_flag=True, default=False,
+        help='Update already migrated tasks that were changed in Todoist.')
+@click.option('--unsupported-recur', type=click.Choice(['prompt', 'warn']), default='prompt',
+        help='Prompt for the recurrence of tasks whose recurrence is '
+             'unsupported, or warn and leave it unset, e.g. when no one is '
+             'there to answer. Output modes other than text always warn.')
+@click.option('--include-skipped', is_flag=True, default=False,
+        help='Also migrate the tasks skipped with `n` in a previous '
+             'interactive run, or offer them again with --interactive.')
+@click.option('-n', '--dry-run', is_flag=True, default=False,
+        help='Show what would be migrated, without prompting or writing '
+             'to Taskwarrior.')
+@click.option('--resume', is_flag=True, default=False,
+        help='Resume the last migration that was interrupted, from its last '
+             'checkpoint, using the local task cache.')
+@mapping_options
+@click.option('--batch-size', type=click.IntRange(min=0), default=0,
+        help='Import tasks in batches of this size with a single '
+             '`task import` per batch. 0 imports tasks one at a time.')
+@click.option('-w', '--workers', type=click.IntRange(min=1), default=1,
+        help='Number of threads converting tasks while they are written to '
+             'Taskwarrior, or while prompting in interactive mode.')
+@filter_options('migrate')
 @click.pass_context
-def migrate(ctx, interactive, sync, map_project, map_tag, filter_task_id, filter_proj_id):
+def migrate(ctx, interactive, sync, incremental, update, unsupported_recur, include_skipped,
+            dry_run, resume,
+            map_project, map_tag, map_file, batch_size, workers, task_filters):
     """Migrate tasks from Todoist to Taskwarrior.
 
     By default this command will synchronize with the Todoist servers
@@ -127,120 +320,663 @@ def migrate(ctx, interactive, sync, map_project, map_tag, filter_task_id, filter
     --map-project 'Programming.Open Source'=oss
     --map-project Taxes=
 
+    SRC may also be a glob or, prefixed with 're:', a regular expression whose
+    groups can be used in DST. Below, every project under 'Work' becomes
+    'work', and 'Clients.X' becomes 'client.X':
+    \r
+    --map-project 'Work.*'=work
+    --map-project 're:Clients\\.(.*)'='client.\\1'
+
+    Use --batch-size to import tasks in bulk using Taskwarrior's JSON import,
+    which is much faster for large accounts. In interactive mode, the next
+    tasks are converted while the user is answering, and confirmed tasks are
+    imported in the background, so --batch-size is not needed.
+
     This command can be run multiple times and will not duplicate tasks.
     This is tracked in Taskwarrior by setting and detecting the
     `todoist_id` property on the task.
+
+    Pass --incremental to only look at the tasks that Todoist reports as
+    added or changed since the last complete (unfiltered) migration. If the
+    task cache was synchronized in between, all tasks are migrated.
+
+    Pass --update to also update the tasks that were already migrated, if
+    their description, project, tags, priority or due date changed in
+    Todoist. This is detected with a fingerprint of these fields, stored in
+    the `todoist_fingerprint` property of the task, so that unchanged tasks
+    are skipped. Tasks migrated before fingerprints were stored are updated
+    once, and tasks deleted from Taskwarrior since are left deleted. Updates are imported in batches of --batch-size, or else with each
+    checkpoint, so that the tasks before a checkpoint are all written.
+
+    Pass --dry-run to see how many tasks would be created, skipped as
+    already existing, or remapped, per project, and which recurrences are
+    unsupported. Nothing is written and no prompts are shown.
+
+    Unless interactive, progress is checkpointed in a journal every
+    --batch-size tasks (or 100). If the migration is interrupted, pass
+    --resume, with the same filters and --update, to continue from the last
+    checkpoint without synchronizing or looking again at the tasks before
+    it. Only the tasks that were being written when it was interrupted are
+    looked up in Taskwarrior.
     """
+    global task_index, state_store
+
     logging.debug(
         f'MIGRATE version={__version__} interactive={interactive} '
-        f'sync={sync} map_project={map_project} map_tag={map_tag} '
-        f'filter_task_id={filter_task_id} filter_proj_id={filter_proj_id}'
+        f'sync={sync} incremental={incremental} update={update} '
+        f'include_skipped={include_skipped} dry_run={dry_run} resume={resume} '
+        f'map_project={map_project} map_tag={map_tag} '
+        f'batch_size={batch_size} workers={workers} task_filters={task_filters}'
     )
 
-    if sync:
-        ctx.invoke(synchronize)
-
-    # Build filter function
-    filt = {}
-    if filter_task_id:
-        filt['id'] = filter_task_id
-    if filter_proj_id:
-        filt['project_id'] = filter_proj_id
-    filter_fn = make_filter_fn(filt)
+    if resume and (interactive or dry_run):
+        raise click.UsageError('--resume cannot be used with --interactive or --dry-run')
+
+    # A run is resumed with the tasks of the cache it was started with
+    checkpoint = None
+    if resume:
+        checkpoint = journal.read(data_path('journal'))
+        if checkpoint is None:
+            io.warn('No interrupted migration to resume')
+            return
+        sync = False
+
+    map_project, map_tag = merge_mappings(map_project, map_tag, map_file)
+    load_todoist(offline=not sync)
+    load_taskwarrior()
+
+    if interactive and batch_size:
+        raise click.UsageError('--batch-size cannot be used with --interactive')
+    if interactive and dry_run:
+        raise click.UsageError('--dry-run cannot be used with --interactive')
+    if interactive and type(io.output) is not io.TextOutput:
+        raise click.UsageError('--interactive can only be used with --output-mode text')
+    if update and (interactive or dry_run):
+        raise click.UsageError('--update cannot be used with --interactive or --dry-run')
+
+    # The migration is only complete, and can be used as the starting
+    # point of an incremental one, if no filters were given.
+    is_complete = not task_filters
+
+    # If the cache is at the same sync token as the last complete migration,
+    # then only the items in the next sync delta have to be migrated
+    changed_ids = None
+    if checkpoint:
+        if checkpoint['run']['changed_ids'] is not None:
+            changed_ids = set(checkpoint['run']['changed_ids'])
+    else:
+        is_up_to_date = incremental and read_watermark() == todoist.sync_token
+        if sync:
+            response = ctx.invoke(synchronize)
+            if is_up_to_date and not response.get('full_sync'):
+                changed_ids = {item['id'] for item in response.get('items', [])}
+        elif is_up_to_date:
+            changed_ids = set()
+
+        if incremental and changed_ids is None:
+            io.warn('No previous migration at this sync point, migrating all tasks')
+    logging.debug(f'INCREMENTAL changed_ids={changed_ids}')
+
+    run = describe_run(task_filters, update, changed_ids)
+    if checkpoint and checkpoint['run'] != run:
+        raise click.UsageError(
+            'The interrupted migration was of other tasks, or the cache was '
+            'synchronized since. Run migrate without --resume.')
 
     # Get all matching Todoist tasks
-    tasks = todoist.items.all(filt=filter_fn)
+    tasks = get_tasks(task_filters)
+    if changed_ids is not None:
+        tasks = [task for task in tasks if task['id'] in changed_ids]
     if not tasks:
-        io.warn('No matching tasks found (are you using filters?)')
+        if changed_ids is not None:
+            io.info('No tasks changed since the last migration')
+            if is_complete:
+                write_watermark(todoist.sync_token)
+        else:
+            io.warn('No matching tasks found (are you using filters?)')
+        return
+
+    # What the command opens is closed in the reverse order when it exits,
+    # even if closing something else failed, so that the background writer
+    # records its last tasks before the state store is closed
+    resources = contextlib.ExitStack()
+    ctx.call_on_close(resources.close)
+
+    state_store = state.StateStore(data_path('state'))
+    resources.callback(state_store.close)
+
+    if checkpoint:
+        tasks = tasks_after_checkpoint(tasks, checkpoint)
+        if checkpoint['in_flight']:
+            recover_in_flight(checkpoint['in_flight'])
+        if not tasks:
+            io.info('All matching tasks were already migrated')
+            journal.Journal(data_path('journal')).finish()
+            if is_complete:
+                write_watermark(todoist.sync_token)
+            return
+
+    # Tasks imported by a previous run are skipped without looking them up
+    # in Taskwarrior, which is only needed if there are any others left.
+    # Tasks skipped interactively stay skipped, unless --include-skipped.
+    decided = set()
+    if not (update or dry_run):
+        decided.add(state.IMPORTED)
+    if not include_skipped:
+        decided.add(state.SKIPPED)
+    remaining = [task for task in tasks if state_store.outcome(task['id']) not in decided]
+    if len(remaining) < len(tasks):
+        counts = collections.Counter(state_store.outcome(task['id']) for task in tasks)
+        if state.IMPORTED in decided and counts[state.IMPORTED]:
+            io.info(f'Skipping {counts[state.IMPORTED]} tasks imported by previous runs')
+            profiling.profiler.count('existing', counts[state.IMPORTED])
+        if state.SKIPPED in decided and counts[state.SKIPPED]:
+            io.info(f'Skipping {counts[state.SKIPPED]} tasks skipped in previous runs '
+                    '(see --include-skipped)')
+            profiling.profiler.count('skipped', counts[state.SKIPPED])
+        tasks = remaining
+        if not tasks:
+            io.info('All matching tasks were already migrated or skipped')
+            if checkpoint:
+                journal.Journal(data_path('journal')).finish()
+            if is_complete:
+                write_watermark(todoist.sync_token)
+            return
+
+    # Index already migrated tasks with a single Taskwarrior export. This
+    # isn't needed to resume, since the tasks that existed when the run was
+    # started were then recorded in the state store.
+    if checkpoint and not update:
+        migrated = {}
+    else:
+        with io.with_feedback('Loading existing Taskwarrior tasks'):
+            with profiling.profiler.stage('task_index'):
+                migrated = export_migrated_tasks()
+    task_index = build_task_index(migrated)
+    logging.debug(f'TASK_INDEX size={len(task_index)}')
+
+    # Tasks imported by a previous run but no longer in Taskwarrior were
+    # deleted there, and aren't brought back by updating them
+    if update:
+        deleted = {str(task['id']) for task in tasks
+                   if str(task['id']) not in migrated
+                   and state_store.outcome(task['id']) == state.IMPORTED}
+        if deleted:
+            io.info(f'Skipping {len(deleted)} tasks deleted from Taskwarrior since they were imported')
+            profiling.profiler.count('existing', len(deleted))
+            tasks = [task for task in tasks if str(task['id']) not in deleted]
+            if not tasks:
+                if checkpoint:
+                    journal.Journal(data_path('journal')).finish()
+                if is_complete:
+                    write_watermark(todoist.sync_token)
+                return
+
+    if dry_run:
+        plan = convert.plan_migration(
+            todoist, tasks, map_project, map_tag,
+            exists=lambda task: check_task_exists(task['id']),
+            workers=workers,
+        )
+        print_plan(plan)
         return
 
+    def is_unchanged(task, data):
+        existing = migrated.get(str(task['id']))
+        return existing is not None and existing.get('todoist_fingerprint') == data.fingerprint
+
+    # Only the text output mode prompts, as the others are read by programs
+    # or would garble the progress bar
+    prompt_recur = unsupported_recur == 'prompt' and type(io.output) is io.TextOutput
+
+    # Tasks are converted on a pool of workers while they are written to
+    # Taskwarrior, or prompted for, here, one at a time, in their original
+    # order. When updating, migrated tasks are converted too, to compare
+    # fingerprints.
+    converted = convert.iter_converted_tasks(
+        todoist, tasks, map_project, map_tag,
+        exclude=None if update else lambda task: check_task_exists(task['id']),
+        exclude_converted=is_unchanged if update else None,
+        parse_recur=lambda task: parse_recur_or_prompt(
+            utils.try_get_model_prop(task, 'due'), task['content'], task['id'],
+            prompt=prompt_recur),
+        workers=workers,
+    )
+
+    # Confirmed tasks are imported in the background, so that the next
+    # prompt doesn't wait on Taskwarrior. They are all imported before the
+    # command exits, including with `q` or on errors.
+    writer = None
+    if interactive:
+        writer = pipeline.BackgroundWriter(lambda batch: add_tasks(batch, feedback=False))
+        resources.callback(finish_writes, writer)
+
+    # Otherwise, progress is journaled in windows of tasks
+    run_journal = None
+    window = batch_size or journal.WINDOW_SIZE
+    committed = checkpoint['count'] if checkpoint else 0
+    if not interactive:
+        run_journal = journal.Journal(data_path('journal'))
+        resources.callback(run_journal.close)
+        if checkpoint:
+            run_journal.resume()
+        else:
+            if journal.read(data_path('journal')):
+                io.warn('Starting over, the interrupted migration could have been resumed with --resume')
+            record_existing_tasks(tasks)
+            run_journal.start(**run)
+
+    batch = []
+    updates = []
+
+    def flush(end):
+        """Writes the pending batches, and commits the window of tasks
+        ending before `end` to the journal.
+        """
+        nonlocal batch, updates
+        if batch:
+            add_tasks(batch)
+            batch = []
+        if updates:
+            update_tasks(updates)
+            updates = []
+        if run_journal and end:
+            state_store.sync()
+            run_journal.commit(tasks[end - 1]['id'], committed + end)
+
     io.important(f'Starting migration of {len(tasks)} tasks...')
-    for idx, task in enumerate(tasks):
-        data = {}
-        tid = data['tid'] = task['id']
-        name = data['name'] = task['content']
+    io.start_progress(len(tasks), 'Migrating')
+    for idx, (task, data) in enumerate(converted):
+        tid = task['id']
+        io.advance()
+        if run_journal and idx % window == 0:
+            if idx:
+                flush(idx)
+            run_journal.begin([t['id'] for t in tasks[idx:idx + window]])
 
         # Log message and check if exists
-        io.important(f'Task {idx + 1} of {len(tasks)}: {name}')
+        io.important(f"Task {idx + 1} of {len(tasks)}: {task['content']}")
         logging.debug(f'ITER_TASK task={task}')
-        if check_task_exists(tid):
+        profiling.profiler.count('tasks')
+        if data is None and update:
+            io.info(f'Unchanged (todoist_id={tid})')
+            io.event('task', todoist_id=str(tid), outcome='unchanged')
+            profiling.profiler.count('unchanged')
+            continue
+        if data is None:
             io.info(f'Already exists (todoist_id={tid})')
+            io.event('task', todoist_id=str(tid), outcome='existing')
+            profiling.profiler.count('existing')
+            if str(tid) in task_index and state_store.outcome(tid) != state.IMPORTED:
+                state_store.update(tid, outcome=state.IMPORTED, uuid=task_index[str(tid)])
             continue
 
-        # Project
-        p = todoist.projects.get_by_id(task['project_id'])
-        logging.debug(f"GET_PROJECT_BY_ID project_id={task['project_id']} project={p}")
-        if p:
-            project_hierarchy = [p]
-            while p['parent_id']:
-                p = todoist.projects.get_by_id(p['parent_id'])
-                project_hierarchy.insert(0, p)
-                logging.debug(f"PROJECT_HIERARCHY parent_id={p['parent_id']} hierarchy={project_hierarchy}")
-
-            project_name = '.'.join(p['name'] for p in project_hierarchy)
-            logging.debug(f'PROJECT_HIERARCHY project_name={project_name}')
-
-            project_name = utils.try_map(
-                map_project,
-                project_name
-            )
+        if update and str(tid) in migrated:
+            io.info(f'Changed (todoist_id={tid})')
+            updates.append(utils.make_update_task(migrated[str(tid)], **data._asdict()))
+            if batch_size and len(updates) >= batch_size:
+                update_tasks(updates)
+                updates = []
+            continue
+
+        if interactive:
+            data = add_task_interactive(data)
+            if data is not None:
+                writer.put(data)
+        elif batch_size:
+            batch.append(data)
+            if len(batch) >= batch_size:
+                add_tasks(batch)
+                batch = []
         else:
-            project_name = ''
+            add_task(**data._asdict())
 
-        logging.debug(f'GET_PROJECT_NAME project_name={project_name}')
-        if not p and task['project_id']:
-            logging.warn(f"PROJECT_NOT_FOUND project={p} project_id={task['project_id']}")
+    flush(len(tasks))
+    if writer:
+        finish_writes(writer)
+    if run_journal:
+        run_journal.finish()
+    io.end_progress()
 
-        # Project
-        data['project'] = utils.maybe_quote_ws(project_name)
+    if is_complete:
+        write_watermark(todoist.sync_token)
 
-        # Priority
-        data['priority'] = utils.parse_priority(task['priority'])
 
-        # Tags
-        logging.debug(f"TAGS labels={task['labels']}")
-        data['tags'] = [
-            utils.try_map(map_tag, todoist.labels.get_by_id(l_id)['name'])
-            for l_id in task['labels']
-        ]
+@cli.command()
+@click.option('--sync/--no-sync', default=True,
+        help='Enable/disable Todoist synchronization of the local task cache.')
+@click.option('-f', '--format', 'fmt', type=click.Choice(['ndjson', 'taskwarrior']),
+        default='ndjson',
+        help='Write converted tasks as NDJSON (one JSON object per line), or '
+             'as a JSON array for `task import`.')
+@click.option('-o', '--output', type=click.Path(dir_okay=False, writable=True, allow_dash=True),
+        default='-',
+        help='File to write to. Defaults to stdout, in which case messages '
+             'are written to stderr.')
+@mapping_options
+@click.option('-w', '--workers', type=click.IntRange(min=1), default=1,
+        help='Number of threads converting tasks ahead of the writer.')
+@filter_options('export')
+@click.pass_context
+def export(ctx, sync, fmt, output, map_project, map_tag, map_file, workers,
+           task_filters):
+    """Export converted tasks without importing them into Taskwarrior.
 
-        # Dates
-        data['entry'] = utils.parse_date(task['date_added'])
-        data['due'] = utils.parse_due(utils.try_get_model_prop(task, 'due'))
-        data['recur'] = parse_recur_or_prompt(utils.try_get_model_prop(task, 'due'))
+    Tasks are converted exactly as with `migrate`, including --map-project
+    and --map-tag, and are written one at a time, so that memory use doesn't
+    grow with the number of tasks. The output can then be loaded elsewhere,
+    e.g. with:
 
-        if not interactive:
-            add_task(**data)
-        else:
-            add_task_interactive(**data)
+        task import tasks.json
+
+    Unsupported recurrences are logged and left unset.
+    """
+    logging.debug(
+        f'EXPORT version={__version__} sync={sync} format={fmt} '
+        f'map_project={map_project} map_tag={map_tag} workers={workers} '
+        f'task_filters={task_filters}'
+    )
+
+    # Stdout is for the tasks alone, e.g. to be piped to `task import`
+    if output == '-':
+        io.redirect_to_stderr()
+
+    map_project, map_tag = merge_mappings(map_project, map_tag, map_file)
+    load_todoist(offline=not sync)
+
+    if sync:
+        ctx.invoke(synchronize)
+
+    converted = convert.iter_converted_tasks(
+        todoist, iter_tasks(task_filters), map_project, map_tag,
+        parse_recur=parse_recur_or_warn,
+        workers=workers,
+    )
+
+    if fmt == 'taskwarrior':
+        records = (utils.make_import_task(**data._asdict()) for _, data in converted)
+    else:
+        records = (
+            {**data._asdict(), 'project': utils.unquote_ws(data.project)}
+            for _, data in converted
+        )
+
+    # Messages so far are written before the tasks
+    io.flush()
+    with click.open_file(output, 'w') as f:
+        count = io.write_json_stream(records, f, as_array=(fmt == 'taskwarrior'))
+    logging.info(f'Exported {count} tasks')
+
+
+@cli.command()
+@click.option('-n', '--dry-run', is_flag=True, default=False,
+        help='Show how many tasks would be removed, without removing them.')
+@click.option('-y', '--yes', is_flag=True, default=False,
+        help='Remove the tasks without asking for confirmation.')
+@filter_options('revert')
+@click.pass_context
+def revert(ctx, dry_run, yes, task_filters):
+    """Remove migrated tasks from Taskwarrior.
+
+    Deletes every Taskwarrior task that has a `todoist_id`, or with
+    --filter-* options, those migrated from the matching tasks in the local
+    Todoist cache. All tasks are deleted with a single
+    `task import`, and can be migrated again afterwards.
+
+    Tasks that were deleted from Taskwarrior by other means are still
+    remembered as imported by `migrate`, until they are reverted.
+    """
+    global state_store
+
+    logging.debug(
+        f'REVERT dry_run={dry_run} task_filters={task_filters}'
+    )
+
+    load_taskwarrior()
+    with io.with_feedback('Loading existing Taskwarrior tasks'):
+        with profiling.profiler.stage('task_index'):
+            tasks = filter_migrated_tasks()
+
+    state_store = state.StateStore(data_path('state'))
+    ctx.call_on_close(state_store.close)
+
+    if task_filters:
+        load_todoist(offline=True)
+        tids = {str(task['id']) for task in get_tasks(task_filters)}
+        tasks = [task for task in tasks if str(task['todoist_id']) in tids]
+    else:
+        tids = list(state_store.tasks)
+
+    # Imported tasks are forgotten, but skip decisions are kept
+    forget = [tid for tid in tids if state_store.outcome(tid) == state.IMPORTED]
+
+    if not tasks and not forget:
+        io.warn('No migrated tasks found')
+        return
+
+    if dry_run:
+        io.important(f'Dry run, nothing was removed. {len(tasks)} tasks would be removed')
+        return
+
+    if tasks:
+        if not yes:
+            io.confirm(f'Are you sure you want to remove {len(tasks)} tasks?', abort=True)
+
+        records = [utils.make_delete_task(task) for task in tasks]
+        with io.with_feedback(f'Removing {len(records)} tasks'), profiling.profiler.stage('write'):
+            import_tasks(records)
+        profiling.profiler.count('removed', len(records))
+
+    for tid in forget:
+        state_store.forget(tid)
+
+
+def data_path(name):
+    """The file `name` of the API key, kept alongside the Todoist cache
+    files, e.g. 'state' for the log of `state.StateStore`, 'journal' for
+    the `journal.Journal` of the last migration, 'migrate' for the sync
+    token of the last complete migration, or 'ratelimit' for the shared
+    `ratelimit.TokenBucket`.
+    """
+    return os.path.join(os.path.expanduser(TODOIST_CACHE), f"{options['todoist_api_key']}.{name}")
+
+
+def describe_run(task_filters, update, changed_ids):
+    """Describes the tasks a migration is of, as stored in its journal. """
+    return {
+        'sync_token': todoist.sync_token,
+        'filters': json.loads(json.dumps(task_filters)),
+        'update': update,
+        'changed_ids': None if changed_ids is None else sorted(changed_ids),
+    }
+
+
+def tasks_after_checkpoint(tasks, checkpoint):
+    """Returns the `tasks` after the last window committed to the journal of
+    an interrupted migration.
+    """
+    if checkpoint['last_id'] is None:
+        return tasks
+    for idx, task in enumerate(tasks):
+        if task['id'] == checkpoint['last_id']:
+            io.info(f"Resuming after {checkpoint['count']} tasks")
+            return tasks[idx + 1:]
+    raise click.UsageError(
+        'The interrupted migration was of other tasks. Run migrate without --resume.')
+
+
+def recover_in_flight(tids):
+    """Records the tasks that were imported out of those being written when
+    a migration was interrupted, looking them up with a single export.
+    """
+    with io.with_feedback(f'Looking up {len(tids)} tasks being migrated when interrupted'):
+        found = taskwarrior.filter_tasks({
+            'or': [('todoist_id', tid) for tid in tids],
+            'status.not': 'deleted',
+        })
+    for task in found:
+        if not task.get('parent'):
+            state_store.update(task['todoist_id'], outcome=state.IMPORTED, uuid=task['uuid'])
+    logging.debug(f'RECOVER_IN_FLIGHT in_flight={len(tids)} imported={len(found)}')
+
+
+def record_existing_tasks(tasks):
+    """Records the `tasks` that were already migrated in the state store, as
+    `task_index` may not be built when resuming the migration.
+    """
+    for task in tasks:
+        tid = str(task['id'])
+        if tid in task_index and state_store.outcome(tid) != state.IMPORTED:
+            state_store.update(tid, outcome=state.IMPORTED, uuid=task_index[tid])
+    state_store.sync()
+
+
+def read_watermark():
+    try:
+        with open(data_path('migrate')) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(sync_token):
+    with open(data_path('migrate'), 'w') as f:
+        f.write(sync_token)
+    logging.debug(f'WATERMARK sync_token={sync_token}')
+
+
+def filter_migrated_tasks():
+    """Returns every Taskwarrior task that has a `todoist_id` and isn't
+    deleted, loaded with a single export. This includes the instances of
+    recurring tasks, which inherit the `todoist_id` of their parent.
+    """
+    return taskwarrior.filter_tasks({'todoist_id.any': '', 'status.not': 'deleted'})
+
+
+def export_migrated_tasks():
+    """Returns a dict mapping `todoist_id` -> task for every migrated
+    Taskwarrior task, leaving out the instances of recurring tasks.
+    """
+    return {
+        str(task['todoist_id']): task
+        for task in filter_migrated_tasks()
+        if task.get('todoist_id') and not task.get('parent')
+    }
+
+
+def build_task_index(migrated=None):
+    """Returns a dict mapping `todoist_id` -> `uuid` for the `migrated`
+    tasks, by default exporting them from Taskwarrior.
+    """
+    if migrated is None:
+        migrated = export_migrated_tasks()
+    return {tid: task['uuid'] for tid, task in migrated.items()}
 
 
 def check_task_exists(tid):
-    """ Given a Taskwarrior ID, check if the task exists """
-    _, task = taskwarrior.get_task(todoist_id=tid)
-    return bool(task)
+    """ Given a Todoist ID, check if the task exists """
+    return str(tid) in task_index or state_store.outcome(tid) == state.IMPORTED
 
 
-def add_task(tid, name, project, tags, priority, entry, due, recur):
+def add_task(tid, name, project, tags, priority, entry, due, recur, fingerprint=None):
     """Add a taskwarrior task from todoist task
 
     Returns the taskwarrior task.
     """
-    with io.with_feedback(f"Importing '{name}' ({project})"):
-        return taskwarrior.task_add(
-            name,
-            project=project,
-            tags=tags,
-            priority=priority,
-            entry=entry,
-            due=due,
-            recur=recur,
-            todoist_id=tid,
-        )
+    try:
+        with io.with_feedback(f"Importing '{name}' ({project})"), profiling.profiler.stage('write'):
+            task = taskwarrior.task_add(
+                name,
+                project=project,
+                tags=list(tags),
+                priority=priority,
+                entry=entry,
+                due=due,
+                recur=recur,
+                todoist_id=tid,
+                todoist_fingerprint=fingerprint,
+            )
+    except Exception as e:
+        state_store.update(tid, outcome=state.FAILED, error=str(e))
+        io.event('task', todoist_id=str(tid), outcome='failed', error=str(e))
+        raise
+
+    # Keep the index up to date so duplicates in this run are detected
+    task_index[str(tid)] = task['uuid']
+    state_store.update(tid, outcome=state.IMPORTED, uuid=task['uuid'])
+    io.event('task', todoist_id=str(tid), outcome='imported', uuid=task['uuid'])
+    profiling.profiler.count('imported')
+    return task
+
+
+def add_tasks(batch, feedback=True):
+    """Add a batch of taskwarrior tasks, from a list of
+    `convert.ConvertedTask`, using a single `task import` of a JSON array.
+    Without `feedback`, nothing is printed, e.g. when importing in the
+    background.
+
+    Returns the list of imported tasks.
+    """
+    tasks = [utils.make_import_task(**data._asdict()) for data in batch]
+
+    if feedback:
+        output = io.with_feedback(f'Importing batch of {len(tasks)} tasks')
+    else:
+        output = contextlib.nullcontext()
+    try:
+        with output, profiling.profiler.stage('write'):
+            import_tasks(tasks)
+    except Exception as e:
+        for task in tasks:
+            state_store.update(task['todoist_id'], outcome=state.FAILED, error=str(e))
+            io.event('task', todoist_id=task['todoist_id'], outcome='failed', error=str(e))
+        raise
+
+    for task in tasks:
+        task_index[task['todoist_id']] = task['uuid']
+        state_store.update(task['todoist_id'], outcome=state.IMPORTED, uuid=task['uuid'])
+        io.event('task', todoist_id=task['todoist_id'], outcome='imported', uuid=task['uuid'])
+    profiling.profiler.count('imported', len(tasks))
+    return tasks
+
+
+def finish_writes(writer):
+    """Waits for the tasks queued in a `pipeline.BackgroundWriter` to be
+    imported.
+    """
+    if writer.pending:
+        with io.with_feedback(f'Importing {writer.pending} confirmed tasks'):
+            writer.close()
+    else:
+        writer.close()
+
+
+def update_tasks(tasks):
+    """Update a batch of already migrated taskwarrior tasks, built with
+    `utils.make_update_task`, using a single `task import`.
+    """
+    with io.with_feedback(f'Updating batch of {len(tasks)} tasks'), profiling.profiler.stage('write'):
+        import_tasks(tasks)
+    for task in tasks:
+        io.event('task', todoist_id=task['todoist_id'], outcome='updated', uuid=task['uuid'])
+    profiling.profiler.count('updated', len(tasks))
+
+
+def import_tasks(tasks):
+    """Runs `task import` on a JSON array of tasks. Tasks with the `uuid` of
+    an existing task replace it.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(tasks, f)
+    try:
+        taskwarrior._execute('import', f.name)
+    finally:
+        os.remove(f.name)
 
 
-def add_task_interactive(**task_data):
-    """Interactively add tasks
+def add_task_interactive(task_data):
+    """Interactively confirm a task, from a `convert.ConvertedTask`. Returns
+    the task as edited by the user, to be imported, or None if skipped.
 
     y - add task
     n - skip task
@@ -257,55 +993,50 @@ def add_task_interactive(**task_data):
         'n': lambda: task_data,
 
         # Rename
-        'd': lambda: {
-            **task_data,
-            'name': io.prompt(
+        'd': lambda: task_data._replace(
+            name=io.prompt(
                 'Set name',
-                default=task_data['name'],
+                default=task_data.name,
                 value_proc=lambda x: x.strip(),
             ),
-        },
+        ),
 
         # Edit tags
-        't': lambda: {
-            **task_data,
-            'tags': io.prompt(
+        't': lambda: task_data._replace(
+            tags=io.prompt(
                 'Set tags (space delimited)',
-                default=' '.join(task_data['tags']),
+                default=' '.join(task_data.tags),
                 show_default=False,
-                value_proc=lambda x: x.split(' '),
+                value_proc=lambda x: tuple(x.split(' ')),
             ),
-        },
+        ),
 
         # Edit project
-        'P': lambda: {
-            **task_data,
-            'project': io.prompt(
+        'P': lambda: task_data._replace(
+            project=io.prompt(
                 'Set project',
-                default=task_data['project'],
+                default=task_data.project,
             ),
-        },
+        ),
 
         # Edit priority
-        'p': lambda: {
-            **task_data,
-            'priority': io.prompt(
+        'p': lambda: task_data._replace(
+            priority=io.prompt(
                 'Set priority',
                 default='',
                 show_default=False,
                 type=click.Choice(['L', 'M', 'H', '']),
             ),
-        },
+        ),
 
         # Edit recur
-        'r': lambda: {
-            **task_data,
-            'recur': io.prompt(
+        'r': lambda: task_data._replace(
+            recur=io.prompt(
                 'Set recurrence (todoist style)',
                 default='',
                 value_proc=validation.validate_recur,
             ),
-        },
+        ),
 
 
         # Quit
@@ -320,9 +1051,11 @@ def add_task_interactive(**task_data):
         ])) or task_data,
     }
 
+    tid = task_data.tid
     response = None
     while response not in ('y', 'n'):
-        io.task(task_data)
+        # The fingerprint is of the task as it is in Todoist, so isn't edited
+        io.task({k: v for k, v in task_data._asdict().items() if k != 'fingerprint'})
         response = io.prompt(
             "Import this task?",
             type=click.Choice(callbacks.keys()),
@@ -334,37 +1067,123 @@ def add_task_interactive(**task_data):
 
     if response == 'n':
         io.warn('Skipping task')
+        state_store.update(tid, outcome=state.SKIPPED)
         return
 
-    return add_task(**task_data)
+    io.success('Queued for import')
+    return task_data
 
 
-def parse_recur_or_prompt(due):
+def parse_recur_or_prompt(due, name=None, tid=None, prompt=True):
+    """Parses the recurrence of a task, prompting for one if it is
+    unsupported. The answer is remembered for the task with id `tid`, until
+    its recurrence changes in Todoist. Without `prompt`, a recurrence without
+    a remembered answer is left unset, with a warning.
+    """
     try:
         return utils.parse_recur(due)
     except errors.UnsupportedRecurrence:
+        previous = state_store.get(tid) if tid else {}
+        if 'recur' in previous and previous.get('recur_string') == due['string']:
+            return previous['recur']
+
+        if not prompt:
+            io.warn(f"Unsupported recurrence: '{due['string']}', leaving it unset"
+                    + (f' for task: {name}' if name else ''))
+            return None
+
+        if name:
+            io.important(f'Task: {name}')
         io.error("Unsupported recurrence: '%s'. Please enter a valid value" % due['string'])
-        return io.prompt(
+        recur = io.prompt(
             'Set recurrence (todoist style)',
             default='',
             value_proc=validation.validate_recur,
         )
+        if tid:
+            state_store.update(tid, recur=recur, recur_string=due['string'])
+        return recur
+
+def report_profile(json_path=None):
+    """Prints the profile of the command, and writes it to `json_path`. """
+    report = profiling.profiler.report()
+    io.report('profile', 'Profile', profiling.format_report(report), **report)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+def merge_mappings(map_project, map_tag, map_file):
+    """Returns the project and tag mappings, including the rules from
+    --map-file. These are only checked if no command line rule matches, so
+    the command line takes precedence.
+    """
+    return (
+        mapping.Mapping(map_project.rules, fallback=mapping.Mapping(map_file['project'])),
+        mapping.Mapping(map_tag.rules, fallback=mapping.Mapping(map_file['tag'])),
+    )
+
 
-def make_filter_fn(filter_dict):
-    """Returns a lambda which, when given a Todoist task, will check
-    whether it has the same values for keys in `filter_dict`, returning
-    a bool
+def task_predicate(task_filters=None):
+    """Returns a `filters.make_predicate` function for the filters, or None.
+    Projects are only looked up when filtering on a project tree.
     """
-    if not filter_dict:
-        return None
+    task_filters = task_filters or {}
+    projects = todoist.projects.all() if task_filters.get('project_tree') else ()
+    return filters.make_predicate(task_filters, projects)
 
-    def fn(task):
-        for k, v in filter_dict.items():
-            if task[k] != v:
-                return False
-        return True
 
-    return fn
+def get_tasks(task_filters=None):
+    """Returns the Todoist tasks matching the filters, if any, checking them
+    one at a time as they are listed.
+    """
+    predicate = task_predicate(task_filters)
+    if predicate is None:
+        return todoist.items.all()
+    with profiling.profiler.stage('filter'):
+        return todoist.items.all(filt=predicate)
+
+
+def iter_tasks(task_filters=None):
+    """Like `get_tasks`, but when reading the cache with a `cache.CacheReader`
+    tasks are read and filtered one at a time as they are iterated over.
+    """
+    if isinstance(todoist, cache.CacheReader):
+        return todoist.items.iter(filt=task_predicate(task_filters))
+    return get_tasks(task_filters)
+
+
+def print_plan(plan):
+    """Prints the summary returned by `convert.plan_migration` """
+    outcomes = ['create', 'exists', 'remapped', 'unsupported_recur']
+
+    io.important('Dry run, nothing was written. Tasks that would be:')
+    for outcome in outcomes:
+        io.info(f"  {outcome:<20} {plan['outcomes'][outcome]:>8}")
+
+    io.important('\nPer project:')
+    io.info(f"  {'project':<40}" + ''.join(f'{o:>18}' for o in outcomes))
+    for project, counts in sorted(plan['projects'].items()):
+        project = utils.unquote_ws(project) or '(none)'
+        io.info(f'  {project:<40}' + ''.join(f'{counts[o]:>18}' for o in outcomes))
+
+    if plan['unsupported']:
+        io.important('\nUnsupported recurrences:')
+        for date_string, count in plan['unsupported'].most_common():
+            io.info(f"  {date_string:<40} {count:>8}")
+
+
+def parse_recur_or_warn(task):
+    """Parses the task's recurrence, logging and leaving it unset if it is
+    unsupported rather than prompting.
+    """
+    due = utils.try_get_model_prop(task, 'due')
+    try:
+        return utils.parse_recur(due)
+    except errors.UnsupportedRecurrence as e:
+        logging.warning(f"UNSUPPORTED_RECURRENCE todoist_id={task['id']} string={e.date_string}")
+        return None
+
 
 """ Entrypoint """
 
@@ -0,0 +1,163 @@
+"""Conversion of Todoist tasks to Taskwarrior tasks """
+
+import collections
+import logging
+from . import errors, mapping, pipeline, profiling, utils
+
+
+# The fields of a Taskwarrior task converted from a Todoist task. Many of them
+# may be held at once, so they are tuples rather than dicts, and the project
+# and tags are strings interned by the project and tag indexes. They are
+# passed to `utils.make_import_task` and others with `**data._asdict()`.
+ConvertedTask = collections.namedtuple(
+    'ConvertedTask',
+    ['tid', 'name', 'project', 'priority', 'tags', 'entry', 'due', 'recur', 'fingerprint'],
+    defaults=[None, None],
+)
+
+
+def iter_converted_tasks(todoist, tasks, map_project, map_tag,
+                         exclude=None, exclude_converted=None, parse_recur=None,
+                         workers=0):
+    """Lazily converts Todoist `tasks`, yielding a `(task, data)` pair for
+    each, in order, where `data` is the `ConvertedTask`.
+
+    - `exclude` is called with each task, and if it returns True the task
+      isn't converted and `data` is None (e.g. for already migrated tasks).
+    - `exclude_converted` is likewise called with each task and its `data`,
+      before its recurrence is parsed (e.g. for unchanged tasks).
+    - `parse_recur` is called with each converted task to get its `recur`,
+      defaulting to `utils.parse_recur`. It is called from the consumer's
+      thread, so it may prompt the user.
+    - With `workers`, tasks are converted ahead of the consumer on a pool
+      of that many threads.
+    """
+    if parse_recur is None:
+        parse_recur = lambda task: utils.parse_recur(utils.try_get_model_prop(task, 'due'))
+
+    # Resolve the final name of every project once, up front
+    with profiling.profiler.stage('project_index'):
+        project_index = utils.build_project_index(todoist.projects.all(), map_project)
+    logging.debug(f'PROJECT_INDEX size={len(project_index)}')
+
+    # Resolve the final name of every tag once, up front
+    with profiling.profiler.stage('tag_index'):
+        tag_index = utils.build_tag_index(todoist.labels.all(), map_tag)
+    logging.debug(f'TAG_INDEX size={len(tag_index)}')
+
+    def convert(task):
+        if exclude:
+            with profiling.profiler.stage('exists'):
+                excluded = exclude(task)
+            if excluded:
+                return task, None
+        data = convert_task(task, project_index, tag_index)
+        if exclude_converted and exclude_converted(task, data):
+            return task, None
+        return task, data
+
+    if workers:
+        converted = pipeline.iter_pipelined(convert, tasks, workers=workers)
+    else:
+        converted = map(convert, tasks)
+
+    for task, data in converted:
+        if data is not None:
+            with profiling.profiler.stage('recur'):
+                data = data._replace(recur=parse_recur(task))
+        yield task, data
+
+
+def plan_migration(todoist, tasks, map_project, map_tag, exists, workers=0):
+    """Converts `tasks` without prompting or writing anything, returning a
+    summary of what migrating them would do:
+
+    - `outcomes`: the number of tasks per outcome, where each task is either
+      `create` or `exists`, and may also be `remapped` (its project or tags
+      were changed by a mapping) and/or have an `unsupported_recur`.
+    - `projects`: the outcomes per final project name.
+    - `unsupported`: the number of tasks per unsupported recurrence.
+    """
+    unsupported = collections.Counter()
+    is_unsupported = object()
+
+    def parse_recur(task):
+        due = utils.try_get_model_prop(task, 'due')
+        try:
+            return utils.parse_recur(due)
+        except errors.UnsupportedRecurrence as e:
+            unsupported[e.date_string] += 1
+            return is_unsupported
+
+    # Names before mapping, to detect remapped tasks
+    raw_projects = utils.build_project_index(todoist.projects.all(), mapping.Mapping())
+    raw_tags = utils.build_tag_index(todoist.labels.all(), mapping.Mapping())
+
+    outcomes = collections.Counter()
+    projects = collections.defaultdict(collections.Counter)
+    converted = iter_converted_tasks(
+        todoist, tasks, map_project, map_tag,
+        parse_recur=parse_recur,
+        workers=workers,
+    )
+    for task, data in converted:
+        task_outcomes = ['exists' if exists(task) else 'create']
+
+        raw_project = raw_projects.get(task['project_id'], '')
+        raw_task_tags = tuple(raw_tags[l] for l in task['labels'] if l in raw_tags)
+        if data.project != raw_project or data.tags != raw_task_tags:
+            task_outcomes.append('remapped')
+        if data.recur is is_unsupported:
+            task_outcomes.append('unsupported_recur')
+
+        outcomes.update(task_outcomes)
+        projects[data.project].update(task_outcomes)
+
+    return {
+        'outcomes': outcomes,
+        'projects': projects,
+        'unsupported': unsupported,
+    }
+
+
+def convert_task(task, project_index, tag_index):
+    """Converts a Todoist task to a `ConvertedTask`, using the indexes of
+    final project and tag names.
+
+    The `recur` field is left to the caller, since an unsupported
+    recurrence may require prompting the user.
+    """
+    # Project
+    with profiling.profiler.stage('project'):
+        project_id = task['project_id']
+        project = project_index.get(project_id, '')
+        logging.debug(f"GET_PROJECT_NAME project_id={project_id} project={project}")
+        if project_id and project_id not in project_index:
+            logging.warning(f'PROJECT_NOT_FOUND project_id={project_id}')
+
+    # Tags
+    with profiling.profiler.stage('tags'):
+        logging.debug(f"TAGS labels={task['labels']}")
+        tags = []
+        for label_id in task['labels']:
+            if label_id not in tag_index:
+                logging.warning(f'LABEL_NOT_FOUND label_id={label_id}')
+            elif tag_index[label_id]:
+                tags.append(tag_index[label_id])
+
+    # Dates
+    with profiling.profiler.stage('dates'):
+        entry = utils.parse_date(task['date_added'])
+        due = utils.try_get_model_prop(task, 'due')
+        due_date = utils.parse_due(due)
+
+    data = ConvertedTask(
+        tid=task['id'],
+        name=task['content'],
+        project=project,
+        priority=utils.parse_priority(task['priority']),
+        tags=tuple(tags),
+        entry=entry,
+        due=due_date,
+    )
+    return data._replace(fingerprint=utils.fingerprint(data, due))
@@ -1,5 +1,7 @@
 """ Custom Errors """
 
+import click
+
 
 class UnsupportedRecurrence(Exception):
 
@@ -7,3 +9,32 @@ class UnsupportedRecurrence(Exception):
         super().__init__('Unsupported recurrence: %s' % date_string)
         self.date_string = date_string
 
+
+
+class InvalidMapping(Exception):
+
+    def __init__(self, rule, reason):
+        super().__init__('Invalid mapping: %s (%s)' % (rule, reason))
+        self.rule = rule
+        self.reason = reason
+
+
+class CorruptCache(click.ClickException):
+    """Raised when the local Todoist cache can't be read, e.g. as it was
+    left incomplete by an interrupted sync. Shown to the user by click.
+    """
+
+    def __init__(self, path, reason):
+        super().__init__(
+            'The Todoist cache %s is incomplete or corrupt (%s). Run `synchronize` '
+            'to fetch it again.' % (path, reason))
+        self.path = path
+        self.reason = reason
+
+
+class SyncError(Exception):
+
+    def __init__(self, reason, status=None):
+        super().__init__('Sync failed: %s' % reason)
+        self.reason = reason
+        self.status = status
@@ -0,0 +1,89 @@
+"""Selecting the Todoist tasks to migrate
+
+Filters are given as a dict, with any of the keys:
+
+- `task_id`: the id of a task
+- `project_id`: the id of a project
+- `project_tree`: the id of a project, including the tasks of its subprojects
+- `label_ids`: ids of labels, which a task must all have
+- `priorities`: Todoist priorities (1 to 4), one of which a task must have
+- `due_after`/`due_before`: dates (YYYY-MM-DD), inclusive, of the due date
+- `recurring`: True for recurring tasks only, False for non-recurring ones
+
+A task must match every filter given. `make_predicate` checks one task at a
+time, so that tasks can be filtered as they are listed or streamed from the
+cache.
+"""
+
+import collections
+from .utils import try_get_model_prop
+
+
+FILTERS = [
+    'task_id', 'project_id', 'project_tree', 'label_ids', 'priorities',
+    'due_after', 'due_before', 'recurring',
+]
+
+
+def due_day(task):
+    """Returns the due date of a task as YYYY-MM-DD, or None. """
+    due = try_get_model_prop(task, 'due')
+    return due['date'][:10] if due else None
+
+
+def is_recurring(task):
+    due = try_get_model_prop(task, 'due')
+    return bool(due and due.get('is_recurring'))
+
+
+def project_subtree(projects, project_id):
+    """Returns the ids of the project and all of its descendants. """
+    children = collections.defaultdict(list)
+    for project in projects:
+        children[try_get_model_prop(project, 'parent_id')].append(project['id'])
+
+    subtree = set()
+    pending = [project_id]
+    while pending:
+        pid = pending.pop()
+        if pid not in subtree:
+            subtree.add(pid)
+            pending.extend(children[pid])
+    return subtree
+
+
+def make_predicate(filters, projects=()):
+    """Returns a function checking whether a task matches all `filters`, or
+    None if there are none.
+    """
+    checks = []
+    if filters.get('task_id'):
+        checks.append(lambda task: task['id'] == filters['task_id'])
+    if filters.get('project_id'):
+        checks.append(lambda task: task['project_id'] == filters['project_id'])
+    if filters.get('project_tree'):
+        subtree = project_subtree(projects, filters['project_tree'])
+        checks.append(lambda task: task['project_id'] in subtree)
+    if filters.get('label_ids'):
+        label_ids = set(filters['label_ids'])
+        checks.append(lambda task: label_ids.issubset(task['labels']))
+    if filters.get('priorities'):
+        checks.append(lambda task: task['priority'] in filters['priorities'])
+    if filters.get('due_after'):
+        checks.append(lambda task: (due_day(task) or '') >= filters['due_after'])
+    if filters.get('due_before'):
+        checks.append(lambda task: due_day(task) is not None and due_day(task) <= filters['due_before'])
+    if filters.get('recurring') is not None:
+        checks.append(lambda task: is_recurring(task) == filters['recurring'])
+
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+
+    def matches(task):
+        for check in checks:
+            if not check(task):
+                return False
+        return True
+    return matches
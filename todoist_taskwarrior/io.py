@@ -1,7 +1,26 @@
-"""Utilities for pretty output """
+"""Utilities for pretty output
 
+Everything is written through `output`, one of the `OUTPUTS`, selected with
+`set_output`:
+
+- `text`: every message, as is
+- `progress`: a progress bar (with the rate and ETA) while tasks are
+  migrated, instead of a few lines per task, and warnings and errors
+- `quiet`: only warnings and errors
+- `ndjson`: a JSON object per line for each event (e.g. each task migrated)
+  and for warnings and errors, to be read by other programs
+
+Output is buffered, and written at most every `FLUSH_INTERVAL` seconds, as
+well as when a step starts (see `with_feedback`), before prompting (see
+`prompt` and `confirm`) and when the command exits (see `flush`).
+"""
+
+import collections
 import contextlib
-from click import echo, prompt as cprompt, style
+import json
+import sys
+import time
+from click import confirm as cconfirm, prompt as cprompt, style, unstyle
 
 
 _success = lambda msg, bold: style(msg, fg='green', bold=bold)
@@ -9,31 +28,338 @@ _important = lambda msg, bold: style(msg, fg='blue', bold=bold)
 _warning = lambda msg, bold: style(msg, fg='yellow', bold=bold)
 _error = lambda msg, bold: style(msg, fg='red', bold=bold)
 
+STYLES = {
+    'info': lambda msg, bold: msg,
+    'success': _success,
+    'important': _important,
+    'warn': _warning,
+    'error': _error,
+}
+
+# Seconds between writes of the buffered output
+FLUSH_INTERVAL = 0.1
+
+# Seconds between redraws of the progress bar, and between progress lines
+# when the output isn't a terminal
+PROGRESS_INTERVAL = 0.2
+PROGRESS_LOG_INTERVAL = 10
+
+
+class TextOutput:
+
+    def __init__(self, stream=None):
+        # Defaults to the `sys.stdout` of the time of writing, which tests
+        # may replace
+        self._stream = stream
+        self._buffer = []
+        self._flushed = time.monotonic()
+        self.progress = None
+
+    @property
+    def stream(self):
+        return self._stream or sys.stdout
+
+    def write(self, text):
+        self._buffer.append(text)
+        if time.monotonic() - self._flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            text = ''.join(self._buffer)
+            self._buffer = []
+            stream = self.stream
+            if not stream.isatty():
+                text = unstyle(text)
+            stream.write(text)
+            stream.flush()
+        self._flushed = time.monotonic()
+
+    def message(self, level, msg, bold=False, nl=True):
+        self.write(STYLES[level](msg, bold) + ('\n' if nl else ''))
+
+    def begin_step(self, description):
+        # Steps block, e.g. on Taskwarrior or the network, so they are shown
+        # while they run rather than once they are done
+        self.message('info', f'{description}... ', nl=False)
+        self.flush()
+
+    def end_step(self, description, status, ok):
+        self.message('success' if ok else 'error', status, bold=True)
+
+    def event(self, name, fields):
+        if name == 'task' and self.progress:
+            self.progress['outcomes'][fields['outcome']] += 1
+
+    def start_progress(self, total, label):
+        self.progress = {
+            'total': total,
+            'label': label,
+            'done': 0,
+            'outcomes': collections.Counter(),
+            'started': time.monotonic(),
+        }
+
+    def advance(self, n=1):
+        if self.progress:
+            self.progress['done'] += n
+
+    def end_progress(self):
+        self.progress = None
+
+    def report(self, name, title, text, fields):
+        self.message('important', f'\n{title}:', bold=True)
+        self.message('info', text)
+
+
+class QuietOutput(TextOutput):
+
+    def message(self, level, msg, bold=False, nl=True):
+        if level in ('warn', 'error'):
+            super().message(level, msg, bold, nl)
+
+    def report(self, name, title, text, fields):
+        # Only asked for reports are shown, on stderr to keep stdout quiet
+        self.flush()
+        sys.stderr.write(f'\n{title}:\n{text}\n')
+        sys.stderr.flush()
+
+    def begin_step(self, description):
+        pass
+
+    def end_step(self, description, status, ok):
+        if not ok:
+            self.message('error', f'{description}... {status}', bold=True)
+
+
+class ProgressOutput(TextOutput):
+    """Shows a progress bar while tasks are migrated, and otherwise every
+    message. While the bar is shown, only warnings and errors are written,
+    above it.
+    """
+
+    width = 30
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self._drawn = 0
+        self._bar_shown = False
+
+    def message(self, level, msg, bold=False, nl=True):
+        if not self.progress:
+            return super().message(level, msg, bold, nl)
+        if level in ('warn', 'error'):
+            self._clear_bar()
+            super().message(level, msg, bold, nl=True)
+            self._draw(force=True)
+
+    def begin_step(self, description):
+        if not self.progress:
+            super().begin_step(description)
+
+    def end_step(self, description, status, ok):
+        if not self.progress:
+            super().end_step(description, status, ok)
+        elif not ok:
+            self.message('error', f'{description}... {status}', bold=True)
+
+    def start_progress(self, total, label):
+        super().start_progress(total, label)
+        self._drawn = 0
+        self._draw(force=True)
+
+    def advance(self, n=1):
+        super().advance(n)
+        self._draw()
+
+    def end_progress(self):
+        if self.progress:
+            self._draw(force=True)
+            if self.stream.isatty():
+                self.write('\n')
+            self._bar_shown = False
+        super().end_progress()
+
+    def _clear_bar(self):
+        if self._bar_shown and self.stream.isatty():
+            self.write('\r\x1b[K')
+        self._bar_shown = False
+
+    def _draw(self, force=False):
+        now = time.monotonic()
+        is_tty = self.stream.isatty()
+        interval = PROGRESS_INTERVAL if is_tty else PROGRESS_LOG_INTERVAL
+        if not force and now - self._drawn < interval:
+            return
+        self._drawn = now
+
+        line = format_progress(self.progress, now, self.width)
+        if is_tty:
+            self.write('\r' + line + '\x1b[K')
+            self._bar_shown = True
+        else:
+            self.write(line + '\n')
+        self.flush()
+
+
+class NDJSONOutput(TextOutput):
+    """Writes a JSON object per line for each event, and for warnings and
+    errors, with the `event` name and the `time` since the epoch.
+    """
+
+    def _write_event(self, name, fields):
+        self.write(json.dumps({'event': name, 'time': round(time.time(), 3), **fields}) + '\n')
+
+    def message(self, level, msg, bold=False, nl=True):
+        if level in ('warn', 'error'):
+            self._write_event('message', {'level': level, 'message': unstyle(msg)})
+
+    def begin_step(self, description):
+        pass
+
+    def end_step(self, description, status, ok):
+        # The steps writing each task are reported by their `task` events
+        if ok and self.progress:
+            return
+        self._write_event('step', {'description': description, 'status': status, 'ok': ok})
+
+    def event(self, name, fields):
+        super().event(name, fields)
+        self._write_event(name, fields)
+
+    def start_progress(self, total, label):
+        super().start_progress(total, label)
+        self._write_event('start', {'label': label, 'total': total})
+
+    def report(self, name, title, text, fields):
+        self._write_event(name, fields)
+
+    def end_progress(self):
+        if self.progress:
+            progress = self.progress
+            self._write_event('summary', {
+                'label': progress['label'],
+                'total': progress['total'],
+                'done': progress['done'],
+                'seconds': round(time.monotonic() - progress['started'], 3),
+                'outcomes': dict(progress['outcomes']),
+            })
+        super().end_progress()
+
+
+OUTPUTS = {
+    'text': TextOutput,
+    'progress': ProgressOutput,
+    'quiet': QuietOutput,
+    'ndjson': NDJSONOutput,
+}
+
+output = TextOutput()
+
+
+def set_output(name, discard=False):
+    """Replaces `output` with a new one of the `OUTPUTS`, writing what the
+    previous one buffered first, unless `discard`. A forked process discards
+    it, as it is a copy of what its parent buffered.
+    """
+    global output
+    if not discard:
+        flush()
+    output = OUTPUTS[name]()
+    return output
+
+
+def redirect_to_stderr():
+    """Writes the output to stderr from now on, e.g. when stdout is for
+    data.
+    """
+    flush()
+    output._stream = sys.stderr
+
+
+def format_progress(progress, now, width=30):
+    """Formats a progress line, e.g.
+    `Migrating [#####-----] 50/100 50% 25.0/s ETA 0:00:02 (imported 50)`.
+    """
+    done, total = progress['done'], progress['total']
+    elapsed = now - progress['started']
+    rate = done / elapsed if elapsed > 0 else 0
+    filled = int(width * done / total) if total else width
+    eta = time.strftime('%H:%M:%S', time.gmtime((total - done) / rate)) if rate else '--:--:--'
+    line = (
+        f"{progress['label']} [{'#' * filled}{'-' * (width - filled)}] "
+        f"{done}/{total} {done / total if total else 1:.0%} {rate:.1f}/s ETA {eta}"
+    )
+    if progress['outcomes']:
+        line += ' (' + ', '.join(
+            f'{outcome} {count}' for outcome, count in sorted(progress['outcomes'].items())
+        ) + ')'
+    return line
+
+
+def flush():
+    """Writes the buffered output, ending the progress bar if any. """
+    output.end_progress()
+    output.flush()
+
 
 def info(msg, bold=False, nl=True):
-    echo(msg, nl=nl)
+    output.message('info', msg, bold, nl)
 
 
 def success(msg, bold=True, nl=True):
-    echo(_success(msg, bold), nl=nl)
+    output.message('success', msg, bold, nl)
 
 
 def important(msg, bold=True, nl=True):
-    echo(_important(msg, bold), nl=nl)
+    output.message('important', msg, bold, nl)
 
 
 def warn(msg, bold=True, nl=True):
-    echo(_warning(msg, bold), nl=nl)
+    output.message('warn', msg, bold, nl)
 
 
 def error(msg, bold=True, nl=True):
-    echo(_error(msg, bold), nl=nl)
+    output.message('error', msg, bold, nl)
+
+
+def event(name, **fields):
+    """Records an event, such as `task` with the `outcome` of a task, which
+    is only written by the `ndjson` output, and counted by `progress`.
+    """
+    output.event(name, fields)
+
+
+def report(name, title, text, **fields):
+    """Writes a report asked for by the user, such as the profile, as
+    `text` under `title`, or as a `name` event with `fields` in the `ndjson`
+    output. The `quiet` output writes it to stderr.
+    """
+    output.report(name, title, text, fields)
+
+
+def start_progress(total, label):
+    output.start_progress(total, label)
+
+
+def advance(n=1):
+    output.advance(n)
+
+
+def end_progress():
+    output.end_progress()
 
 
 def prompt(msg, **kwargs):
+    output.flush()
     return cprompt(_important(msg, True), **kwargs)
 
 
+def confirm(msg, **kwargs):
+    output.flush()
+    return cconfirm(_important(msg, True), **kwargs)
+
+
 def task(task):
     """Pretty print a task to stdout """
 
@@ -41,23 +367,41 @@ def task(task):
 
     for key, value in task.items():
         key = style(key, underline=True)
-        if isinstance(value, list):
+        if isinstance(value, (list, tuple)):
             value = ' '.join(value)
         elif value is None:
             value = ''
         output += f'{key}: {value}\n'
 
-    echo(output)
+    info(output)
 
 
 @contextlib.contextmanager
 def with_feedback(description, success_status='OK', error_status='FAILED'):
-    info(f'{description}... ', nl=False)
+    output.begin_step(description)
     try:
         yield
     except Exception as e:
-        error(f'{error_status} ({e})')
+        output.end_step(description, f'{error_status} ({e})', ok=False)
         raise
     else:
-        success(success_status)
+        output.end_step(description, success_status, ok=True)
+
 
+def write_json_stream(records, output, as_array=False):
+    """Writes each record as a line of JSON, wrapped in a JSON array if
+    `as_array`, returning the number of records written.
+    """
+    count = 0
+    if as_array:
+        output.write('[\n')
+    for record in records:
+        if count and as_array:
+            output.write(',\n')
+        output.write(json.dumps(record))
+        if not as_array:
+            output.write('\n')
+        count += 1
+    if as_array:
+        output.write('\n]\n')
+    return count
@@ -0,0 +1,98 @@
+"""Progress journal of a migration, to resume it after a crash
+
+Tasks are migrated in windows of consecutive tasks. Before a window is
+written to Taskwarrior its Todoist ids are appended to the journal, and once
+they are all written (and their outcomes saved in the `state.StateStore`),
+the id of its last task is, each time followed by a single fsync. If the run
+dies, the tasks before the last committed window are known to be done, and
+only those of the window in flight may or may not have been written.
+
+The journal is a file of JSON lines alongside the Todoist cache:
+
+    {"event": "start", "run": {...}}
+    {"event": "begin", "ids": [...]}
+    {"event": "commit", "last_id": ..., "count": ...}
+
+and is removed once the run is complete.
+"""
+
+import json
+import logging
+import os
+
+
+# The number of tasks per window, when they aren't imported in batches
+WINDOW_SIZE = 100
+
+
+class Journal:
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start(self, **run):
+        """Starts the journal of a new run, replacing any previous one. `run`
+        describes the tasks being migrated, so that the run can only be
+        resumed with the same ones.
+        """
+        self.close()
+        self._file = open(self.path, 'w')
+        self._append({'event': 'start', 'run': run})
+
+    def resume(self):
+        """Continues the journal of an interrupted run, without writing
+        anything.
+        """
+        self.close()
+        self._file = open(self.path, 'a')
+
+    def begin(self, ids):
+        self._append({'event': 'begin', 'ids': ids})
+
+    def commit(self, last_id, count):
+        self._append({'event': 'commit', 'last_id': last_id, 'count': count})
+
+    def finish(self):
+        """Removes the journal of a complete run. """
+        self.close()
+        os.remove(self.path)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def read(path):
+    """Reads the journal at `path`, returning None if there is none, or a
+    dict with the `run` it was started with, and the `last_id` and `count`
+    of the last committed window, and the `in_flight` ids of the window
+    being written, if any.
+    """
+    checkpoint = None
+    try:
+        with open(path) as f:
+            for lineno, line in enumerate(f, start=1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A partly written line, if the run was killed
+                    logging.warning(f'JOURNAL_INVALID_LINE path={path} line={lineno}')
+                    continue
+
+                event = entry['event']
+                if event == 'start':
+                    checkpoint = {'run': entry['run'], 'last_id': None, 'count': 0, 'in_flight': []}
+                elif event == 'begin':
+                    checkpoint['in_flight'] = entry['ids']
+                elif event == 'commit':
+                    checkpoint.update(last_id=entry['last_id'], count=entry['count'], in_flight=[])
+    except FileNotFoundError:
+        pass
+    return checkpoint
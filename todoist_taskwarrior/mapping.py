@@ -0,0 +1,171 @@
+"""Project/tag mapping rules
+
+Rules are given as SRC=DST, where SRC is one of:
+
+- an exact name:         'Work Errands'=errands
+- a glob (* and ?):      'Work.*'=work
+- a regular expression:  're:Work\\.(.*)'='work.\\1'
+
+Regular expression rules must match the whole name, and DST may refer to
+their groups. When several rules match, exact rules win, then the longest
+prefix rule (a glob whose only wildcard is a trailing `*`), then the most
+recently added glob/regex rule. Rules from --map-file are only checked if
+none of the command line rules match.
+"""
+import re
+from . import errors
+
+
+REGEX_PREFIX = 're:'
+
+# Returned by `Mapping.lookup` when no rule matches
+NO_MATCH = object()
+
+# Backreferences inside a pattern, which would be renumbered if the
+# pattern was combined with others
+RE_BACKREF = re.compile(r'\\[1-9]|\(\?P=')
+
+
+class Mapping:
+    """Translates names with SRC -> DST rules.
+
+    Exact rules are kept in a dict and prefix rules in a trie, and all other
+    patterns are compiled into a single alternation regex, so a lookup
+    doesn't depend on the number of rules. Names that no rule matches are
+    looked up in the `fallback` mapping, if any, so that all the rules of
+    this mapping are checked first. Results are memoized.
+    """
+
+    def __init__(self, rules=(), fallback=None):
+        self.rules = []
+        self.fallback = fallback
+        self._exact = {}
+        self._trie = {}
+        self._patterns = []
+        self._matcher = None
+        self._cache = {}
+        for src, dst in rules:
+            self.add(src, dst)
+
+    def __repr__(self):
+        if self.fallback is None:
+            return f'Mapping({self.rules!r})'
+        return f'Mapping({self.rules!r}, fallback={self.fallback!r})'
+
+    def add(self, src, dst):
+        """Add a rule, which takes precedence over earlier rules of the
+        same kind.
+        """
+        if src.startswith(REGEX_PREFIX):
+            pattern = src[len(REGEX_PREFIX):]
+            try:
+                regex = re.compile(pattern)
+            except re.error as e:
+                raise errors.InvalidMapping(src, e)
+            self._patterns.append((pattern, regex, dst, True))
+        elif is_prefix_glob(src):
+            node = self._trie
+            for char in src[:-1]:
+                node = node.setdefault(char, {})
+            node[NO_MATCH] = dst
+        elif is_glob(src):
+            pattern = glob_to_regex(src)
+            self._patterns.append((pattern, re.compile(pattern), dst, False))
+        else:
+            self._exact[src] = dst
+
+        self.rules.append((src, dst))
+        self._matcher = None
+        self._cache.clear()
+
+    def lookup(self, value):
+        """Returns the mapped value, or NO_MATCH if no rule matches. """
+        try:
+            return self._cache[value]
+        except KeyError:
+            pass
+
+        result = self._exact.get(value, NO_MATCH)
+        if result is NO_MATCH:
+            result = self._match_prefix(value)
+        if result is NO_MATCH:
+            result = self._match_pattern(value)
+        if result is NO_MATCH and self.fallback is not None:
+            result = self.fallback.lookup(value)
+
+        self._cache[value] = result
+        return result
+
+    def translate(self, value):
+        """Returns the mapped value, or `value` itself if no rule matches. """
+        result = self.lookup(value)
+        return value if result is NO_MATCH else result
+
+    def _match_prefix(self, value):
+        node = self._trie
+        result = node.get(NO_MATCH, NO_MATCH)
+        for char in value:
+            node = node.get(char)
+            if node is None:
+                break
+            result = node.get(NO_MATCH, result)
+        return result
+
+    def _match_pattern(self, value):
+        if not self._patterns:
+            return NO_MATCH
+
+        if self._matcher is None:
+            self._matcher = self._compile()
+
+        if self._matcher is False:
+            # The patterns couldn't be combined, so try them one at a time
+            candidates = reversed(self._patterns)
+        else:
+            match = self._matcher.match(value)
+            if not match:
+                return NO_MATCH
+            idx = int(match.lastgroup[2:])
+            candidates = [self._patterns[idx]]
+
+        for _, regex, dst, is_regex in candidates:
+            match = regex.fullmatch(value)
+            if match:
+                return match.expand(dst) if is_regex and dst else dst
+        return NO_MATCH
+
+    def _compile(self):
+        """Combines all patterns into one alternation, most recent first.
+
+        Patterns that use their own backreferences or duplicate group names
+        can't be combined, in which case False is returned.
+        """
+        if any(RE_BACKREF.search(pattern) for pattern, *_ in self._patterns):
+            return False
+
+        alternatives = [
+            f'(?P<_r{idx}>(?:{pattern})\\Z)'
+            for idx, (pattern, *_) in reversed(list(enumerate(self._patterns)))
+        ]
+        try:
+            return re.compile('|'.join(alternatives))
+        except re.error:
+            return False
+
+
+def is_glob(src):
+    return '*' in src or '?' in src
+
+
+def is_prefix_glob(src):
+    return src.endswith('*') and not is_glob(src[:-1])
+
+
+def glob_to_regex(src):
+    """Translates a glob to a regex, where `*` matches any sequence of
+    characters and `?` matches a single character.
+    """
+    return ''.join(
+        '.*' if char == '*' else '.' if char == '?' else re.escape(char)
+        for char in src
+    )
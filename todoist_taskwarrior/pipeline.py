@@ -0,0 +1,100 @@
+"""Producer/consumer helpers for migrating tasks """
+
+import collections
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Marks the end of the items put in a `BackgroundWriter`
+_CLOSE = object()
+
+
+def iter_pipelined(fn, items, workers=1, buffer_size=None):
+    """Yields `fn(item)` for each of `items`, in order, while up to
+    `buffer_size` results are computed ahead on a pool of `workers` threads.
+
+    The consumer of the generator stays the only one acting on the results,
+    e.g. the single writer to Taskwarrior. If `fn` raises, the exception is
+    raised to the consumer when it reaches that item. When the consumer
+    stops early (including on its own error), pending work is cancelled.
+    """
+    if buffer_size is None:
+        buffer_size = workers * 4
+
+    pending = collections.deque()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= buffer_size:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class BackgroundWriter:
+    """Calls `write(batch)` on a background thread with the items `put` in
+    its queue, in order, so that the producer (e.g. the user answering
+    prompts) doesn't wait on the writes. Items that queued up while a batch
+    was being written are written together, up to `max_batch` at a time.
+
+    If `write` raises, nothing else is written, and the exception is raised
+    to the producer by the next `put`, and by `close`, so that the items
+    that weren't written aren't reported as written.
+    """
+
+    def __init__(self, write, max_batch=100):
+        self._write = write
+        self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._error = None
+        # Each counter is only incremented by one of the threads
+        self._put = 0
+        self._done = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        """The number of items not written yet. """
+        return self._put - self._done
+
+    def _run(self):
+        closed = False
+        while not closed:
+            batch = [self._queue.get()]
+            while len(batch) < self._max_batch and not self._queue.empty():
+                batch.append(self._queue.get())
+            if batch[-1] is _CLOSE:
+                batch.pop()
+                closed = True
+
+            if batch and self._error is None:
+                try:
+                    self._write(batch)
+                except BaseException as e:
+                    self._error = e
+            self._done += len(batch)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def put(self, item):
+        self._raise_error()
+        self._put += 1
+        self._queue.put(item)
+
+    def close(self):
+        """Waits for every item to be written, raising the error of `write`
+        if any items weren't.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        self._raise_error()
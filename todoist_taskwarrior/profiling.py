@@ -0,0 +1,112 @@
+"""Per-stage timing and counters for profiling migrations
+
+Code to be profiled is wrapped in `profiling.profiler.stage(name)`. Until
+`enable()` is called the profiler is a no-op, so that the cost when
+profiling is disabled is an attribute lookup and an empty `with` block.
+"""
+
+import collections
+import contextlib
+import threading
+import time
+
+
+class NullProfiler:
+
+    enabled = False
+    _stage = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, n=1):
+        pass
+
+
+class Profiler:
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.times = collections.defaultdict(float)
+        self.calls = collections.Counter()
+        self.counters = collections.Counter()
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Times a stage. Stages may run concurrently on several threads, in
+        which case their times are summed.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.times[name] += elapsed
+                self.calls[name] += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def track_cache(self, name, cached_fn):
+        """Reports the hits and misses of an `lru_cache` decorated function
+        during the run.
+        """
+        self.caches[name] = (cached_fn, cached_fn.cache_info())
+
+    def report(self):
+        caches = {}
+        for name, (cached_fn, before) in self.caches.items():
+            after = cached_fn.cache_info()
+            caches[name] = {
+                'hits': after.hits - before.hits,
+                'misses': after.misses - before.misses,
+            }
+
+        return {
+            'total': time.perf_counter() - self.started,
+            'stages': {
+                name: {'seconds': self.times[name], 'calls': self.calls[name]}
+                for name in self.times
+            },
+            'counters': dict(self.counters),
+            'caches': caches,
+        }
+
+
+profiler = NullProfiler()
+
+
+def enable():
+    global profiler
+    profiler = Profiler()
+    return profiler
+
+
+def format_report(report):
+    """Formats a report as a table, with the slowest stages first. """
+    lines = [f"{'stage':<16} {'seconds':>10} {'calls':>8} {'ms/call':>9}"]
+    stages = sorted(report['stages'].items(), key=lambda x: -x[1]['seconds'])
+    for name, stage in stages:
+        per_call = stage['seconds'] / stage['calls'] * 1000
+        lines.append(
+            f"{name:<16} {stage['seconds']:>10.3f} {stage['calls']:>8} {per_call:>9.3f}")
+    lines.append(f"{'total':<16} {report['total']:>10.3f}")
+
+    if report['counters']:
+        lines.append('')
+        for name, value in sorted(report['counters'].items()):
+            lines.append(f'{name:<16} {value:>10}')
+
+    if report['caches']:
+        lines.append('')
+        lines.append(f"{'cache':<16} {'hits':>10} {'misses':>8}")
+        for name, cache in sorted(report['caches'].items()):
+            lines.append(f"{name:<16} {cache['hits']:>10} {cache['misses']:>8}")
+
+    return '\n'.join(lines)
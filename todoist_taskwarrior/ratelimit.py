@@ -0,0 +1,204 @@
+"""Rate-limit-aware requests to the Todoist API
+
+`SyncScheduler` wraps the `requests.Session` of a `TodoistAPI`. Every request
+first takes a token from a `TokenBucket`, whose state is kept in a file in
+the cache directory, so that the budget of an API token is shared by every
+command and process using it. Requests that are rate limited (429) or fail
+temporarily (5xx, connection errors) are retried with exponential backoff
+and jitter, honouring Retry-After, which rate limited requests also apply
+to the shared bucket so that other processes wait as well.
+"""
+
+import contextlib
+import json
+import logging
+import random
+import threading
+import time
+from . import errors
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows, where the budget isn't shared by processes
+    fcntl = None
+
+
+# Todoist allows 50 sync requests per minute per user
+RATE = 50 / 60
+BURST = 10
+
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """A budget of `rate` requests per second, with bursts of up to `burst`,
+    kept in the file at `path` (or in memory if None) and updated under an
+    exclusive lock.
+    """
+
+    def __init__(self, path=None, rate=RATE, burst=BURST, clock=time.time, sleep=time.sleep):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._state = {}
+
+    @contextlib.contextmanager
+    def _locked_state(self):
+        """Yields the state of the bucket, saving it afterwards. """
+        with self._lock:
+            if not self.path:
+                yield self._state
+                return
+
+            with open(self.path, 'a+') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}
+                yield state
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+
+    def _take(self):
+        """Takes a token if there is one, returning 0, or otherwise the
+        seconds to wait before trying again.
+        """
+        with self._locked_state() as state:
+            now = self.clock()
+            blocked_until = state.get('blocked_until', 0)
+            if now < blocked_until:
+                return blocked_until - now
+
+            tokens = state.get('tokens', self.burst)
+            updated = state.get('updated', now)
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            state['updated'] = now
+            if tokens >= 1:
+                state['tokens'] = tokens - 1
+                return 0
+            state['tokens'] = tokens
+            return (1 - tokens) / self.rate
+
+    def acquire(self):
+        """Waits for a token, returning the seconds waited. """
+        waited = 0
+        while True:
+            wait = self._take()
+            if not wait:
+                return waited
+            self.sleep(wait)
+            waited += wait
+
+    def block(self, seconds):
+        """Stops any request from being made for `seconds`. """
+        with self._locked_state() as state:
+            state['blocked_until'] = max(state.get('blocked_until', 0), self.clock() + seconds)
+
+
+class SyncScheduler:
+    """Sends the requests of a `TodoistAPI` through `session`, within the
+    budget of `bucket`, retrying them as described above.
+
+    `stats` counts the `requests` and `retries`, and the seconds spent
+    waiting for the budget (`budget_wait`) and backing off (`backoff_wait`).
+    """
+
+    def __init__(self, session, bucket, max_retries=None, backoff_base=None,
+                 backoff_max=None, sleep=time.sleep, rng=random):
+        self.session = session
+        self.bucket = bucket
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = BACKOFF_MAX if backoff_max is None else backoff_max
+        self.sleep = sleep
+        self.rng = rng
+        self.stats = {'requests': 0, 'retries': 0, 'budget_wait': 0.0, 'backoff_wait': 0.0}
+
+    def post(self, url, **kwargs):
+        return self._request('post', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self._request('get', url, **kwargs)
+
+    def _request(self, method, url, **kwargs):
+        import requests
+
+        for attempt in range(self.max_retries + 1):
+            self.stats['budget_wait'] += self.bucket.acquire()
+            self.stats['requests'] += 1
+            try:
+                response = getattr(self.session, method)(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                reason, status, retry_after = str(e), None, None
+            else:
+                if response.status_code < 400:
+                    return response
+                reason = error_reason(response)
+                status = response.status_code
+                if status not in RETRY_STATUSES:
+                    raise errors.SyncError(reason, status)
+                retry_after = parse_retry_after(response)
+
+            if attempt == self.max_retries:
+                break
+
+            self.stats['retries'] += 1
+            backoff = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+            logging.debug(
+                f'SYNC_RETRY attempt={attempt + 1} status={status} '
+                f'retry_after={retry_after} reason={reason}'
+            )
+            if retry_after is not None:
+                # With some jitter, so that processes don't all retry at once
+                delay = retry_after + self.rng.uniform(0, self.backoff_base)
+                if status == 429:
+                    # The limit is per user, so every process has to wait
+                    self.bucket.block(delay)
+            else:
+                delay = self.rng.uniform(0, backoff)
+            self.sleep(delay)
+            self.stats['backoff_wait'] += delay
+
+        raise errors.SyncError(f'{reason}, after {self.max_retries} retries', status)
+
+
+def parse_retry_after(response):
+    """Returns the seconds to wait from the Retry-After header of a
+    response, or from the `retry_after` Todoist gives with rate limit
+    errors, or None.
+    """
+    value = response.headers.get('Retry-After')
+    if value is not None:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            from email.utils import parsedate_to_datetime
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    try:
+        return float(response.json()['error_extra']['retry_after'])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def error_reason(response):
+    try:
+        return f"HTTP {response.status_code} ({response.json()['error']})"
+    except (ValueError, TypeError, KeyError):
+        return f'HTTP {response.status_code}'
+
@@ -0,0 +1,111 @@
+"""Persistent state of the migration
+
+The outcome of every Todoist task (imported, skipped or failed), and the
+recurrence the user entered for it, are remembered between runs in an
+append-only log kept alongside the Todoist cache, one JSON object per line.
+The log is read into a dict when opened, so lookups take constant time.
+"""
+
+import json
+import logging
+import os
+import threading
+
+
+IMPORTED = 'imported'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+# The log is rewritten when opened if it has this many more lines than tasks
+COMPACT_THRESHOLD = 10000
+
+
+class StateStore:
+
+    def __init__(self, path=None):
+        """Opens the log at `path`, or keeps the state in memory only if
+        `path` is None.
+        """
+        self.path = path
+        self.tasks = {}
+        self._file = None
+        # Tasks may be recorded by a background writer while prompting
+        self._lock = threading.Lock()
+
+        if path:
+            lines = self._load()
+            if lines - len(self.tasks) > COMPACT_THRESHOLD:
+                self._compact()
+
+    def _load(self):
+        lines = 0
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A partly written line, if a run was killed
+                        logging.warning(f'STATE_INVALID_LINE path={self.path} line={lines}')
+                        continue
+                    tid = entry.pop('tid')
+                    if entry.pop('forget', False):
+                        self.tasks.pop(tid, None)
+                    else:
+                        self.tasks.setdefault(tid, {}).update(entry)
+        except FileNotFoundError:
+            pass
+        return lines
+
+    def _compact(self):
+        """Rewrites the log with a single line per task. """
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            for tid, entry in self.tasks.items():
+                f.write(json.dumps({'tid': tid, **entry}) + '\n')
+        os.replace(tmp, self.path)
+        logging.debug(f'STATE_COMPACT path={self.path} size={len(self.tasks)}')
+
+    def _append(self, entry):
+        if not self.path:
+            return
+        if self._file is None:
+            # Line buffered, so that decisions survive quitting mid-run
+            self._file = open(self.path, 'a', buffering=1)
+        self._file.write(json.dumps(entry) + '\n')
+
+    def get(self, tid):
+        """Returns the state of a task, e.g. `{'outcome': 'imported',
+        'uuid': ...}`, or an empty dict if nothing is known about it.
+        """
+        return self.tasks.get(str(tid), {})
+
+    def outcome(self, tid):
+        return self.get(tid).get('outcome')
+
+    def update(self, tid, **fields):
+        """Updates the state of a task with `fields`. """
+        tid = str(tid)
+        with self._lock:
+            self.tasks.setdefault(tid, {}).update(fields)
+            self._append({'tid': tid, **fields})
+
+    def forget(self, tid):
+        """Removes the state of a task. """
+        tid = str(tid)
+        with self._lock:
+            if self.tasks.pop(tid, None) is not None:
+                self._append({'tid': tid, 'forget': True})
+
+    def sync(self):
+        """Waits for the log to be written to disk. """
+        with self._lock:
+            if self._file:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
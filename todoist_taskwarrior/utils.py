@@ -1,6 +1,12 @@
 import click
+import datetime
+import functools
+import hashlib
+import json
+import logging
 import re
-import dateutil.parser
+import sys
+import uuid
 from .errors import UnsupportedRecurrence
 
 
@@ -22,6 +28,143 @@ def try_get_model_prop(m, key, default=None):
         return default
 
 
+""" Projects """
+
+def build_project_index(projects, map_project):
+    """Returns a dict mapping each project id to its final Taskwarrior
+    project name.
+
+    Project hierarchies are period-delimited (e.g. 'Programming.Open Source'),
+    then translated with the `mapping.Mapping` `map_project` and quoted if they contain whitespace.
+    Each project is visited once; a parent that is missing, or a `parent_id`
+    chain that loops back on itself, is logged and treated as a root.
+    """
+    by_id = {p['id']: p for p in projects}
+    paths = {}
+
+    for project_id in by_id:
+        # Walk up until we reach a root or a project whose path is known
+        chain = []
+        seen = set()
+        pid = project_id
+        while pid is not None and pid not in paths:
+            if pid in seen:
+                logging.warning(f'PROJECT_CYCLE project_id={pid}')
+                break
+            project = by_id.get(pid)
+            if project is None:
+                logging.warning(f'PROJECT_PARENT_NOT_FOUND project_id={pid}')
+                break
+            seen.add(pid)
+            chain.append(project)
+            pid = try_get_model_prop(project, 'parent_id')
+
+        # Then unwind, building paths from the top down
+        prefix = paths.get(pid)
+        for project in reversed(chain):
+            if prefix:
+                prefix = f"{prefix}.{project['name']}"
+            else:
+                prefix = project['name']
+            paths[project['id']] = prefix
+
+    index = {}
+    for project_id, path in paths.items():
+        name = map_project.translate(path)
+        index[project_id] = sys.intern(maybe_quote_ws(name)) if name else ''
+    return index
+
+
+""" Tags """
+
+def build_tag_index(labels, map_tag):
+    """Returns a dict mapping each label id to its final Taskwarrior tag,
+    translated with the `mapping.Mapping` `map_tag`, or None if the tag should be removed.
+    """
+    index = {}
+    for label in labels:
+        tag = map_tag.translate(label['name'])
+        index[label['id']] = sys.intern(tag) if tag else None
+    return index
+
+
+""" Import """
+
+def make_import_task(tid, name, project, tags, priority, entry, due, recur,
+                     fingerprint=None):
+    """Builds a Taskwarrior task dict, suitable for `task import`, from
+    converted task data.
+
+    A `uuid` is generated up-front so that the caller knows it without
+    having to query Taskwarrior after the import.
+    """
+    task = {
+        'uuid': str(uuid.uuid4()),
+        'description': name.strip(),
+        'status': 'recurring' if recur else 'pending',
+        'entry': format_tw_date(entry),
+        'todoist_id': str(tid),
+    }
+
+    optional = {
+        'project': unquote_ws(project),
+        'tags': [tag for tag in tags if tag],
+        'priority': priority,
+        'due': format_tw_date(due),
+        'recur': recur,
+        'todoist_fingerprint': fingerprint,
+    }
+    task.update((k, v) for k, v in optional.items() if v)
+    return task
+
+
+# The fields of a migrated task that are replaced when it is updated, and
+# those of an exported task that Taskwarrior computes itself
+UPDATE_FIELDS = ('description', 'project', 'tags', 'priority', 'due', 'recur',
+                 'todoist_fingerprint')
+COMPUTED_FIELDS = ('id', 'urgency', 'modified')
+
+def make_update_task(existing, **data):
+    """Builds a Taskwarrior task dict, suitable for `task import`, that
+    updates `existing`, an exported Taskwarrior task, with converted data.
+
+    Fields that don't come from Todoist, such as the status or annotations,
+    are kept as they are.
+    """
+    task = make_import_task(**data)
+    updated = {
+        k: v for k, v in existing.items()
+        if k not in UPDATE_FIELDS and k not in COMPUTED_FIELDS
+    }
+    updated.update((k, task[k]) for k in UPDATE_FIELDS if k in task)
+    return updated
+
+
+def make_delete_task(existing):
+    """Builds a Taskwarrior task dict, suitable for `task import`, that
+    deletes `existing`, an exported Taskwarrior task.
+    """
+    task = {k: v for k, v in existing.items() if k not in COMPUTED_FIELDS}
+    task['status'] = 'deleted'
+    task['end'] = format_tw_date(datetime.datetime.now(datetime.timezone.utc).isoformat())
+    return task
+
+
+# The converted fields that make up a task's fingerprint
+FINGERPRINT_FIELDS = ('name', 'project', 'tags', 'priority', 'due')
+
+def fingerprint(data, due):
+    """Returns a short hash of the fields of a `ConvertedTask`, used to detect
+    tasks that changed in Todoist since they were migrated.
+
+    The recurrence is hashed as the Todoist `due` string it is parsed from,
+    since unsupported ones are set by the user when migrating.
+    """
+    values = [getattr(data, field) for field in FINGERPRINT_FIELDS]
+    values.append(due['string'] if due else None)
+    return hashlib.blake2b(json.dumps(values).encode(), digest_size=8).hexdigest()
+
+
 """ Priorities """
 
 PRIORITY_MAP = {1: None, 2: 'L', 3: 'M', 4: 'H'}
@@ -44,6 +187,13 @@ def maybe_quote_ws(value):
     return value
 
 
+def unquote_ws(value):
+    """Removes the quotes added by `maybe_quote_ws`. """
+    if value and len(value) > 1 and value[0] == value[-1] == "'":
+        return value[1:-1]
+    return value
+
+
 """ Dates """
 
 def parse_due(due):
@@ -66,13 +216,78 @@ def parse_due(due):
 def parse_date(date):
     """ Converts a date from Todoist to Taskwarrior.
 
-    Todoist: Fri 26 Sep 2014 08:25:05 +0000 (what is this called)?
+    Todoist: 2014-09-26, 2014-09-26T08:25:05 or 2014-09-26T08:25:05Z
+    (older data may also be e.g. Fri 26 Sep 2014 08:25:05 +0000)
     taskwarrior: ISO-8601
     """
     if not date:
         return None
 
-    return dateutil.parser.parse(date).isoformat()
+    if len(date) == 10:
+        return _parse_day(date)
+    return _parse_datetime(date).isoformat()
+
+
+# Date-only values (e.g. due dates) repeat heavily across tasks
+DATE_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_day(date):
+    return _parse_datetime(date).isoformat()
+
+
+# The formats returned by the Todoist sync API, as well as `parse_date`:
+# date-only, naive datetime, or datetime with a `Z` or `+HH:MM` UTC offset
+RE_ISO_DATE = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})'
+    r'(?:T(\d{2}):(\d{2}):(\d{2})'
+    r'(?:(Z)|([+-])(\d{2}):(\d{2}))?)?$'
+)
+
+
+def _parse_datetime(date):
+    """Parses `date` to a datetime, using a strict fast path for the fixed
+    ISO-8601 formats and falling back to dateutil for anything else.
+    """
+    match = RE_ISO_DATE.match(date)
+    if match:
+        (year, month, day, hour, minute, second,
+         utc, sign, offset_hours, offset_minutes) = match.groups()
+
+        tzinfo = None
+        if utc:
+            tzinfo = datetime.timezone.utc
+        elif sign:
+            offset = datetime.timedelta(
+                hours=int(offset_hours), minutes=int(offset_minutes))
+            tzinfo = datetime.timezone(-offset if sign == '-' else offset)
+
+        try:
+            return datetime.datetime(
+                int(year), int(month), int(day),
+                int(hour or 0), int(minute or 0), int(second or 0),
+                tzinfo=tzinfo,
+            )
+        except ValueError:
+            pass
+
+    # Imported here, as it is slow to import and rarely needed
+    import dateutil.parser
+    return dateutil.parser.parse(date)
+
+
+def format_tw_date(date):
+    """Converts an ISO-8601 date (as returned by `parse_date`) to the UTC
+    format used by Taskwarrior's JSON import/export, e.g. 20190118T120000Z.
+
+    Naive dates are assumed to be in local time, as with `task add`.
+    """
+    if not date:
+        return None
+
+    dt = _parse_datetime(date).astimezone(datetime.timezone.utc)
+    return dt.strftime('%Y%m%dT%H%M%SZ')
 
 
 def parse_recur(due):
@@ -104,18 +319,31 @@ def parse_recur_string(date_string):
     # - trim leading, trailing, and, duplicate spaces
     # - convert to lowercase
     date_string = ' '.join(date_string.lower().strip().split())
-    result = (
-        _recur_single_cycle(date_string) or
-        _recur_multi_cycle(date_string) or
-        _recur_day_of_week(date_string) or
-        _recur_day_of_month(date_string) or
-        _recur_special(date_string)
-    )
+    result = _parse_normalized_recur(date_string)
     if not result:
         raise UnsupportedRecurrence(date_string)
     return result
 
 
+# Accounts tend to reuse a small number of distinct recurrences
+RECUR_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=RECUR_CACHE_SIZE)
+def _parse_normalized_recur(date_string):
+    """Matches a normalized `date_string` against each recurrence pattern
+    in turn, returning None if it is unsupported.
+
+    Unsupported recurrences are cached as None, so that they don't have
+    to be re-parsed before raising.
+    """
+    for regex, handler in RECUR_RULES.values():
+        match = regex.match(date_string)
+        if match:
+            return handler(match.groupdict())
+    return None
+
+
 # Atoms
 _PERIOD = r'(?P<period>hour|day|week|month|year)s?'
 _EVERY = r'ev(ery)?'
@@ -177,25 +405,15 @@ PERIOD_TO_SIMPLE = {
 }
 
 
-def _recur_single_cycle(date_string):
-    match = RE_SINGLE_CYCLE.match(date_string)
-    if not match:
-        return None
-
-    groups = match.groupdict()
+def _recur_single_cycle(groups):
     if groups['simple']:
-        return match.group('simple')
+        return groups['simple']
 
-    period = match.group('period')
+    period = groups['period']
     return PERIOD_TO_SIMPLE[period]
 
 
-def _recur_multi_cycle(date_string):
-    match =  RE_MULTI_CYCLE.match(date_string)
-    if not match:
-        return
-
-    groups = match.groupdict()
+def _recur_multi_cycle(groups):
     period = groups['period']
     if groups['cycles']:
         cycles = groups['cycles']
@@ -206,12 +424,7 @@ def _recur_multi_cycle(date_string):
     return f'{cycles} {period}s'
 
 
-def _recur_day_of_week(date_string):
-    match =  RE_EVERY_DOW.match(date_string)
-    if not match:
-        return
-
-    groups = match.groupdict()
+def _recur_day_of_week(groups):
     day_of_week = groups['dayofweek']
 
     if groups['cycles']:
@@ -224,19 +437,12 @@ def _recur_day_of_week(date_string):
     return 'weekly' if cycles == 1 else f'{cycles} weeks'
 
 
-def _recur_day_of_month(date_string):
-    match =  RE_EVERY_DOM.match(date_string)
-    if not match:
-        return
+def _recur_day_of_month(groups):
     return 'monthly'
 
 
-def _recur_special(date_string):
-    match =  RE_SPECIAL.match(date_string)
-    if not match:
-        return
-
-    label = match.group('label')
+def _recur_special(groups):
+    label = groups['label']
     if label == 'morning' or label == 'evening':
         return 'daily'
     elif label == 'weekday' or label == 'workday':
@@ -244,3 +450,12 @@ def _recur_special(date_string):
     elif label == 'last day':
         return 'monthly'
 
+
+# Recurrence patterns and their handlers, in order of precedence
+RECUR_RULES = {
+    'single_cycle': (RE_SINGLE_CYCLE, _recur_single_cycle),
+    'multi_cycle': (RE_MULTI_CYCLE, _recur_multi_cycle),
+    'day_of_week': (RE_EVERY_DOW, _recur_day_of_week),
+    'day_of_month': (RE_EVERY_DOM, _recur_day_of_month),
+    'special': (RE_SPECIAL, _recur_special),
+}
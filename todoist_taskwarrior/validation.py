@@ -1,19 +1,56 @@
 import click
-from . import errors, utils
+from . import errors, mapping, utils
 
 
 def validate_map(ctx, param, value):
-    map_project = {}
-    for mapping in value:
-        try:
-            src, dst = mapping.split('=', 2)
-        except ValueError:
-            raise click.BadParameter('--map-project needs to be of the form SRC=DST')
-
-        if dst == '':
-            dst = None
-        map_project[src] = dst
-    return map_project
+    try:
+        return mapping.Mapping(parse_map_rule(rule) for rule in value)
+    except errors.InvalidMapping as e:
+        raise click.BadParameter(e)
+
+
+def validate_map_file(ctx, param, value):
+    """Reads mapping rules from a file, returning a dict with the list of
+    `project` and `tag` rules. Each line is of the form:
+
+        project SRC=DST
+        tag SRC=DST
+
+    Blank lines and lines starting with '#' are ignored.
+    """
+    rules = {'project': [], 'tag': []}
+    if value is None:
+        return rules
+
+    for lineno, line in enumerate(value, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        kind, _, rule = line.partition(' ')
+        if kind not in rules:
+            raise click.BadParameter(
+                f'line {lineno}: expected "project SRC=DST" or "tag SRC=DST"')
+        rules[kind].append(parse_map_rule(rule.strip()))
+
+    # Check rules are valid before starting
+    try:
+        for kind_rules in rules.values():
+            mapping.Mapping(kind_rules)
+    except errors.InvalidMapping as e:
+        raise click.BadParameter(e)
+    return rules
+
+
+def parse_map_rule(rule):
+    try:
+        src, dst = rule.split('=', 2)
+    except ValueError:
+        raise click.BadParameter('--map-project needs to be of the form SRC=DST')
+
+    if dst == '':
+        dst = None
+    return src, dst
 
 
 def validate_recur(value):